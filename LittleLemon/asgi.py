@@ -12,5 +12,9 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LittleLemon.settings')
+os.environ.setdefault('ASYNC_READ_VIEWS', '1')
+# Async views query from worker threads; persistent connections would be
+# kept open per thread rather than reused.
+os.environ.setdefault('CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
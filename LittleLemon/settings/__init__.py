@@ -0,0 +1,20 @@
+"""
+Settings for LittleLemon, picked by the DJANGO_ENV environment variable:
+'dev' (the default) or 'prod'. A profile can also be selected directly with
+DJANGO_SETTINGS_MODULE=LittleLemon.settings.prod.
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+DJANGO_ENV = os.environ.get('DJANGO_ENV', 'dev')
+
+if DJANGO_ENV == 'dev':
+    from .dev import *  # noqa: F401,F403
+elif DJANGO_ENV == 'prod':
+    from .prod import *  # noqa: F401,F403
+else:
+    raise ImproperlyConfigured(
+        f"DJANGO_ENV must be 'dev' or 'prod', not {DJANGO_ENV!r}."
+    )
@@ -0,0 +1,279 @@
+"""
+Django settings for LittleLemon project, shared by every profile; see
+dev.py and prod.py.
+
+Generated by 'django-admin startproject' using Django 5.2.5.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/5.2/topics/settings/
+
+For the full list of settings and their values, see
+https://docs.djangoproject.com/en/5.2/ref/settings/
+"""
+
+import os
+from datetime import timedelta
+from pathlib import Path
+
+# Build paths inside the project like this: BASE_DIR / 'subdir'.
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+
+# Quick-start development settings - unsuitable for production
+# See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = 'django-insecure-0fylh+=5(glprjt4&)4@qoo)^(2dqzje)gvoiwk&+-c7-c#*s('
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = False
+
+ALLOWED_HOSTS = []
+
+
+# Application definition
+
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'rest_framework',
+    'rest_framework.authtoken',
+    'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
+    'LittleLemonAPI',
+    'djoser',
+]
+
+MIDDLEWARE = [
+    'LittleLemonAPI.metrics.MetricsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'LittleLemon.urls'
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'LittleLemon.wsgi.application'
+
+# Route the catalogue and order reads to the async views in
+# LittleLemonAPI.async_views. asgi.py turns this on; under WSGI every async
+# view would need its own event loop, so the sync views stay in place.
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS') == '1'
+
+
+# Database
+# https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+        # Run on every new connection: WAL lets reads proceed during a
+        # write, synchronous=NORMAL syncs at checkpoints rather than every
+        # commit (durable across crashes, may drop the last commits on power
+        # loss), and reads come from a 256 MiB memory map. Transactions take
+        # the write lock up front, so concurrent ones queue for up to
+        # `timeout` seconds instead of deadlocking on a lock upgrade and
+        # failing with "database is locked".
+        'OPTIONS': {
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA mmap_size=268435456'
+            ),
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        'TEST': {
+            # File-backed so multi-threaded tests see real SQLite locking.
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    }
+}
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# The catalogue, role and auth cache backends can be swapped per deployment,
+# e.g.
+# CATALOGUE_CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# CATALOGUE_CACHE_LOCATION=/var/tmp/littlelemon-catalogue
+# or django.core.cache.backends.redis.RedisCache with redis://127.0.0.1:6379,
+# and likewise ROLE_CACHE_* and AUTH_CACHE_*.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalogue': {
+        'BACKEND': os.environ.get(
+            'CATALOGUE_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('CATALOGUE_CACHE_LOCATION', 'catalogue'),
+    },
+    'roles': {
+        'BACKEND': os.environ.get(
+            'ROLE_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('ROLE_CACHE_LOCATION', 'roles'),
+    },
+    'auth': {
+        'BACKEND': os.environ.get(
+            'AUTH_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('AUTH_CACHE_LOCATION', 'auth'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+CATALOGUE_CACHE_ALIAS = 'catalogue'
+
+CATALOGUE_CACHE_TIMEOUT = 60 * 60
+
+# Group names per user, and group ids per name. Membership changes clear
+# the entry only in the process making them, so with several processes
+# this cache must be shared between them (the prod profile insists).
+ROLE_CACHE_ALIAS = 'roles'
+
+ROLE_CACHE_TIMEOUT = 5 * 60
+
+# Authenticated users (with their group names) per API token and per JWT
+# user, see LittleLemonAPI.authentication. get_roles() trusts the cached
+# names, and deactivations, token deletes and group changes clear entries
+# only in the process making them, so with several processes this cache
+# must be shared too (the prod profile insists).
+AUTH_CACHE_ALIAS = 'auth'
+
+AUTH_CACHE_TIMEOUT = 60
+
+
+# Request metrics
+# Served at /metrics to requests sending "Authorization: Bearer
+# <METRICS_TOKEN>" and to METRICS_ALLOWED_IPS (e.g. the Prometheus
+# scraper). The address is REMOTE_ADDR: behind a reverse proxy on the same
+# host every client comes from loopback, so leave 127.0.0.1 out there and
+# use the token. A request running one SQL statement
+# METRICS_N_PLUS_ONE_THRESHOLD times or more is logged as a likely N+1.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+METRICS_ALLOWED_IPS = os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1').split(',')
+
+METRICS_N_PLUS_ONE_THRESHOLD = 20
+
+
+# Order events (api/orders/events/)
+# Events kept for clients resuming with Last-Event-ID, and the seconds
+# between heartbeat comments on an idle stream.
+ORDER_EVENT_HISTORY = 1000
+
+ORDER_EVENT_HEARTBEAT = 15
+
+
+# Sales tax
+# Rates are fractions as strings; TAX_CATEGORY_RATES is keyed by category
+# slug. Run `manage.py recompute_prices` after changing either.
+
+TAX_DEFAULT_RATE = '0.10'
+
+TAX_CATEGORY_RATES = {}
+
+
+# Password validation
+# https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/5.2/topics/i18n/
+
+LANGUAGE_CODE = 'en-us'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/5.2/howto/static-files/
+
+STATIC_URL = 'static/'
+
+# Default primary key field type
+# https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
+
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Renderers and authentication classes are set per profile.
+REST_FRAMEWORK = {
+    'DEFAULT_THROTTLE_CLASSES': [
+        "LittleLemonAPI.throttles.AnonRateThrottle",
+        "LittleLemonAPI.throttles.UserRateThrottle",
+    ],
+    # e.g. THROTTLE_RATE_USER=1000/minute; unset means unthrottled.
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': os.environ.get('THROTTLE_RATE_ANON'),
+        'user': os.environ.get('THROTTLE_RATE_USER'),
+        'tencallsperminute': os.environ.get('THROTTLE_RATE_TENCALLSPERMINUTE', '10/minute'),
+    },
+}
+
+# Throttle counters shared by every worker process. Use
+# LittleLemonAPI.throttles.CacheCounterStore with a cache alias as LOCATION
+# to keep them in Redis instead.
+THROTTLE_STORE = {
+    'BACKEND': 'LittleLemonAPI.throttles.SQLiteCounterStore',
+    'LOCATION': os.environ.get('THROTTLE_STORE_LOCATION', BASE_DIR / 'throttle.sqlite3'),
+}
+
+DJOSER = {
+    'USER_ID_FIELD': 'username',
+    # 'LOGIN_FIELD': 'email',
+}
+
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=5),
+}
\ No newline at end of file
@@ -0,0 +1,33 @@
+"""
+Development settings: debug toolbar, the browsable API and XML, and every
+authentication scheme the API supports.
+"""
+
+from .base import *  # noqa: F401,F403
+
+DEBUG = True
+
+INSTALLED_APPS = [*INSTALLED_APPS, 'debug_toolbar']
+
+MIDDLEWARE = [
+    *MIDDLEWARE,
+    'debug_toolbar.middleware.DebugToolbarMiddleware',  # Debug toolbar middleware
+]
+
+INTERNAL_IPS = [
+    "127.0.0.1"
+]
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'rest_framework_xml.renderers.XMLRenderer',
+    ],
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'LittleLemonAPI.authentication.CachedTokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+        'LittleLemonAPI.authentication.CachedJWTAuthentication',
+    ],
+}
@@ -0,0 +1,110 @@
+"""
+Production settings: JSON only, Token then JWT authentication, no debug
+toolbar, persistent database connections and cached templates.
+
+Requires DJANGO_SECRET_KEY and DJANGO_ALLOWED_HOSTS (comma separated);
+/metrics needs METRICS_TOKEN or METRICS_ALLOWED_IPS. The catalogue, role
+and auth caches default to files under /var/tmp/littlelemon-<alias>.
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *  # noqa: F401,F403
+
+DEBUG = False
+
+try:
+    SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+except KeyError:
+    raise ImproperlyConfigured('Set DJANGO_SECRET_KEY for the prod profile.')
+
+ALLOWED_HOSTS = [
+    host for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if host
+]
+
+# No loopback default: proxied requests arrive from 127.0.0.1 too. Scrape
+# with METRICS_TOKEN, or list the scraper's address explicitly.
+METRICS_ALLOWED_IPS = [
+    ip for ip in os.environ.get('METRICS_ALLOWED_IPS', '').split(',') if ip
+]
+
+# Reuse each worker's connection for CONN_MAX_AGE seconds instead of
+# opening one per request. asgi.py sets it to 0: async views run their
+# queries in worker threads that would each keep a connection open.
+DATABASES = {
+    **DATABASES,
+    'default': {
+        **DATABASES['default'],
+        'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+    },
+}
+
+# Every worker process must see catalogue version bumps, role changes and
+# deactivations, including those made by management commands, so these
+# caches can't be per-process. They default to files on the local disk;
+# point them at Redis across hosts.
+SHARED_CACHES = {
+    'catalogue': 'CATALOGUE',
+    'roles': 'ROLE',
+    'auth': 'AUTH',
+}
+
+CACHES = {
+    **CACHES,
+    **{
+        alias: {
+            'BACKEND': os.environ.get(
+                f'{prefix}_CACHE_BACKEND',
+                'django.core.cache.backends.filebased.FileBasedCache',
+            ),
+            'LOCATION': os.environ.get(
+                f'{prefix}_CACHE_LOCATION', f'/var/tmp/littlelemon-{alias}'
+            ),
+        }
+        for alias, prefix in SHARED_CACHES.items()
+    },
+}
+
+for alias, prefix in SHARED_CACHES.items():
+    if CACHES[alias]['BACKEND'].endswith('.LocMemCache'):
+        raise ImproperlyConfigured(
+            f'The prod profile needs a {alias} cache shared between processes; '
+            f'set {prefix}_CACHE_BACKEND to a file-based or Redis cache.'
+        )
+
+TEMPLATES = [
+    {
+        **TEMPLATES[0],
+        'APP_DIRS': False,
+        'OPTIONS': {
+            **TEMPLATES[0]['OPTIONS'],
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
+        },
+    },
+]
+
+try:
+    import orjson  # noqa: F401
+except ImportError:
+    JSON_RENDERER = 'rest_framework.renderers.JSONRenderer'
+else:
+    JSON_RENDERER = 'LittleLemonAPI.renderers.ORJSONRenderer'
+
+# Session authentication only served the browsable API; API clients send
+# a token, so it is checked first.
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': [JSON_RENDERER],
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'LittleLemonAPI.authentication.CachedTokenAuthentication',
+        'LittleLemonAPI.authentication.CachedJWTAuthentication',
+    ],
+}
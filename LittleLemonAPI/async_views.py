@@ -0,0 +1,267 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import aprefetch_related_objects
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import ForcedAuthentication, Request
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
+
+from . import views
+from .cache import acached_catalogue
+from .conditional import (
+    acatalogue_validators,
+    aorder_validators,
+    not_modified,
+    set_validators,
+)
+from .events import (
+    MANAGERS,
+    bus,
+    crew_channel,
+    event_stream,
+    user_channel,
+)
+from .filters import acategory_ids, filter_menu_items
+from .models import Category, MenuItem, Order, order_items_prefetch
+from .pagination import KeysetPaginator
+from .permissions import DELIVERY_CREW, MANAGER, aget_roles
+from .rows import MENU_ITEM
+from .serializers import CategorySerializer, OrderSerializer
+
+
+async def authenticate(request):
+    """
+    Set ``request.user`` and ``request.auth`` like DRF does. Authenticators
+    run in a worker thread; only forced authentication, which reads no
+    database or cache, runs on the event loop.
+    """
+    for authenticator in request.authenticators:
+        if isinstance(authenticator, ForcedAuthentication):
+            result = authenticator.authenticate(request)
+        else:
+            result = await sync_to_async(authenticator.authenticate)(request)
+        if result is not None:
+            request.user, request.auth = result
+            return
+    request.user, request.auth = AnonymousUser(), None
+
+
+async def check_throttles(request):
+    waits = []
+    for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES:
+        throttle = throttle_class()
+        # Unthrottled scopes never touch the counter store.
+        if throttle.rate is None:
+            continue
+        allow_request = sync_to_async(throttle.allow_request, thread_sensitive=False)
+        if not await allow_request(request, None):
+            waits.append(throttle.wait())
+    if waits:
+        waits = [wait for wait in waits if wait is not None]
+        raise exceptions.Throttled(max(waits, default=None))
+
+
+def make_request(request):
+    return Request(
+        request,
+        authenticators=[
+            authenticator()
+            for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+        ],
+    )
+
+
+async def initial(request):
+    """Authenticate, require a logged in user and throttle, as DRF would."""
+    await authenticate(request)
+    if not request.user.is_authenticated:
+        raise exceptions.NotAuthenticated()
+    await check_throttles(request)
+
+
+def render(request, data, status=status.HTTP_200_OK):
+    renderer = request.accepted_renderer
+    return HttpResponse(
+        renderer.render(data, request.accepted_media_type),
+        content_type=renderer.media_type,
+        status=status,
+    )
+
+
+def handle_exception(request, exc):
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        authenticators = request.authenticators
+        header = authenticators and authenticators[0].authenticate_header(request)
+        if header:
+            exc.auth_header = header
+        else:
+            exc.status_code = status.HTTP_403_FORBIDDEN
+    response = exception_handler(exc, {"request": request})
+    if response is None:
+        raise exc
+    rendered = render(request, response.data, response.status_code)
+    for header in ("WWW-Authenticate", "Retry-After"):
+        if header in response:
+            rendered[header] = response[header]
+    return rendered
+
+
+def async_read_view(fallback):
+    """
+    Serve authenticated GET requests from JSON clients with the decorated
+    coroutine. Authentication and the default throttles run as in DRF but
+    without blocking the event loop. Other methods and renderers, such as
+    the browsable API and XML, go to the DRF view ``fallback`` in a thread.
+    """
+    sync_view = sync_to_async(fallback)
+    negotiator = DefaultContentNegotiation()
+
+    def decorator(handler):
+        @csrf_exempt
+        @wraps(handler)
+        async def view(request, *args, **kwargs):
+            if request.method != "GET":
+                return await sync_view(request, *args, **kwargs)
+            drf_request = make_request(request)
+            renderers = [renderer() for renderer in api_settings.DEFAULT_RENDERER_CLASSES]
+            try:
+                renderer, media_type = negotiator.select_renderer(drf_request, renderers)
+            except exceptions.NotAcceptable:
+                renderer = None
+            if not isinstance(renderer, JSONRenderer):
+                return await sync_view(request, *args, **kwargs)
+            drf_request.accepted_renderer = renderer
+            drf_request.accepted_media_type = media_type
+
+            try:
+                await initial(drf_request)
+                response = await handler(drf_request, *args, **kwargs)
+            except Exception as exc:
+                response = handle_exception(drf_request, exc)
+            patch_vary_headers(response, ["Accept"])
+            return response
+
+        return view
+
+    return decorator
+
+
+async def menu_items_page(request):
+    categories = None
+    if request.query_params.get("category"):
+        categories = await acategory_ids()
+    items, keys = filter_menu_items(
+        MenuItem.objects.all(), request.query_params, categories
+    )
+
+    paginator = KeysetPaginator(keys)
+    rows, next_cursor, count = await paginator.apaginate(
+        MENU_ITEM.values(items, *keys), request
+    )
+    return paginator.get_response_data(MENU_ITEM.many(rows), next_cursor, count)
+
+
+@async_read_view(views.menu_items)
+async def menu_items(request):
+    etag, last_modified = await acatalogue_validators("menu-items", request)
+    response = not_modified(request, etag, last_modified)
+    if response is None:
+        data = await acached_catalogue(
+            "menu-items", lambda: menu_items_page(request), request
+        )
+        response = render(request, data)
+    return set_validators(response, etag, last_modified)
+
+
+@async_read_view(views.categories)
+async def categories(request):
+    etag, last_modified = await acatalogue_validators("categories")
+    response = not_modified(request, etag, last_modified)
+    if response is None:
+
+        async def build():
+            categories = [category async for category in Category.objects.all()]
+            return CategorySerializer(categories, many=True).data
+
+        data = await acached_catalogue("categories", build)
+        response = render(request, data)
+    return set_validators(response, etag, last_modified)
+
+
+@async_read_view(views.single_order)
+async def single_order(request, id):
+    try:
+        order = await Order.objects.with_users().aget(id=id)
+    except Order.DoesNotExist:
+        raise Http404("No Order matches the given query.")
+    if order.user_id != request.user.pk and MANAGER not in await aget_roles(request):
+        return render(
+            request,
+            {"error": "You are not authorized to view this order."},
+            status.HTTP_403_FORBIDDEN,
+        )
+    etag, last_modified = await aorder_validators(order)
+    response = not_modified(request, etag, last_modified)
+    if response is None:
+        await aprefetch_related_objects([order], order_items_prefetch())
+        response = render(request, OrderSerializer(order).data)
+    return set_validators(response, etag, last_modified)
+
+
+@csrf_exempt
+async def order_events(request):
+    """
+    Server-sent events for the user's orders, their delivery queue for crew
+    members and every order for managers. Reconnecting clients resume after
+    the Last-Event-ID header (or ?last_event_id=).
+    """
+    drf_request = make_request(request)
+    drf_request.accepted_renderer = JSONRenderer()
+    drf_request.accepted_media_type = JSONRenderer.media_type
+    if request.method != "GET":
+        return handle_exception(drf_request, exceptions.MethodNotAllowed(request.method))
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would be held for as long as the client listens.
+        return render(
+            drf_request,
+            {"error": "Order events are only served by the ASGI application."},
+            status.HTTP_501_NOT_IMPLEMENTED,
+        )
+    try:
+        await initial(drf_request)
+        last_event_id = request.headers.get("Last-Event-ID") or request.GET.get(
+            "last_event_id"
+        )
+        if last_event_id is not None:
+            try:
+                last_event_id = int(last_event_id)
+            except ValueError:
+                raise exceptions.ValidationError({"last_event_id": "Must be an integer."})
+    except Exception as exc:
+        return handle_exception(drf_request, exc)
+
+    user = drf_request.user
+    roles = await aget_roles(drf_request)
+    channels = [user_channel(user.pk)]
+    if DELIVERY_CREW in roles:
+        channels.append(crew_channel(user.pk))
+    if MANAGER in roles:
+        channels.append(MANAGERS)
+    subscription = bus.subscribe(channels, last_event_id)
+    response = StreamingHttpResponse(
+        event_stream(subscription, settings.ORDER_EVENT_HEARTBEAT),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx from buffering the stream.
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,179 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+
+def get_auth_cache():
+    return caches[settings.AUTH_CACHE_ALIAS]
+
+
+def token_cache_key(key):
+    return f"auth-token:{key}"
+
+
+def user_cache_key(pk):
+    return f"auth-user:{pk}"
+
+
+def cached_fields(model):
+    # Never the password hash; it loads from the database if read.
+    return [
+        field.attname
+        for field in model._meta.concrete_fields
+        if field.attname != "password"
+    ]
+
+
+def cache_user(user):
+    """
+    Cache ``user``'s fields, less the password, with their group names,
+    which get_roles() then reuses.
+    """
+    user._roles = frozenset(user.groups.values_list("name", flat=True))
+    values = [getattr(user, name) for name in cached_fields(type(user))]
+    get_auth_cache().set(
+        user_cache_key(user.pk), (values, user._roles), settings.AUTH_CACHE_TIMEOUT
+    )
+    return user
+
+
+def get_cached_user(pk):
+    """The user cached by cache_user(), with the password deferred, or None."""
+    cached = get_auth_cache().get(user_cache_key(pk))
+    if cached is None:
+        return None
+    values, roles = cached
+    model = get_user_model()
+    user = model.from_db(router.db_for_read(model), cached_fields(model), values)
+    user._roles = roles
+    return user
+
+
+def forget_users(pks):
+    keys = [user_cache_key(pk) for pk in pks]
+    if keys:
+        cache = get_auth_cache()
+        cache.delete_many(keys)
+        # A request reading the old row before commit may re-cache it.
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def forget_tokens(keys):
+    keys = [token_cache_key(key) for key in keys]
+    if keys:
+        get_auth_cache().delete_many(keys)
+
+
+def authenticated(request, user, auth):
+    request._roles = user._roles
+    return user, auth
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that caches token -> user, with the user's group
+    names, for AUTH_CACHE_TIMEOUT seconds. Deleting the token and saving,
+    deleting or regrouping the user drop the entries (see signals.py); the
+    timeout bounds staleness for per-process caches and queryset updates.
+    """
+
+    def get_key(self, request):
+        """The token in the Authorization header, or None for other schemes."""
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) == 1:
+            msg = _("Invalid token header. No credentials provided.")
+            raise exceptions.AuthenticationFailed(msg)
+        elif len(auth) > 2:
+            msg = _("Invalid token header. Token string should not contain spaces.")
+            raise exceptions.AuthenticationFailed(msg)
+        try:
+            return auth[1].decode()
+        except UnicodeError:
+            msg = _(
+                "Invalid token header. Token string should not contain invalid characters."
+            )
+            raise exceptions.AuthenticationFailed(msg)
+
+    def cached_user(self, key):
+        user_id = get_auth_cache().get(token_cache_key(key))
+        return None if user_id is None else get_cached_user(user_id)
+
+    def load_user(self, key):
+        model = self.get_model()
+        try:
+            token = model.objects.select_related("user").get(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_("Invalid token."))
+        user = cache_user(token.user)
+        get_auth_cache().set(token_cache_key(key), user.pk, settings.AUTH_CACHE_TIMEOUT)
+        return user
+
+    def credentials(self, request, user, key):
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+        return authenticated(request, user, self.get_model()(key=key, user=user))
+
+    def authenticate(self, request):
+        key = self.get_key(request)
+        if key is None:
+            return None
+        user = self.cached_user(key) or self.load_user(key)
+        return self.credentials(request, user, key)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that caches the token's user, with their group names,
+    like CachedTokenAuthentication. Blacklisting one of the user's refresh
+    tokens drops the entry too; access tokens stay valid until they expire,
+    as they do without the cache. Entries are keyed by primary key, so
+    SIMPLE_JWT's USER_ID_FIELD must be the primary key (the default).
+    """
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    def cached_user(self, user_id):
+        return get_cached_user(user_id)
+
+    def load_user(self, user_id):
+        try:
+            user = self.user_model.objects.get(**{jwt_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_("User not found"), code="user_not_found")
+        return cache_user(user)
+
+    def get_token(self, request):
+        """The validated token in the Authorization header, or None."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        return self.get_validated_token(raw_token)
+
+    def authenticate(self, request):
+        token = self.get_token(request)
+        if token is None:
+            return None
+        user_id = self.get_user_id(token)
+        user = self.cached_user(user_id) or self.load_user(user_id)
+        return self.credentials(request, user, token)
+
+    def credentials(self, request, user, token):
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return authenticated(request, user, token)
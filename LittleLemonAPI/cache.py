@@ -0,0 +1,136 @@
+import os
+import secrets
+import threading
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+
+VERSION_KEY = "catalogue-version"
+MODIFIED_KEY = "catalogue-modified"
+QUERY_PARAMS = (
+    "category",
+    "category_id",
+    "featured",
+    "to_price",
+    "search",
+    "ordering",
+    "perpage",
+    "cursor",
+    "count",
+)
+
+# Per process: counting in the shared cache would cost a write per read.
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[settings.CATALOGUE_CACHE_ALIAS]
+
+
+def new_version():
+    # From the clock rather than a counter so an evicted version key can't
+    # resurrect pages cached under an older version, plus random digits so
+    # processes bumping at the same microsecond still differ.
+    return time.time_ns() // 1000 * 1000 + secrets.randbelow(1000)
+
+
+def catalogue_version():
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, new_version(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+async def acatalogue_version():
+    """catalogue_version() for async views."""
+    cache = get_cache()
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, new_version(), timeout=None)
+        version = await cache.aget(VERSION_KEY)
+    return version
+
+
+def bump_catalogue_version():
+    """
+    Move the catalogue to a fresh version. A plain set rather than incr,
+    which file-based caches implement as get-then-set: two concurrent bumps
+    could both write the same next version and keep pages cached between
+    them alive.
+    """
+    cache = get_cache()
+    cache.set(VERSION_KEY, new_version(), timeout=None)
+    cache.set(MODIFIED_KEY, int(time.time()), timeout=None)
+
+
+def catalogue_last_modified():
+    return get_cache().get(MODIFIED_KEY)
+
+
+async def acatalogue_last_modified():
+    return await get_cache().aget(MODIFIED_KEY)
+
+
+def page_key(name, request=None):
+    if request is None:
+        return name
+    params = [
+        (param, request.query_params[param])
+        for param in QUERY_PARAMS
+        if request.query_params.get(param)
+    ]
+    return f"{name}?{urlencode(params)}"
+
+
+def cached_catalogue(name, build, request=None):
+    """
+    Return the serialized catalogue data for ``name`` (and the request's
+    catalogue query parameters), calling ``build`` only on a miss.
+    """
+    cache, key, version, data = lookup_catalogue(name, request)
+    if data is None:
+        data = build()
+        cache.set(key, data, settings.CATALOGUE_CACHE_TIMEOUT, version=version)
+    return data
+
+
+async def acached_catalogue(name, build, request=None):
+    """cached_catalogue() for async views; ``build`` is a coroutine function."""
+    cache = get_cache()
+    version = await acatalogue_version()
+    key = page_key(name, request)
+    data = count_lookup(await cache.aget(key, version=version))
+    if data is None:
+        data = await build()
+        await cache.aset(key, data, settings.CATALOGUE_CACHE_TIMEOUT, version=version)
+    return data
+
+
+def lookup_catalogue(name, request=None):
+    cache = get_cache()
+    version = catalogue_version()
+    key = page_key(name, request)
+    data = count_lookup(cache.get(key, version=version))
+    return cache, key, version, data
+
+
+def count_lookup(data):
+    with _stats_lock:
+        _stats["misses" if data is None else "hits"] += 1
+    return data
+
+
+def cache_stats():
+    """This worker's hit and miss counts, labelled with its process id."""
+    with _stats_lock:
+        return {**_stats, "worker": os.getpid()}
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.update(hits=0, misses=0)
@@ -0,0 +1,42 @@
+from django.db import transaction
+from django.db.models import Sum
+
+from .events import publish_order
+from .models import Cart, Order, OrderItem
+from .rollups import record_order
+
+
+def place_order(user):
+    """
+    Turn the user's cart into an order with a fixed number of statements,
+    whatever the cart size. Returns None when the cart is empty.
+    """
+    with transaction.atomic():
+        lines = list(
+            Cart.objects.filter(user=user).only(
+                "id", "menuitem_id", "quantity", "unit_price", "price"
+            )
+        )
+        if not lines:
+            return None
+        # Work on the ids read above so a line added concurrently stays in
+        # the cart instead of being deleted without being ordered.
+        carts = Cart.objects.filter(id__in=[line.id for line in lines])
+        total = carts.aggregate(total=Sum("price"))["total"]
+        order = Order.objects.create(user=user, total=total)
+        OrderItem.objects.bulk_create(
+            OrderItem(
+                order=order,
+                menuitem_id=line.menuitem_id,
+                quantity=line.quantity,
+                unit_price=line.unit_price,
+                price=line.price,
+            )
+            for line in lines
+        )
+        record_order(
+            order, [(line.menuitem_id, line.quantity, line.price) for line in lines]
+        )
+        carts.delete()
+        publish_order("order.placed", order)
+    return order
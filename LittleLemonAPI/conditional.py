@@ -0,0 +1,72 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .cache import (
+    acatalogue_last_modified,
+    acatalogue_version,
+    catalogue_last_modified,
+    catalogue_version,
+    page_key,
+)
+
+
+def make_etag(*parts):
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode())
+    return quote_etag(digest.hexdigest())
+
+
+def catalogue_validators(name, request=None):
+    """ETag and Last-Modified for a catalogue page, without touching the DB."""
+    etag = make_etag(catalogue_version(), page_key(name, request))
+    return etag, catalogue_last_modified()
+
+
+async def acatalogue_validators(name, request=None):
+    etag = make_etag(await acatalogue_version(), page_key(name, request))
+    return etag, await acatalogue_last_modified()
+
+
+def order_validators(order):
+    """
+    ETag and Last-Modified for a single order. Order items embed live menu
+    item data and the order embeds its users, so those feed the ETag too.
+    """
+    return make_order_validators(order, catalogue_version(), catalogue_last_modified())
+
+
+async def aorder_validators(order):
+    return make_order_validators(
+        order, await acatalogue_version(), await acatalogue_last_modified()
+    )
+
+
+def make_order_validators(order, version, catalogue_modified):
+    etag = make_etag(
+        order.id,
+        order.updated_at.isoformat(),
+        version,
+        order.user.username,
+        order.user.email,
+        order.delivery_crew and order.delivery_crew.username,
+        order.delivery_crew and order.delivery_crew.email,
+    )
+    last_modified = int(order.updated_at.timestamp())
+    if catalogue_modified is not None:
+        last_modified = max(last_modified, catalogue_modified)
+    return etag, last_modified
+
+
+def not_modified(request, etag, last_modified=None):
+    """Return a 304 response if the request's validators still match."""
+    return get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+
+
+def set_validators(response, etag, last_modified=None):
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    return response
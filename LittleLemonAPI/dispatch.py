@@ -0,0 +1,144 @@
+import heapq
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.exceptions import APIException
+
+from .events import publish_order
+from .models import Order
+from .permissions import DELIVERY_CREW, get_group_id
+
+Status = Order.Status
+
+TRANSITIONS = {
+    Status.PLACED: {Status.ASSIGNED},
+    Status.ASSIGNED: {Status.PLACED, Status.OUT_FOR_DELIVERY},
+    Status.OUT_FOR_DELIVERY: {Status.DELIVERED},
+    Status.DELIVERED: set(),
+}
+
+# Orders that count towards a crew member's load.
+OPEN = [Status.ASSIGNED, Status.OUT_FOR_DELIVERY]
+
+UNSET = object()
+
+
+class Conflict(APIException):
+    status_code = 409
+    default_detail = "The order was changed by someone else; reload and retry."
+    default_code = "conflict"
+
+
+class OrderDispatchSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=Status.choices, required=False)
+    delivery_crew_id = serializers.PrimaryKeyRelatedField(
+        source="delivery_crew",
+        queryset=User.objects.filter(groups__name=DELIVERY_CREW),
+        required=False,
+        allow_null=True,
+    )
+
+
+def update_dispatch(order, status=None, delivery_crew=UNSET):
+    """
+    Move ``order`` along the status workflow and/or (re)assign its crew.
+    Assigning a crew member implies ``assigned``; going back to ``placed``
+    unassigns. The write only applies if nobody changed the order since it
+    was read, otherwise Conflict is raised.
+    """
+    changes = {}
+    if delivery_crew is not UNSET:
+        if order.status not in (Status.PLACED, Status.ASSIGNED):
+            raise serializers.ValidationError(
+                {"delivery_crew_id": f"A {order.status} order cannot be reassigned."}
+            )
+        changes["delivery_crew"] = delivery_crew
+        status = status or (Status.ASSIGNED if delivery_crew else Status.PLACED)
+    if status and status != order.status:
+        if status not in TRANSITIONS[order.status]:
+            raise serializers.ValidationError(
+                {"status": f"A {order.status} order cannot become {status}."}
+            )
+        changes["status"] = status
+        if status == Status.PLACED:
+            changes["delivery_crew"] = None
+
+    crew = changes.get("delivery_crew", order.delivery_crew)
+    if changes.get("status", order.status) == Status.PLACED:
+        if crew is not None:
+            raise serializers.ValidationError(
+                {"status": "An assigned order cannot be placed."}
+            )
+    elif crew is None:
+        raise serializers.ValidationError(
+            {"delivery_crew_id": "The order needs a delivery crew member."}
+        )
+    if not changes:
+        return order
+
+    previous_crew_id = order.delivery_crew_id
+    changes["updated_at"] = timezone.now()
+    updated = Order.objects.filter(
+        pk=order.pk, status=order.status, delivery_crew=order.delivery_crew_id
+    ).update(**changes)
+    if not updated:
+        raise Conflict()
+    for field, value in changes.items():
+        setattr(order, field, value)
+    publish_order("order.updated", order, previous_crew_id)
+    return order
+
+
+def crew_loads():
+    """Active delivery crew ids -> their open order count."""
+    crews = (
+        User.objects.filter(groups=get_group_id(DELIVERY_CREW), is_active=True)
+        .annotate(load=Count("delivery_crew", filter=Q(delivery_crew__status__in=OPEN)))
+        .values_list("id", "load")
+    )
+    return dict(crews)
+
+
+def assign_orders(batch_size=100):
+    """
+    Assign up to ``batch_size`` of the oldest unassigned orders, each to the
+    least loaded crew member. Rows are claimed with SKIP LOCKED where the
+    database supports it, and every UPDATE re-checks that the order is still
+    unassigned, so concurrent dispatchers never assign an order twice.
+    Each assigned order is published once the transaction commits.
+    Returns the number of orders assigned.
+    """
+    with transaction.atomic():
+        loads = crew_loads()
+        if not loads:
+            return 0
+        order_ids = list(
+            Order.objects.select_for_update(skip_locked=True, of=("self",))
+            .filter(delivery_crew=None, status=Status.PLACED)
+            .order_by("date", "id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        heap = [(load, crew_id) for crew_id, load in loads.items()]
+        heapq.heapify(heap)
+        batches = {}
+        for order_id in order_ids:
+            load, crew_id = heapq.heappop(heap)
+            batches.setdefault(crew_id, []).append(order_id)
+            heapq.heappush(heap, (load + 1, crew_id))
+
+        now = timezone.now()
+        assigned = 0
+        for crew_id, ids in batches.items():
+            assigned += Order.objects.filter(
+                id__in=ids, delivery_crew=None, status=Status.PLACED
+            ).update(delivery_crew_id=crew_id, status=Status.ASSIGNED, updated_at=now)
+        if assigned:
+            # Orders claimed by someone else in between kept their updated_at.
+            for order in Order.objects.filter(
+                id__in=order_ids, status=Status.ASSIGNED, updated_at=now
+            ).order_by("id"):
+                publish_order("order.updated", order)
+    return assigned
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+MANAGERS = "managers"
+
+# Sent when a subscriber may have missed events (resumed from an id that
+# is no longer buffered, or fell behind): reload orders, then carry on.
+RESET = "event: reset\ndata: {}\n\n"
+
+HEARTBEAT = ": heartbeat\n\n"
+
+
+def user_channel(pk):
+    return f"user:{pk}"
+
+
+def crew_channel(pk):
+    return f"crew:{pk}"
+
+
+class Event:
+    __slots__ = ("id", "type", "channels", "message")
+
+    def __init__(self, id, type, data, channels):
+        self.id = id
+        self.type = type
+        self.channels = channels
+        # Encoded once, however many subscribers receive it.
+        data = json.dumps(data, cls=DjangoJSONEncoder, separators=(",", ":"))
+        self.message = f"id: {id}\nevent: {type}\ndata: {data}\n\n"
+
+
+class Subscription:
+    def __init__(self, bus, channels, loop, queue_size):
+        self.bus = bus
+        self.channels = channels
+        self.loop = loop
+        self.queue = asyncio.Queue(queue_size)
+        self.backlog = []
+        self.missed = False
+        self.closed = False
+
+    def deliver(self, event):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.missed = True
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.bus.unsubscribe(self)
+
+
+def deliver(subscriptions, event):
+    for subscription in subscriptions:
+        subscription.deliver(event)
+
+
+class EventBus:
+    """
+    In-process pub/sub for order events. Publishers may run in any thread;
+    each subscriber belongs to an event loop and gets events through a
+    bounded queue, with one loop callback per publish however many
+    subscribers it reaches. The last ``history`` events are kept so a
+    reconnecting client can resume from its Last-Event-ID.
+
+    Only subscribers in the publishing process see an event, so streams
+    should be served by the process that handles the writes (e.g. a
+    single ASGI worker).
+    """
+
+    def __init__(self, history=1000, queue_size=100):
+        self.lock = threading.Lock()
+        self.history = deque(maxlen=history)
+        self.queue_size = queue_size
+        self.subscriptions = defaultdict(set)
+        # Seeded from the clock so ids keep growing across restarts and an
+        # id from a previous run is always detected as a gap.
+        self.last_id = time.time_ns() // 1000
+        self.first_id = self.last_id + 1
+
+    def publish(self, type, data, channels):
+        with self.lock:
+            self.last_id += 1
+            event = Event(self.last_id, type, data, frozenset(channels))
+            if len(self.history) == self.history.maxlen:
+                self.first_id = self.history[0].id + 1
+            self.history.append(event)
+            loops = defaultdict(list)
+            for channel in event.channels:
+                for subscription in self.subscriptions.get(channel, ()):
+                    loops[subscription.loop].append(subscription)
+        for loop, subscriptions in loops.items():
+            # A subscriber on several of the event's channels gets it once.
+            subscriptions = list(dict.fromkeys(subscriptions))
+            try:
+                loop.call_soon_threadsafe(deliver, subscriptions, event)
+            except RuntimeError:
+                # The loop is closed; its streams are gone.
+                pass
+        return event
+
+    def subscribe(self, channels, last_event_id=None):
+        """
+        Subscribe the running event loop to ``channels``. With
+        ``last_event_id`` the subscription starts with the buffered events
+        after it, or is marked ``missed`` if some are no longer buffered.
+        """
+        subscription = Subscription(
+            self, frozenset(channels), asyncio.get_running_loop(), self.queue_size
+        )
+        with self.lock:
+            for channel in subscription.channels:
+                self.subscriptions[channel].add(subscription)
+            if last_event_id is not None:
+                if not self.first_id - 1 <= last_event_id <= self.last_id:
+                    subscription.missed = True
+                else:
+                    subscription.backlog = [
+                        event
+                        for event in self.history
+                        if event.id > last_event_id
+                        and event.channels & subscription.channels
+                    ]
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                subscribers = self.subscriptions.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self.subscriptions[channel]
+
+
+bus = EventBus(settings.ORDER_EVENT_HISTORY)
+
+
+def publish_order(type, order, previous_crew_id=None):
+    """
+    Publish ``order``'s current state to its customer, its delivery crew
+    member (and the one it was taken from) and managers, once the current
+    transaction commits.
+    """
+    channels = {MANAGERS, user_channel(order.user_id)}
+    for crew_id in (order.delivery_crew_id, previous_crew_id):
+        if crew_id is not None:
+            channels.add(crew_channel(crew_id))
+    data = {
+        "id": order.id,
+        "user_id": order.user_id,
+        "delivery_crew_id": order.delivery_crew_id,
+        "status": order.status,
+        "total": f"{order.total:.2f}",
+        "updated_at": order.updated_at,
+    }
+    transaction.on_commit(lambda: bus.publish(type, data, channels))
+
+
+async def event_stream(subscription, heartbeat):
+    """SSE messages for ``subscription``, with a comment every ``heartbeat`` seconds."""
+    try:
+        if subscription.missed:
+            subscription.missed = False
+            yield RESET
+        for event in subscription.backlog:
+            yield event.message
+        subscription.backlog = []
+        while True:
+            if subscription.missed:
+                subscription.missed = False
+                yield RESET
+            try:
+                event = await subscription.get(heartbeat)
+            except TimeoutError:
+                yield HEARTBEAT
+                continue
+            yield event.message
+    finally:
+        subscription.close()
@@ -0,0 +1,101 @@
+from rest_framework import serializers
+
+from .cache import acached_catalogue, cached_catalogue
+from .models import Category
+from .search import search_menu_items
+
+# Client ordering -> keyset keys. Every entry is served by an index on its
+# own and behind the category_id / featured equality filters (see
+# MenuItem.Meta.indexes); keys run in one direction so the index can be
+# walked backwards for descending orders.
+MENU_ITEM_ORDERINGS = {
+    "price": ["price", "id"],
+    "-price": ["-price", "-id"],
+    "price_after_tax": ["price_after_tax", "id"],
+    "-price_after_tax": ["-price_after_tax", "-id"],
+    "title": ["title", "id"],
+    "-title": ["-title", "-id"],
+    "rank": ["rank", "id"],
+}
+
+# The to_price range only leaves the price index usable for ordering; any
+# other ordering would sort the whole range.
+TO_PRICE_ORDERINGS = {"price", "-price", "rank"}
+
+
+class MenuItemFilterSerializer(serializers.Serializer):
+    category = serializers.CharField(required=False)
+    category_id = serializers.IntegerField(required=False)
+    featured = serializers.BooleanField(required=False, default=None, allow_null=True)
+    to_price = serializers.DecimalField(max_digits=6, decimal_places=2, required=False)
+    search = serializers.CharField(required=False)
+    ordering = serializers.ChoiceField(choices=list(MENU_ITEM_ORDERINGS), required=False)
+
+    def validate(self, attrs):
+        if attrs.get("ordering") == "rank" and not attrs.get("search"):
+            raise serializers.ValidationError(
+                {"ordering": "rank ordering requires a search."}
+            )
+        ordering = attrs.get("ordering")
+        if attrs.get("to_price") is not None and ordering:
+            if ordering not in TO_PRICE_ORDERINGS:
+                raise serializers.ValidationError(
+                    {"ordering": "to_price can only be combined with price ordering."}
+                )
+        return attrs
+
+
+def category_map(rows):
+    ids = {}
+    for pk, slug, title in rows:
+        ids.setdefault(title, pk)
+        ids[slug] = pk
+    return ids
+
+
+def category_ids():
+    """Category slug and title -> id, cached with the rest of the catalogue."""
+
+    def build():
+        return category_map(Category.objects.values_list("id", "slug", "title"))
+
+    return cached_catalogue("category-ids", build)
+
+
+async def acategory_ids():
+    async def build():
+        rows = Category.objects.values_list("id", "slug", "title")
+        return category_map([row async for row in rows])
+
+    return await acached_catalogue("category-ids", build)
+
+
+def filter_menu_items(queryset, query_params, categories=None):
+    """
+    Apply the catalogue filters in ``query_params`` and return the queryset
+    with the keyset keys for the requested ordering. ``categories`` is the
+    category_ids() mapping, read here when not given.
+    """
+    # A plain dict: DRF reads a boolean missing from a QueryDict as False.
+    params = MenuItemFilterSerializer(data=query_params.dict())
+    params.is_valid(raise_exception=True)
+    params = params.validated_data
+
+    category_id = params.get("category_id")
+    if params.get("category"):
+        if categories is None:
+            categories = category_ids()
+        category_id = categories.get(params["category"])
+        if category_id is None:
+            queryset = queryset.none()
+    if category_id is not None:
+        queryset = queryset.filter(category_id=category_id)
+    if params["featured"] is not None:
+        queryset = queryset.filter(featured=params["featured"])
+    if params.get("to_price") is not None:
+        queryset = queryset.filter(price__lte=params["to_price"])
+    if params.get("search"):
+        queryset = search_menu_items(queryset, params["search"])
+
+    ordering = params.get("ordering") or ("rank" if params.get("search") else "price")
+    return queryset, MENU_ITEM_ORDERINGS[ordering]
@@ -0,0 +1,145 @@
+import codecs
+import csv
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import BaseParser
+
+from .cache import bump_catalogue_version
+from .models import Category, MenuItem
+from .tax import price_after_tax
+
+# Written on every upsert; bulk writes skip MenuItem.save(), so
+# price_after_tax and updated_at are filled in here.
+UPSERT_FIELDS = [
+    "title",
+    "price",
+    "featured",
+    "category_id",
+    "inventory",
+    "price_after_tax",
+    "updated_at",
+]
+
+
+class MenuImportItemSerializer(serializers.Serializer):
+    sku = serializers.CharField(max_length=64)
+    title = serializers.CharField(max_length=255)
+    price = serializers.DecimalField(max_digits=6, decimal_places=2, min_value=0)
+    category = serializers.CharField(help_text="Category slug.")
+    featured = serializers.BooleanField(required=False)
+    stock = serializers.IntegerField(required=False, min_value=0)
+
+
+class MenuCSVParser(BaseParser):
+    """CSV with a header row, parsed into one dict per line."""
+
+    media_type = "text/csv"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get("encoding", settings.DEFAULT_CHARSET)
+        if stream is None:
+            return []
+        return csv_rows(codecs.getreader(encoding)(stream))
+
+
+def csv_rows(lines):
+    # Empty cells mean "not given", so optional columns can be left blank.
+    return [
+        {key: value for key, value in row.items() if value not in ("", None)}
+        for row in csv.DictReader(lines)
+    ]
+
+
+def validate_rows(rows):
+    """
+    Validate import ``rows`` and resolve their categories with one query.
+    Raises ValidationError with the errors of every bad row, keyed by
+    position.
+    """
+    if not isinstance(rows, list):
+        raise ValidationError({"items": "Expected a list of menu items."})
+    serializer = MenuImportItemSerializer(data=rows, many=True)
+    if not serializer.is_valid():
+        errors = serializer.errors
+        if isinstance(errors, list):
+            errors = {n: error for n, error in enumerate(errors) if error}
+        raise ValidationError({"errors": errors})
+    items = serializer.validated_data
+
+    slugs = {item["category"] for item in items}
+    categories = dict(
+        Category.objects.filter(slug__in=slugs).values_list("slug", "id")
+    )
+    errors, seen = {}, set()
+    for n, item in enumerate(items):
+        if item["category"] not in categories:
+            errors[n] = {"category": [f"Unknown category {item['category']!r}."]}
+        elif item["sku"] in seen:
+            errors[n] = {"sku": [f"Duplicate sku {item['sku']!r}."]}
+        seen.add(item["sku"])
+    if errors:
+        raise ValidationError({"errors": errors})
+    return items, categories
+
+
+def import_menu(rows, batch_size=1000, dry_run=False):
+    """
+    Create or update menu items from ``rows`` keyed on ``sku``, in batches
+    of ``batch_size`` inside one transaction: one read and at most one
+    INSERT ... ON CONFLICT DO UPDATE per batch. Items missing ``featured``
+    or ``stock`` keep their current values. Returns the created, updated
+    and unchanged counts; ``dry_run`` only counts.
+    """
+    items, categories = validate_rows(rows)
+    counts = {"created": 0, "updated": 0, "unchanged": 0}
+    now = timezone.now()
+    compared = UPSERT_FIELDS[:-1]
+    with transaction.atomic():
+        iterator = iter(items)
+        while batch := list(islice(iterator, batch_size)):
+            existing = {
+                values[0]: dict(zip(compared, values[1:]))
+                for values in MenuItem.objects.filter(
+                    sku__in=[item["sku"] for item in batch]
+                ).values_list("sku", *compared)
+            }
+            writes = []
+            for item in batch:
+                current = existing.get(item["sku"])
+                values = {
+                    "title": item["title"],
+                    "price": item["price"],
+                    "featured": item.get(
+                        "featured", current["featured"] if current else False
+                    ),
+                    "category_id": categories[item["category"]],
+                    "inventory": item.get(
+                        "stock", current["inventory"] if current else 0
+                    ),
+                    "price_after_tax": price_after_tax(item["price"], item["category"]),
+                }
+                if current is None:
+                    counts["created"] += 1
+                elif values == current:
+                    counts["unchanged"] += 1
+                    continue
+                else:
+                    counts["updated"] += 1
+                writes.append(MenuItem(sku=item["sku"], updated_at=now, **values))
+            if writes and not dry_run:
+                MenuItem.objects.bulk_create(
+                    writes,
+                    update_conflicts=True,
+                    unique_fields=["sku"],
+                    update_fields=UPSERT_FIELDS,
+                )
+        if not dry_run and (counts["created"] or counts["updated"]):
+            # Bulk writes skip the post_save catalogue signal; the FTS
+            # triggers still index titles.
+            transaction.on_commit(bump_catalogue_version)
+    return counts
@@ -0,0 +1,63 @@
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, When
+from django.utils import timezone
+
+from .cache import bump_catalogue_version
+from .models import Cart, MenuItem
+
+
+def reserve_inventory(menuitem_id, quantity):
+    """
+    Take ``quantity`` units of stock with a single conditional UPDATE.
+
+    Returns False, leaving the row untouched, when there isn't enough stock.
+    Queryset updates skip post_save; the catalogue cache is invalidated
+    only when the item sells out, see sold_out_changed().
+    """
+    with transaction.atomic():
+        reserved = MenuItem.objects.filter(
+            id=menuitem_id, inventory__gte=quantity
+        ).update(inventory=F("inventory") - quantity, updated_at=timezone.now())
+        if reserved and MenuItem.objects.filter(id=menuitem_id, inventory=0).exists():
+            sold_out_changed()
+    return bool(reserved)
+
+
+def sold_out_changed():
+    """
+    Invalidate the catalogue once the transaction commits. Cart writes are
+    the busiest write path, so they only do this when an item sells out or
+    comes back; in between, cached catalogue pages may show an older stock
+    count, while reservations always check the live one.
+    """
+    transaction.on_commit(bump_catalogue_version)
+
+
+def clear_cart(user):
+    """
+    Delete the user's cart and put its stock back with one CASE UPDATE and
+    one DELETE, however many lines the cart has. Returns False when the
+    cart is already empty.
+    """
+    with transaction.atomic():
+        lines = list(
+            Cart.objects.filter(user=user).values_list("id", "menuitem_id", "quantity")
+        )
+        if not lines:
+            return False
+        items = MenuItem.objects.filter(id__in=[line[1] for line in lines])
+        restocked = items.filter(inventory=0).exists()
+        items.update(
+            inventory=Case(
+                *(
+                    When(id=menuitem_id, then=F("inventory") + quantity)
+                    for _, menuitem_id, quantity in lines
+                ),
+                output_field=IntegerField(),
+            ),
+            updated_at=timezone.now(),
+        )
+        Cart.objects.filter(id__in=[line[0] for line in lines]).delete()
+        if restocked:
+            sold_out_changed()
+    return True
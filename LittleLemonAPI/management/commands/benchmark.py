@@ -0,0 +1,541 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.models import Count, Sum
+from django.utils import timezone
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from LittleLemonAPI.cache import get_cache
+from LittleLemonAPI.checkout import place_order
+from LittleLemonAPI.events import EventBus
+from LittleLemonAPI.exports import export_chunks, export_orders
+from LittleLemonAPI.imports import import_menu
+from LittleLemonAPI.models import (
+    Cart,
+    Category,
+    DailyItemSales,
+    DailySales,
+    MenuItem,
+    Order,
+    OrderItem,
+)
+from LittleLemonAPI.pagination import KeysetPaginator
+from LittleLemonAPI.rollups import rebuild_rollups, sales_report
+from LittleLemonAPI.rows import MENU_ITEM
+from LittleLemonAPI.search import search_menu_items
+from LittleLemonAPI.serializers import MenuItemSerializer
+
+try:
+    from LittleLemonAPI.renderers import ORJSONRenderer as FastRenderer
+except ImportError:
+    FastRenderer = JSONRenderer
+
+
+def timed(func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+WORDS = (
+    "lasanha frango salada sopa pizza bolo torta arroz feijao peixe carne "
+    "queijo tomate alho cebola batata creme molho limao laranja"
+).split()
+
+
+def create_menu(rows):
+    category = Category.objects.create(slug="bench", title="Bench")
+    MenuItem.objects.bulk_create(
+        (
+            MenuItem(
+                title=f"{WORDS[n % 20]} {WORDS[n // 20 % 20]} {n}",
+                price=Decimal(n % 5000) / 100,
+                category=category,
+                inventory=100,
+            )
+            for n in range(rows)
+        ),
+        batch_size=5000,
+    )
+    return category
+
+
+def api_client():
+    client = APIClient()
+    client.force_authenticate(User.objects.create(username="benchmark"))
+    return client
+
+
+def bench_pagination(command, rows):
+    perpage = 20
+    # Page 2 at least: the deep page's cursor is the last row of the one before.
+    create_menu(max(rows, 2 * perpage))
+    client = api_client()
+    page = max(2, min(1000, rows // perpage))
+    paginator = KeysetPaginator(["price", "id"])
+    ordered = MenuItem.objects.order_by("price", "id")
+    cursor = paginator.encode(ordered[(page - 1) * perpage - 1])
+
+    keyset_first = timed(lambda: client.get("/api/menu-items/", {"perpage": perpage}))
+    keyset_deep = timed(
+        lambda: client.get("/api/menu-items/", {"perpage": perpage, "cursor": cursor})
+    )
+    offset_first = timed(lambda: list(ordered[:perpage]) and ordered.count())
+    offset_deep = timed(
+        lambda: list(ordered[(page - 1) * perpage:page * perpage]) and ordered.count()
+    )
+    command.report("keyset page 1", keyset_first)
+    command.report(f"keyset page {page}", keyset_deep)
+    command.report("offset page 1", offset_first)
+    command.report(f"offset page {page}", offset_deep)
+
+
+def bench_checkout(command, rows):
+    create_menu(max(rows, 200))
+    items = list(MenuItem.objects.all()[:200])
+    user = User.objects.create(username="checkout")
+    for size in (1, 10, 30, 100, 200):
+        best = None
+        for _ in range(5):
+            Cart.objects.bulk_create(
+                Cart(
+                    user=user,
+                    menuitem=item,
+                    quantity=1,
+                    unit_price=item.price,
+                    price=item.price,
+                )
+                for item in items[:size]
+            )
+            elapsed = timed(lambda: place_order(user), repeat=1)
+            best = elapsed if best is None else min(best, elapsed)
+        command.report(f"checkout, {size} cart lines", best)
+
+
+def bench_search(command, rows):
+    create_menu(rows)
+    items = MenuItem.objects.order_by("price", "id")
+
+    def contains(text):
+        return lambda: list(items.filter(title__contains=text)[:20])
+
+    def fts(text, *ordering):
+        return lambda: list(search_menu_items(items, text).order_by(*ordering)[:20])
+
+    for text in ("frango", "lasanha queijo", f"{rows - 1}"):
+        command.report(f"contains {text!r}", timed(contains(text)))
+        command.report(f"fts {text!r}", timed(fts(text, "price", "id")))
+        command.report(f"fts {text!r} by rank", timed(fts(text, "rank", "id")))
+
+
+def bench_analytics(command, rows):
+    create_menu(200)
+    items = list(MenuItem.objects.all())
+    user = User.objects.create(username="analytics")
+    today = timezone.localdate()
+    Order.objects.bulk_create(
+        (Order(user=user, total=Decimal("30.00")) for _ in range(rows)),
+        batch_size=5000,
+    )
+    # auto_now_add ignores assigned dates, so spread orders over a year here.
+    for day in range(365):
+        first, last = day * rows // 365, (day + 1) * rows // 365
+        Order.objects.filter(id__gt=first, id__lte=last).update(
+            date=today - timedelta(days=day)
+        )
+    OrderItem.objects.bulk_create(
+        (
+            OrderItem(
+                order_id=order_id,
+                menuitem=items[(order_id * 7 + n) % len(items)],
+                quantity=1,
+                unit_price=Decimal("10.00"),
+                price=Decimal("10.00"),
+            )
+            for order_id in Order.objects.values_list("id", flat=True).iterator()
+            for n in range(3)
+        ),
+        batch_size=5000,
+    )
+    rebuild = timed(
+        lambda: rebuild_rollups(Order, OrderItem, DailySales, DailyItemSales), repeat=1
+    )
+
+    def raw(start):
+        orders = Order.objects.filter(date__range=(start, today))
+        orders.aggregate(count=Count("id"), revenue=Sum("total"))
+        list(orders.values("date").annotate(revenue=Sum("total")).order_by("date"))
+        list(
+            OrderItem.objects.filter(order__date__range=(start, today))
+            .values("menuitem_id")
+            .annotate(quantity=Sum("quantity"))
+            .order_by("-quantity")[:10]
+        )
+
+    command.report("rebuild rollups", rebuild)
+    for days in (30, 365):
+        start = today - timedelta(days=days - 1)
+        command.report(f"raw orders, {days} days", timed(lambda: raw(start)))
+        command.report(
+            f"rollups, {days} days", timed(lambda: sales_report(start, today))
+        )
+
+
+def bench_import(command, rows):
+    category = Category.objects.create(slug="bench", title="Bench")
+    items = [
+        {
+            "sku": f"SKU-{n}",
+            "title": f"{WORDS[n % 20]} {WORDS[n // 20 % 20]} {n}",
+            "price": str(Decimal(n % 5000) / 100),
+            "category": "bench",
+            "stock": 100,
+        }
+        for n in range(rows)
+    ]
+
+    def one_by_one(rows):
+        for item in rows:
+            serializer = MenuItemSerializer(
+                data={**item, "sku": "ONE-" + item["sku"], "category_id": category.id}
+            )
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+
+    sample = items[:1000]
+    per_item = timed(lambda: one_by_one(sample), repeat=1) / len(sample)
+    MenuItem.objects.all().delete()
+    command.report(f"serializer per item, x{rows} (estimated)", per_item * rows)
+    command.report(f"import {rows} new", timed(lambda: import_menu(items), repeat=1))
+    command.report(f"import {rows} unchanged", timed(lambda: import_menu(items), repeat=1))
+    for item in items[::10]:
+        item["price"] = "99.99"
+    command.report(
+        f"import {rows}, 10% changed", timed(lambda: import_menu(items), repeat=1)
+    )
+
+
+def bench_export(command, rows):
+    """Stream ``rows`` order items (five per order) and report the peak RSS."""
+    create_menu(5)
+    items = list(MenuItem.objects.all())
+    user = User.objects.create(username="export")
+    for offset in range(0, rows // 5, 10_000):
+        orders = Order.objects.bulk_create(
+            Order(user=user, total=Decimal("10.00"))
+            for _ in range(min(10_000, rows // 5 - offset))
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(
+                order=order, menuitem=item, quantity=1, unit_price=2, price=2
+            )
+            for order in orders
+            for item in items
+        )
+    today = timezone.localdate()
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    for output in ("csv", "ndjson"):
+        size = 0
+
+        def export():
+            nonlocal size
+            chunks = export_chunks(output, export_orders(today, today))
+            size = sum(len(chunk) for chunk in chunks)
+
+        command.report(f"export {output}, {rows} items", timed(export, repeat=1))
+        command.stdout.write(f"{'':<40} {size / 2**20:10.1f} MB written")
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is a high-water mark (KiB on Linux), so this is how far the
+    # exports pushed it past what seeding the data already reached.
+    growth = (after - before) / 1024
+    command.stdout.write(f"{'peak RSS growth while exporting':<40} {growth:10.1f} MB")
+
+
+def bench_events(command, rows):
+    """Fan one event out to ``rows`` stream subscribers in one event loop."""
+
+    async def fan_out():
+        bus = EventBus()
+        subscriptions = [bus.subscribe(["managers"]) for _ in range(rows)]
+        start = time.perf_counter()
+        # Published from another thread, as a sync view would.
+        publisher = threading.Thread(
+            target=bus.publish, args=("order.placed", {"id": 1}, {"managers"})
+        )
+        publisher.start()
+        for subscription in subscriptions:
+            await subscription.get()
+        elapsed = time.perf_counter() - start
+        publisher.join()
+        return elapsed
+
+    best = min(asyncio.run(fan_out()) for _ in range(5))
+    command.report(f"fan out to {rows} subscribers", best * 1000)
+
+
+def bench_rows(command, rows):
+    """Serialize and render ``rows`` menu items with DRF and with the row mappers."""
+    create_menu(rows)
+    paths = {
+        "MenuItemSerializer + JSONRenderer": (
+            lambda: MenuItemSerializer(
+                MenuItem.objects.select_related("rating_stats"), many=True
+            ).data,
+            JSONRenderer(),
+        ),
+        f"MENU_ITEM rows + {FastRenderer.__name__}": (
+            lambda: MENU_ITEM.many(MENU_ITEM.values(MenuItem.objects.all())),
+            FastRenderer(),
+        ),
+    }
+    for label, (serialize, renderer) in paths.items():
+        data = serialize()
+        serialize_ms = timed(serialize)
+        render_ms = timed(lambda: renderer.render(data))
+        command.stdout.write(label)
+        command.report("  query + serialize", serialize_ms)
+        command.report("  render", render_ms)
+        total = serialize_ms + render_ms
+        command.stdout.write(f"{'  rows/s':<40} {rows / total * 1000:10.0f}")
+
+
+def mixed_client(args):
+    """One process mixing cart writes with uncached menu reads until ``deadline``."""
+    path, options, user_id, item_ids, deadline, write_share = args
+    connection.settings_dict["NAME"] = path
+    connection.settings_dict["OPTIONS"] = options
+    # Lock errors are counted, not logged.
+    logging.getLogger("django.request").setLevel(logging.CRITICAL)
+    client = APIClient(raise_request_exception=False)
+    client.force_authenticate(User.objects.get(id=user_id))
+    rng = random.Random(user_id)
+    counts, cart = Counter(), set()
+    while time.monotonic() < deadline:
+        if rng.random() < write_share:
+            kind = "write"
+            if len(cart) >= 5:
+                response = client.delete("/api/cart/")
+                if response.status_code == 204:
+                    cart.clear()
+            else:
+                menuitem = rng.choice([pk for pk in item_ids if pk not in cart])
+                response = client.post("/api/cart/", {"menuitem": menuitem})
+                if response.status_code == 201:
+                    cart.add(menuitem)
+        else:
+            kind = "read"
+            get_cache().clear()
+            response = client.get("/api/menu-items/?perpage=20")
+        counts[kind] += 1
+        exc = response.exc_info and response.exc_info[1]
+        if isinstance(exc, OperationalError) and "locked" in str(exc):
+            counts[f"{kind} locked"] += 1
+        elif response.status_code >= 400:
+            counts[f"{kind} failed"] += 1
+    connection.close()
+    return counts
+
+
+def bench_sqlite(command, rows, processes=8, seconds=10):
+    """
+    Mixed load against copies of one database, with Django's default SQLite
+    options and with the project's: ``processes`` clients, a third of their
+    requests cart writes, the rest uncached menu reads.
+    """
+    category = create_menu(min(rows, 1000))
+    MenuItem.objects.update(inventory=10**6)
+    item_ids = list(MenuItem.objects.filter(category=category).values_list("id", flat=True))
+    user_ids = [User.objects.create(username=f"mixed{n}").id for n in range(processes)]
+    source = connection.settings_dict["NAME"]
+    tuned = connection.settings_dict["OPTIONS"]
+    connection.close()
+
+    command.stdout.write(
+        f"{'options':<10} {'reads/s':>9} {'writes/s':>9} {'locked':>8} "
+        f"{'lock rate':>10} {'failed':>7}"
+    )
+    for label, options, journal in (("default", {}, "DELETE"), ("tuned", tuned, "WAL")):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "db.sqlite3")
+            with sqlite3.connect(source) as src, sqlite3.connect(path) as dst:
+                src.backup(dst)
+                dst.execute(f"PRAGMA journal_mode={journal}")
+            deadline = time.monotonic() + seconds
+            jobs = [
+                (path, options, user_id, item_ids, deadline, 1 / 3)
+                for user_id in user_ids
+            ]
+            with multiprocessing.get_context("fork").Pool(processes) as pool:
+                counts = sum(pool.map(mixed_client, jobs), Counter())
+        locked = counts["read locked"] + counts["write locked"]
+        total = counts["read"] + counts["write"]
+        failed = counts["read failed"] + counts["write failed"]
+        command.stdout.write(
+            f"{label:<10} {(counts['read'] - counts['read locked']) / seconds:>9.0f} "
+            f"{(counts['write'] - counts['write locked']) / seconds:>9.0f} "
+            f"{locked:>8} {locked / max(total, 1):>10.2%} {failed:>7}"
+        )
+
+
+# Run in a fresh interpreter per profile, so startup covers importing the
+# settings and building the WSGI application.
+PROFILE_SCRIPT = """
+import io, json, sys, time
+
+start = time.perf_counter()
+from LittleLemon.wsgi import application
+startup = time.perf_counter() - start
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from rest_framework.authtoken.models import Token
+from rest_framework_simplejwt.tokens import AccessToken
+from LittleLemonAPI.models import Category, MenuItem
+
+call_command("migrate", verbosity=0)
+user = User.objects.create(username="benchmark")
+category = Category.objects.create(slug="bench", title="Bench")
+MenuItem.objects.bulk_create(
+    MenuItem(title=f"Item {n}", price=n, category=category, inventory=100)
+    for n in range(1, 51)
+)
+credentials = {
+    "token": f"Token {Token.objects.create(user=user).key}",
+    "jwt": f"Bearer {AccessToken.for_user(user)}",
+}
+
+def get(path, authorization):
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "QUERY_STRING": "",
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "80",
+        "HTTP_HOST": "localhost",
+        "HTTP_ACCEPT": "application/json",
+        "HTTP_AUTHORIZATION": authorization,
+        "REMOTE_ADDR": "127.0.0.1",
+        "wsgi.input": io.BytesIO(),
+        "wsgi.url_scheme": "http",
+        "wsgi.errors": sys.stderr,
+    }
+    statuses = []
+    response = application(environ, lambda status, headers: statuses.append(status))
+    b"".join(response)
+    response.close()
+    assert statuses[0].startswith("200"), statuses[0]
+
+requests = int(sys.argv[1])
+results = {"startup": startup}
+for path in ("/api/categories/", "/api/menu-items/"):
+    for scheme, authorization in credentials.items():
+        get(path, authorization)
+        start = time.perf_counter()
+        for _ in range(requests):
+            get(path, authorization)
+        results[f"{path} {scheme}"] = (time.perf_counter() - start) / requests
+print(json.dumps(results))
+"""
+
+
+def bench_settings(command, rows):
+    """
+    Compare the dev and prod settings profiles: interpreter startup to a
+    ready WSGI application, then per-request time through the full
+    middleware stack for min(rows, 500) catalogue GETs with each
+    authentication scheme.
+    """
+    requests = min(rows, 500)
+    results = {}
+    for profile in ("dev", "prod"):
+        with tempfile.TemporaryDirectory() as directory:
+            env = {
+                **os.environ,
+                "DJANGO_ENV": profile,
+                "DJANGO_SETTINGS_MODULE": "LittleLemon.settings",
+                "DJANGO_SECRET_KEY": "benchmark",
+                "DJANGO_ALLOWED_HOSTS": "localhost",
+                "SQLITE_PATH": os.path.join(directory, "db.sqlite3"),
+                "THROTTLE_STORE_LOCATION": os.path.join(directory, "throttle.sqlite3"),
+            }
+            env.pop("ASYNC_READ_VIEWS", None)
+            output = subprocess.run(
+                [sys.executable, "-c", PROFILE_SCRIPT, str(requests)],
+                cwd=settings.BASE_DIR,
+                env=env,
+                capture_output=True,
+                text=True,
+            )
+        if output.returncode:
+            raise CommandError(f"{profile} profile failed:\n{output.stderr}")
+        results[profile] = json.loads(output.stdout.splitlines()[-1])
+
+    command.stdout.write(f"{'':<40} {'dev':>10} {'prod':>10}")
+    for key in results["dev"]:
+        label = "startup (ms)" if key == "startup" else f"GET {key} (us)"
+        scale = 1000 if key == "startup" else 1_000_000
+        command.stdout.write(
+            f"{label:<40} {results['dev'][key] * scale:10.1f} "
+            f"{results['prod'][key] * scale:10.1f}"
+        )
+
+
+SCENARIOS = {
+    "analytics": bench_analytics,
+    "checkout": bench_checkout,
+    "events": bench_events,
+    "export": bench_export,
+    "import": bench_import,
+    "search": bench_search,
+    "settings": bench_settings,
+    "sqlite": bench_sqlite,
+    "pagination": bench_pagination,
+    "rows": bench_rows,
+}
+
+
+class Command(BaseCommand):
+    help = "Run a performance scenario against a throwaway test database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("scenario", choices=sorted(SCENARIOS))
+        parser.add_argument("--rows", type=int, default=100_000)
+
+    def handle(self, *args, **options):
+        if options["rows"] < 1:
+            raise CommandError("--rows must be positive.")
+        setup_test_environment(debug=False)
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            SCENARIOS[options["scenario"]](self, options["rows"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def report(self, label, milliseconds):
+        self.stdout.write(f"{label:<40} {milliseconds:10.2f} ms")
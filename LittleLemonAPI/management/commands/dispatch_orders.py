@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from LittleLemonAPI.dispatch import assign_orders
+
+
+class Command(BaseCommand):
+    help = "Assign unassigned orders to the least loaded delivery crew members."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="Keep dispatching every INTERVAL seconds instead of once.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            assigned = assign_orders(batch_size=options["batch_size"])
+            self.stdout.write(f"Assigned {assigned} orders.")
+            if not options["interval"]:
+                return
+            # A full batch means there is likely more waiting.
+            if assigned < options["batch_size"]:
+                time.sleep(options["interval"])
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from LittleLemonAPI.exports import WRITERS, export_chunks, export_orders
+from LittleLemonAPI.rollups import DateRangeSerializer
+
+
+class Command(BaseCommand):
+    help = "Stream orders with their items as CSV or NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", help="YYYY-MM-DD, default 30 days before --end")
+        parser.add_argument("--end", help="YYYY-MM-DD, default today")
+        parser.add_argument("--format", choices=sorted(WRITERS), default="csv")
+        parser.add_argument("--output", help="File to write, default stdout")
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        dates = DateRangeSerializer(
+            data={key: options[key] for key in ("start", "end") if options[key]}
+        )
+        if not dates.is_valid():
+            raise CommandError(dates.errors)
+        orders = export_orders(
+            dates.validated_data["start"],
+            dates.validated_data["end"],
+            chunk_size=options["chunk_size"],
+        )
+        chunks = export_chunks(options["format"], orders)
+        if not options["output"]:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            return
+        with open(options["output"], "w", newline="", encoding="utf-8") as stream:
+            stream.writelines(chunks)
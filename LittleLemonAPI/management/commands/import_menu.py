@@ -0,0 +1,40 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from LittleLemonAPI.imports import csv_rows, import_menu
+
+
+class Command(BaseCommand):
+    help = "Create or update menu items by sku from a CSV or JSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--format", choices=["csv", "json"], help="Default: from the extension."
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        file_format = options["format"] or path.suffix.lstrip(".").lower()
+        if file_format not in ("csv", "json"):
+            raise CommandError("Pass --format csv or --format json.")
+        with path.open(newline="", encoding="utf-8") as source:
+            rows = csv_rows(source) if file_format == "csv" else json.load(source)
+        if isinstance(rows, dict):
+            rows = rows.get("items")
+        try:
+            counts = import_menu(
+                rows, batch_size=options["batch_size"], dry_run=options["dry_run"]
+            )
+        except ValidationError as error:
+            raise CommandError(json.dumps(error.detail, default=str))
+        self.stdout.write(
+            "{created} created, {updated} updated, {unchanged} unchanged.".format(
+                **counts
+            )
+        )
@@ -0,0 +1,166 @@
+import asyncio
+import multiprocessing
+import resource
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Client:
+    """One keep-alive HTTP/1.1 connection issuing GETs back to back."""
+
+    def __init__(self, url, headers):
+        parts = urlsplit(url)
+        if parts.scheme != "http":
+            raise CommandError(f"Only http:// targets are supported, got {url!r}.")
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        lines = [f"GET {path} HTTP/1.1", f"Host: {parts.netloc}", *headers]
+        self.request = ("\r\n".join(lines) + "\r\n\r\n").encode()
+        self.reader = self.writer = None
+
+    async def get(self):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(self.request)
+        status = int((await self.reader.readline()).split()[1])
+        length, chunked, close = 0, False, False
+        while (line := await self.reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            name, value = name.strip().lower(), value.strip().lower()
+            if name == "content-length":
+                length = int(value)
+            elif name == "transfer-encoding":
+                chunked = "chunked" in value
+            elif name == "connection":
+                close = value == "close"
+        if chunked:
+            while size := int((await self.reader.readline()).split(b";")[0], 16):
+                await self.reader.readexactly(size + 2)
+            await self.reader.readline()
+        else:
+            await self.reader.readexactly(length)
+        if close:
+            self.close()
+        return status
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def run_connection(client, start, deadline, latencies, errors):
+    # Requests started during the warmup are sent but not measured.
+    while time.perf_counter() < deadline:
+        began = time.perf_counter()
+        try:
+            status = await client.get()
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+            errors["connection"] += 1
+            client.close()
+            await asyncio.sleep(0.01)
+            continue
+        if began >= start:
+            latencies.append(time.perf_counter() - began)
+            if status >= 400:
+                errors["status"] += 1
+    client.close()
+
+
+async def run_clients(url, headers, connections, warmup, duration):
+    latencies, errors = [], {"connection": 0, "status": 0}
+    start = time.perf_counter() + warmup
+    deadline = start + duration
+    await asyncio.gather(
+        *(
+            run_connection(Client(url, headers), start, deadline, latencies, errors)
+            for _ in range(connections)
+        )
+    )
+    return latencies, errors
+
+
+def run_process(args):
+    return asyncio.run(run_clients(*args))
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Hold --connections keep-alive connections open against running "
+        "deployments and report requests/second and latency percentiles, e.g. "
+        "wsgi=http://127.0.0.1:8000/api/menu-items/ "
+        "asgi=http://127.0.0.1:8001/api/menu-items/ for a server started with "
+        "`gunicorn LittleLemon.wsgi` and one with "
+        "`uvicorn LittleLemon.asgi:application`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("targets", nargs="+", help="URL or label=URL")
+        parser.add_argument("--connections", type=int, default=1000)
+        parser.add_argument("--duration", type=float, default=30.0, help="Seconds")
+        parser.add_argument("--warmup", type=float, default=5.0, help="Seconds")
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=1,
+            help="Client processes sharing the connections, so the load "
+            "generator isn't the bottleneck",
+        )
+        parser.add_argument("--token", help="Sent as 'Authorization: Token ...'")
+        parser.add_argument("--header", action="append", default=[], help="Name: value")
+
+    def handle(self, *args, **options):
+        connections, processes = options["connections"], options["processes"]
+        if connections < 1 or processes < 1 or options["duration"] <= 0:
+            raise CommandError("--connections, --processes and --duration must be positive.")
+        headers = list(options["header"])
+        if options["token"]:
+            headers.append(f"Authorization: Token {options['token']}")
+
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft < connections + 64 and soft != hard:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+        self.stdout.write(
+            f"{'target':<12} {'requests':>9} {'req/s':>9} {'p50 ms':>8} "
+            f"{'p99 ms':>8} {'max ms':>8} {'errors':>7}"
+        )
+        for target in options["targets"]:
+            label, _, url = target.partition("=")
+            if "://" in label or not url:
+                label, url = target, target
+            shares = [
+                connections // processes + (n < connections % processes)
+                for n in range(processes)
+            ]
+            jobs = [
+                (url, headers, share, options["warmup"], options["duration"])
+                for share in shares
+                if share
+            ]
+            if len(jobs) == 1:
+                results = [run_process(jobs[0])]
+            else:
+                with multiprocessing.get_context("fork").Pool(len(jobs)) as pool:
+                    results = pool.map(run_process, jobs)
+
+            latencies = sorted(value for values, _ in results for value in values)
+            errors = sum(sum(errors.values()) for _, errors in results)
+            self.stdout.write(
+                f"{label:<12} {len(latencies):>9} "
+                f"{len(latencies) / options['duration']:>9.0f} "
+                f"{percentile(latencies, 0.50) * 1000:>8.1f} "
+                f"{percentile(latencies, 0.99) * 1000:>8.1f} "
+                f"{percentile(latencies, 1.0) * 1000:>8.1f} {errors:>7}"
+            )
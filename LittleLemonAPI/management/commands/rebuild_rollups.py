@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from LittleLemonAPI.models import DailyItemSales, DailySales, Order, OrderItem
+from LittleLemonAPI.rollups import rebuild_rollups
+
+
+def date_argument(value):
+    date = parse_date(value)
+    if date is None:
+        raise ValueError(value)
+    return date
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily sales rollups from orders."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", type=date_argument, help="YYYY-MM-DD")
+        parser.add_argument("--end", type=date_argument, help="YYYY-MM-DD")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be positive.")
+        days = rebuild_rollups(
+            Order,
+            OrderItem,
+            DailySales,
+            DailyItemSales,
+            start=options["start"],
+            end=options["end"],
+            chunk_size=options["chunk_size"],
+        )
+        self.stdout.write(f"Rebuilt {days} days of sales.")
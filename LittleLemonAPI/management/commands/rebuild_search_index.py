@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from LittleLemonAPI.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Recreate the menu item full-text index from the menu item table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        rebuild_search_index(options["database"])
+        self.stdout.write("Search index rebuilt.")
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from LittleLemonAPI.cache import bump_catalogue_version
+from LittleLemonAPI.models import Category, MenuItem
+from LittleLemonAPI.tax import recompute_prices
+
+
+class Command(BaseCommand):
+    help = "Recompute MenuItem.price_after_tax after tax rates change."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            changed = recompute_prices(
+                MenuItem, Category, batch_size=options["batch_size"]
+            )
+        if changed:
+            bump_catalogue_version()
+        self.stdout.write(f"Updated {changed} menu items.")
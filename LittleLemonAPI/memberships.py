@@ -0,0 +1,76 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from rest_framework import serializers
+
+from .permissions import forget_roles, get_group_id
+
+Membership = User.groups.through
+
+
+class MembershipBatchSerializer(serializers.Serializer):
+    usernames = serializers.ListField(
+        child=serializers.CharField(), required=False, max_length=1000
+    )
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, max_length=1000
+    )
+
+    def validate(self, attrs):
+        if not attrs.get("usernames") and not attrs.get("ids"):
+            raise serializers.ValidationError("Provide usernames or ids.")
+        return attrs
+
+
+def resolve_users(usernames=(), ids=()):
+    """
+    Look up ``usernames`` and ``ids`` in one query. Returns a list of
+    (key, identifier, user) in request order, user being a
+    (pk, date_joined) pair or None when no such user exists.
+    """
+    users = (
+        User.objects.filter(username__in=usernames) | User.objects.filter(pk__in=ids)
+    ).values_list("pk", "username", "date_joined")
+    by_username = {username: (pk, joined) for pk, username, joined in users}
+    by_id = {pk: (pk, joined) for pk, joined in by_username.values()}
+    return [("username", name, by_username.get(name)) for name in usernames] + [
+        ("id", pk, by_id.get(pk)) for pk in ids
+    ]
+
+
+def change_members(group_name, add, usernames=(), ids=()):
+    """
+    Add users to (or remove them from) ``group_name`` with a single insert
+    or delete on the membership table. Returns one result per identifier.
+    """
+    group_id = get_group_id(group_name)
+    with transaction.atomic():
+        resolved = resolve_users(usernames, ids)
+        pks = {user[0] for _, _, user in resolved if user}
+        members = set(
+            Membership.objects.filter(group_id=group_id, user_id__in=pks).values_list(
+                "user_id", flat=True
+            )
+        )
+        if add:
+            changed = pks - members
+            Membership.objects.bulk_create(
+                [Membership(group_id=group_id, user_id=pk) for pk in changed],
+                ignore_conflicts=True,
+            )
+        else:
+            changed = members
+            Membership.objects.filter(group_id=group_id, user_id__in=changed).delete()
+        forget_roles({user for _, _, user in resolved if user and user[0] in changed})
+
+    results = []
+    done = set()
+    for key, identifier, user in resolved:
+        if user is None:
+            result = "not_found"
+        elif user[0] in changed and user[0] not in done:
+            result = "added" if add else "removed"
+            done.add(user[0])
+        else:
+            result = "already_member" if add else "not_member"
+        results.append({key: identifier, "result": result})
+    return results
@@ -0,0 +1,277 @@
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SECONDS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    def __init__(self, name, help, buckets, labels):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.labels = labels
+        # label values -> [count per bucket..., +Inf count, sum]
+        self.series = {}
+
+    def observe(self, values, amount):
+        series = self.series.get(values)
+        if series is None:
+            series = self.series[values] = [0] * (len(self.buckets) + 2)
+        for index, bound in enumerate(self.buckets):
+            if amount <= bound:
+                series[index] += 1
+        series[-2] += 1
+        series[-1] += amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, series in sorted(self.series.items()):
+            labels = ",".join(
+                f'{label}="{escape(value)}"' for label, value in zip(self.labels, values)
+            )
+            for bound, count in zip((*self.buckets, "+Inf"), series):
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f"{self.name}_sum{{{labels}}} {series[-1]}")
+            lines.append(f"{self.name}_count{{{labels}}} {series[-2]}")
+        return lines
+
+
+class CounterMetric:
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.series = Counter()
+
+    def inc(self, values, amount=1):
+        self.series[values] += amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for values, count in sorted(self.series.items()):
+            labels = ",".join(
+                f'{label}="{escape(value)}"' for label, value in zip(self.labels, values)
+            )
+            lines.append(f"{self.name}{{{labels}}} {count}")
+        return lines
+
+
+def escape(value):
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+class Registry:
+    """Per-process request metrics, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        request_labels = ("route", "method", "status")
+        self.duration = Histogram(
+            "littlelemon_request_duration_seconds",
+            "Time spent handling the request.",
+            SECONDS,
+            request_labels,
+        )
+        self.queries = Histogram(
+            "littlelemon_request_db_queries",
+            "Database queries run by the request.",
+            QUERIES,
+            request_labels,
+        )
+        self.db_time = Histogram(
+            "littlelemon_request_db_seconds",
+            "Time spent in database queries.",
+            SECONDS,
+            request_labels,
+        )
+        self.serializer_time = Histogram(
+            "littlelemon_request_serializer_seconds",
+            "Time spent building serializer data.",
+            SECONDS,
+            request_labels,
+        )
+        self.response_bytes = Histogram(
+            "littlelemon_response_bytes",
+            "Size of non-streaming response bodies.",
+            BYTES,
+            request_labels,
+        )
+        self.n_plus_one = CounterMetric(
+            "littlelemon_n_plus_one_total",
+            "Requests that repeated one SQL statement at least "
+            "METRICS_N_PLUS_ONE_THRESHOLD times.",
+            ("route",),
+        )
+        self.metrics = [
+            self.duration,
+            self.queries,
+            self.db_time,
+            self.serializer_time,
+            self.response_bytes,
+            self.n_plus_one,
+        ]
+
+    def record(self, route, method, response, stats, elapsed):
+        labels = (route, method, str(response.status_code))
+        with self.lock:
+            self.duration.observe(labels, elapsed)
+            self.queries.observe(labels, stats.queries)
+            self.db_time.observe(labels, stats.db_time)
+            self.serializer_time.observe(labels, stats.serializer_time)
+            if not response.streaming:
+                self.response_bytes.observe(labels, len(response.content))
+            if stats.repeated is not None:
+                self.n_plus_one.inc((route,))
+
+    def render(self):
+        with self.lock:
+            lines = [line for metric in self.metrics for line in metric.render()]
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self.lock:
+            for metric in self.metrics:
+                metric.series.clear()
+
+
+registry = Registry()
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_time", "serializer_time", "serializing", "shapes", "repeated")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+        self.shapes = Counter()
+        self.repeated = None
+
+
+# A context variable rather than a thread local: asgiref carries it into
+# the worker threads that run the ORM for async views.
+current_stats = ContextVar("request_stats", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_time += time.perf_counter() - start
+        stats.queries += 1
+        # Parameters are placeholders in ``sql``, so a query run per row
+        # has the same text every time.
+        stats.shapes[sql] += 1
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+@contextmanager
+def serializing():
+    """Count the block as serializer time, once however deeply nested."""
+    stats = current_stats.get()
+    if stats is None or stats.serializing:
+        yield
+        return
+    stats.serializing = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serializer_time += time.perf_counter() - start
+        stats.serializing = False
+
+
+class SerializerTimingMixin:
+    """
+    Count a serializer's to_representation() as serializer time; nested
+    and listed serializers of this app count once. Mix in before the DRF
+    base class.
+    """
+
+    def to_representation(self, instance):
+        with serializing():
+            return super().to_representation(instance)
+
+
+def route_of(request):
+    match = getattr(request, "resolver_match", None)
+    return match.route if match is not None else "<unmatched>"
+
+
+def finish(request, response, stats, start):
+    elapsed = time.perf_counter() - start
+    route = route_of(request)
+    if stats.shapes:
+        sql, count = stats.shapes.most_common(1)[0]
+        if count >= settings.METRICS_N_PLUS_ONE_THRESHOLD:
+            stats.repeated = sql
+            logger.warning(
+                "Possible N+1 on %s %s: %d queries, one statement ran %d times: %s",
+                request.method,
+                route,
+                stats.queries,
+                count,
+                sql[:300],
+            )
+    registry.record(route, request.method, response, stats, elapsed)
+
+
+class MetricsMiddleware:
+    """
+    Record latency, query count and time, serializer time and response size
+    per route, and log requests that look like N+1 queries. Put it first in
+    MIDDLEWARE so the latency covers the other middleware too.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        start = time.perf_counter()
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        finish(request, response, stats, start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        finish(request, response, stats, start)
+        return response
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:39
+
+from django.db import migrations, models
+
+from LittleLemonAPI.tax import recompute_prices
+
+
+def fill_price_after_tax(apps, schema_editor):
+    recompute_prices(
+        apps.get_model('LittleLemonAPI', 'MenuItem'),
+        apps.get_model('LittleLemonAPI', 'Category'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0010_category_updated_at_menuitem_updated_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='price_after_tax',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, editable=False, max_digits=8),
+        ),
+        migrations.RunPython(fill_price_after_tax, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from LittleLemonAPI.ratings import rebuild_rating_stats
+
+
+def fill_rating_stats(apps, schema_editor):
+    rebuild_rating_stats(
+        apps.get_model('LittleLemonAPI', 'Rating'),
+        apps.get_model('LittleLemonAPI', 'MenuItemRatingStats'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0011_menuitem_price_after_tax'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='rating',
+            old_name='menuitem_id',
+            new_name='menuitem',
+        ),
+        migrations.AlterField(
+            model_name='rating',
+            name='menuitem',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='LittleLemonAPI.menuitem'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='rating',
+            unique_together={('menuitem', 'user')},
+        ),
+        migrations.AddConstraint(
+            model_name='rating',
+            constraint=models.CheckConstraint(condition=models.Q(('rating__gte', 1), ('rating__lte', 5)), name='rating_between_1_and_5'),
+        ),
+        migrations.CreateModel(
+            name='MenuItemRatingStats',
+            fields=[
+                ('menuitem', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_stats', serialize=False, to='LittleLemonAPI.menuitem')),
+                ('count', models.IntegerField(default=0)),
+                ('total', models.IntegerField(default=0)),
+                ('average', models.FloatField(db_index=True, null=True)),
+                ('stars_1', models.IntegerField(default=0)),
+                ('stars_2', models.IntegerField(default=0)),
+                ('stars_3', models.IntegerField(default=0)),
+                ('stars_4', models.IntegerField(default=0)),
+                ('stars_5', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(fill_rating_stats, migrations.RunPython.noop),
+    ]
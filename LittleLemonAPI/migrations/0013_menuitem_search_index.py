@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:05
+
+from django.db import migrations
+
+from LittleLemonAPI.search import FTS_TABLE, POSTGRES_INDEX, rebuild_search_index
+
+
+def create_search_index(apps, schema_editor):
+    rebuild_search_index(schema_editor.connection.alias)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for suffix in ('insert', 'delete', 'update'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS "{FTS_TABLE}_{suffix}"')
+        schema_editor.execute(f'DROP TABLE IF EXISTS "{FTS_TABLE}"')
+    elif vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{POSTGRES_INDEX}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0012_rating_menuitem_menuitemratingstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
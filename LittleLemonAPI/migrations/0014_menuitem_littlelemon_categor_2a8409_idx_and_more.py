@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0013_menuitem_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['category', 'price', 'id'], name='LittleLemon_categor_2a8409_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['category', 'price_after_tax', 'id'], name='LittleLemon_categor_8d9922_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['category', 'title', 'id'], name='LittleLemon_categor_5fac6f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['featured', 'price', 'id'], name='LittleLemon_feature_a5ed0b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['featured', 'price_after_tax', 'id'], name='LittleLemon_feature_a4891c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['featured', 'title', 'id'], name='LittleLemon_feature_e51578_idx'),
+        ),
+    ]
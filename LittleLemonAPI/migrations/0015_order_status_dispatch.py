@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def statuses_from_delivered(apps, schema_editor):
+    Order = apps.get_model('LittleLemonAPI', 'Order')
+    Order.objects.filter(delivered=True).update(status='delivered')
+    Order.objects.filter(delivered=False, delivery_crew__isnull=False).update(
+        status='assigned'
+    )
+
+
+def delivered_from_statuses(apps, schema_editor):
+    Order = apps.get_model('LittleLemonAPI', 'Order')
+    Order.objects.filter(status='delivered').update(delivered=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0014_menuitem_littlelemon_categor_2a8409_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='order',
+            old_name='status',
+            new_name='delivered',
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('placed', 'Placed'), ('assigned', 'Assigned'), ('out-for-delivery', 'Out For Delivery'), ('delivered', 'Delivered')], default='placed', max_length=16),
+        ),
+        migrations.RunPython(statuses_from_delivered, delivered_from_statuses),
+        migrations.RemoveField(
+            model_name='order',
+            name='delivered',
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['delivery_crew', 'status', 'date'], name='LittleLemon_deliver_9c6e48_idx'),
+        ),
+    ]
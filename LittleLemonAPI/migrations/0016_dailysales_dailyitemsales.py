@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from LittleLemonAPI.rollups import rebuild_rollups
+
+
+def fill_rollups(apps, schema_editor):
+    rebuild_rollups(
+        apps.get_model('LittleLemonAPI', 'Order'),
+        apps.get_model('LittleLemonAPI', 'OrderItem'),
+        apps.get_model('LittleLemonAPI', 'DailySales'),
+        apps.get_model('LittleLemonAPI', 'DailyItemSales'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0015_order_status_dispatch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('date', models.DateField(primary_key=True, serialize=False)),
+                ('order_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyItemSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('menuitem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='LittleLemonAPI.menuitem')),
+            ],
+            options={
+                'unique_together': {('date', 'menuitem')},
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0016_dailysales_dailyitemsales'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='sku',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
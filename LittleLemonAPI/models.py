@@ -1,16 +1,68 @@
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
 
+from .cache import get_cache
+from .tax import price_after_tax
+
 class Category(models.Model):
     slug = models.SlugField()
     title = models.CharField(max_length=255, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+def category_slug_key(category_id):
+    return f"category-slug:{category_id}"
+
+def category_slug(category_id):
+    """The slug of category ``category_id``; signals.py drops it on save."""
+    cache = get_cache()
+    key = category_slug_key(category_id)
+    slug = cache.get(key)
+    if slug is None:
+        slug = (
+            Category.objects.filter(pk=category_id)
+            .values_list("slug", flat=True)
+            .first()
+        )
+        if slug is not None:
+            cache.set(key, slug, settings.CATALOGUE_CACHE_TIMEOUT)
+    return slug
 
 class MenuItem(models.Model):
+    # The POS item code; catalogue imports upsert on it.
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     title = models.CharField(max_length=255, db_index=True)
     price = models.DecimalField(max_digits=6, decimal_places=2, db_index=True)
     featured = models.BooleanField(db_index=True, default=False)
     category = models.ForeignKey(Category, on_delete=models.PROTECT, default=1)
     inventory = models.IntegerField(default=0)
+    price_after_tax = models.DecimalField(
+        max_digits=8, decimal_places=2, db_index=True, default=0, editable=False
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Back every catalogue ordering behind the category and featured
+        # filters; see filters.MENU_ITEM_ORDERINGS.
+        indexes = [
+            models.Index(fields=['category', 'price', 'id']),
+            models.Index(fields=['category', 'price_after_tax', 'id']),
+            models.Index(fields=['category', 'title', 'id']),
+            models.Index(fields=['featured', 'price', 'id']),
+            models.Index(fields=['featured', 'price_after_tax', 'id']),
+            models.Index(fields=['featured', 'title', 'id']),
+        ]
+
+    def save(self, *args, **kwargs):
+        if MenuItem.category.is_cached(self):
+            slug = self.category.slug
+        else:
+            slug = category_slug(self.category_id)
+        self.price_after_tax = price_after_tax(self.price, slug)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"price", "category", "category_id"} & {*update_fields}:
+            kwargs["update_fields"] = {*update_fields, "price_after_tax"}
+        super().save(*args, **kwargs)
 
 class Cart(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -22,12 +74,41 @@ class Cart(models.Model):
     class Meta:
         unique_together = ('menuitem', 'user')
 
+def order_items_prefetch():
+    return models.Prefetch(
+        "orderitem_set",
+        # Ordered like rows.order_rows(), whatever index the lookup uses.
+        queryset=OrderItem.objects.select_related("menuitem__rating_stats").order_by("id"),
+    )
+
+class OrderQuerySet(models.QuerySet):
+    def with_users(self):
+        return self.select_related("user", "delivery_crew")
+
+    def with_items(self):
+        return self.with_users().prefetch_related(order_items_prefetch())
+
 class Order(models.Model):
+    class Status(models.TextChoices):
+        PLACED = 'placed'
+        ASSIGNED = 'assigned'
+        OUT_FOR_DELIVERY = 'out-for-delivery'
+        DELIVERED = 'delivered'
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     delivery_crew = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='delivery_crew')
-    status = models.BooleanField(default=0)
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PLACED)
     total = models.DecimalField(max_digits=6, decimal_places=2)
     date = models.DateField(db_index=True, auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        # Crew queues and the unassigned backlog (delivery_crew IS NULL).
+        indexes = [
+            models.Index(fields=['delivery_crew', 'status', 'date']),
+        ]
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE)
@@ -40,11 +121,49 @@ class OrderItem(models.Model):
         unique_together = ('order', 'menuitem')      
     
 class Rating(models.Model):
-    menuitem_id = models.SmallIntegerField(default=1)
+    menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
     rating = models.SmallIntegerField()
     user = models.ForeignKey(User, on_delete=models.CASCADE)
 
+    class Meta:
+        unique_together = ('menuitem', 'user')
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(rating__gte=1, rating__lte=5),
+                name='rating_between_1_and_5',
+            ),
+        ]
+
     def __str__(self):
         return str(self.rating)
 
-  
\ No newline at end of file
+class MenuItemRatingStats(models.Model):
+    menuitem = models.OneToOneField(
+        MenuItem, on_delete=models.CASCADE, primary_key=True, related_name='rating_stats'
+    )
+    count = models.IntegerField(default=0)
+    total = models.IntegerField(default=0)
+    average = models.FloatField(null=True, db_index=True)
+    stars_1 = models.IntegerField(default=0)
+    stars_2 = models.IntegerField(default=0)
+    stars_3 = models.IntegerField(default=0)
+    stars_4 = models.IntegerField(default=0)
+    stars_5 = models.IntegerField(default=0)
+
+    @property
+    def histogram(self):
+        return {str(stars): getattr(self, f"stars_{stars}") for stars in range(1, 6)}
+
+class DailySales(models.Model):
+    date = models.DateField(primary_key=True)
+    order_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+class DailyItemSales(models.Model):
+    date = models.DateField()
+    menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('date', 'menuitem')
@@ -0,0 +1,133 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.permissions import SAFE_METHODS, BasePermission
+
+from .authentication import forget_users
+
+MANAGER = "Manager"
+DELIVERY_CREW = "Delivery_crew"
+
+NOT_AUTHORIZED = "You are not authorized to perform this action."
+
+
+def get_role_cache():
+    return caches[settings.ROLE_CACHE_ALIAS]
+
+
+def role_cache_key(pk, date_joined):
+    # date_joined guards against a reused pk (e.g. after restoring a backup)
+    # picking up another account's roles.
+    return f"roles:{pk}:{date_joined.timestamp()}"
+
+
+def get_roles(request):
+    """
+    The request user's group names, loaded at most once per request and
+    cached per user until their group membership changes.
+    """
+    user = request.user
+    if not user or not user.is_authenticated:
+        return frozenset()
+    roles = getattr(request, "_roles", None)
+    if roles is None:
+        cache = get_role_cache()
+        key = role_cache_key(user.pk, user.date_joined)
+        roles = cache.get(key)
+        if roles is None:
+            roles = frozenset(user.groups.values_list("name", flat=True))
+            cache.set(key, roles, settings.ROLE_CACHE_TIMEOUT)
+        request._roles = roles
+    return roles
+
+
+async def aget_roles(request):
+    """get_roles() for async views."""
+    user = request.user
+    if not user or not user.is_authenticated:
+        return frozenset()
+    roles = getattr(request, "_roles", None)
+    if roles is None:
+        cache = get_role_cache()
+        key = role_cache_key(user.pk, user.date_joined)
+        roles = await cache.aget(key)
+        if roles is None:
+            names = user.groups.values_list("name", flat=True)
+            roles = frozenset([name async for name in names])
+            await cache.aset(key, roles, settings.ROLE_CACHE_TIMEOUT)
+        request._roles = roles
+    return roles
+
+
+def forget_roles(users):
+    """Drop cached roles for ``users``, (pk, date_joined) pairs."""
+    users = list(users)
+    keys = [role_cache_key(pk, date_joined) for pk, date_joined in users]
+    if keys:
+        # Authenticated users are cached with their group names too.
+        forget_users([pk for pk, date_joined in users])
+        cache = get_role_cache()
+        cache.delete_many(keys)
+        # A request reading the old membership before commit may re-cache it.
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def group_id_key(name):
+    # Hashed: group names may be long or contain spaces and other
+    # characters that memcached rejects in keys.
+    return f"group-id:{hashlib.sha1(name.encode()).hexdigest()}"
+
+
+def get_group_id(name):
+    """The id of the group called ``name``, created on first use."""
+    cache = get_role_cache()
+    pk = cache.get(group_id_key(name))
+    if pk is None:
+        pk = Group.objects.get_or_create(name=name)[0].pk
+        cache.set(group_id_key(name), pk, settings.ROLE_CACHE_TIMEOUT)
+    return pk
+
+
+def forget_group_ids(*names):
+    get_role_cache().delete_many(
+        [group_id_key(name) for name in {MANAGER, DELIVERY_CREW, *names}]
+    )
+
+
+def is_manager(request):
+    return MANAGER in get_roles(request)
+
+
+def is_delivery_crew(request):
+    return DELIVERY_CREW in get_roles(request)
+
+
+class IsManager(BasePermission):
+    message = NOT_AUTHORIZED
+
+    def has_permission(self, request, view):
+        return is_manager(request)
+
+
+class IsManagerOrReadOnly(BasePermission):
+    message = NOT_AUTHORIZED
+
+    def has_permission(self, request, view):
+        return request.method in SAFE_METHODS or is_manager(request)
+
+
+class IsDeliveryCrew(BasePermission):
+    message = NOT_AUTHORIZED
+
+    def has_permission(self, request, view):
+        return is_delivery_crew(request)
+
+
+class IsOrderOwner(BasePermission):
+    message = NOT_AUTHORIZED
+
+    def has_object_permission(self, request, view, obj):
+        return obj.user_id == request.user.pk
@@ -0,0 +1,48 @@
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Q, Sum
+from django.db.models.functions import Cast, NullIf, Round
+
+from .cache import bump_catalogue_version
+from .models import MenuItemRatingStats
+
+
+def adjust_rating_stats(menuitem_id, rating, step):
+    """
+    Add (step=1) or remove (step=-1) one ``rating`` from a menu item's stats
+    with UPDATEs on the stats row instead of re-aggregating its ratings.
+    """
+    with transaction.atomic():
+        stats = MenuItemRatingStats.objects.filter(menuitem_id=menuitem_id)
+        if step > 0:
+            MenuItemRatingStats.objects.get_or_create(menuitem_id=menuitem_id)
+        stats.update(
+            count=F("count") + step,
+            total=F("total") + step * rating,
+            **{f"stars_{rating}": F(f"stars_{rating}") + step},
+        )
+        # SET expressions see the row as it was before the UPDATE, so the
+        # mean is derived from the new count and total in a second one.
+        stats.update(
+            average=Round(
+                Cast("total", FloatField()) / NullIf("count", 0), 2
+            )
+        )
+        transaction.on_commit(bump_catalogue_version)
+
+
+def rebuild_rating_stats(rating_model, stats_model):
+    """
+    Recompute every stats row from the ratings table. Takes the models as
+    arguments so migrations can pass historical ones.
+    """
+    stars = {
+        f"stars_{value}": Count("id", filter=Q(rating=value)) for value in range(1, 6)
+    }
+    rows = rating_model.objects.values("menuitem_id").annotate(
+        count=Count("id"), total=Sum("rating"), **stars
+    )
+    stats_model.objects.all().delete()
+    stats_model.objects.bulk_create(
+        stats_model(average=round(row["total"] / row["count"], 2), **row)
+        for row in rows
+    )
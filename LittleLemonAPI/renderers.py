@@ -0,0 +1,29 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer output produced by orjson. Values orjson doesn't encode the
+    way DRF does (decimals, datetimes, lazy strings, ...) go through DRF's
+    encoder, and indented output is left to JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        renderer_context = renderer_context or {}
+        if (
+            self.get_indent(accepted_media_type, renderer_context) is not None
+            or not self.compact
+            or self.ensure_ascii
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        encoder = self.encoder_class()
+        ret = orjson.dumps(data, default=encoder.default, option=OPTIONS)
+        # Keep the output a strict JavaScript subset, as JSONRenderer does.
+        return ret.replace("\u2028".encode(), b"\\u2028").replace(
+            "\u2029".encode(), b"\\u2029"
+        )
@@ -0,0 +1,151 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, IntegerField, Sum, When
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import DailyItemSales, DailySales
+
+
+class DateRangeSerializer(serializers.Serializer):
+    """An inclusive start..end range, the last 30 days by default."""
+
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        attrs.setdefault("end", timezone.localdate())
+        attrs.setdefault("start", attrs["end"] - timedelta(days=29))
+        if attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError({"start": "start must not be after end."})
+        return attrs
+
+
+class SalesRangeSerializer(DateRangeSerializer):
+    top = serializers.IntegerField(required=False, default=10, min_value=1, max_value=100)
+
+
+def record_order(order, lines):
+    """
+    Add a new order and its ``lines`` (menuitem_id, quantity, price) to the
+    daily rollups with four statements, whatever the order size. Call it
+    inside the transaction that creates the order.
+    """
+    # INSERT OR IGNORE / ON CONFLICT DO NOTHING makes sure the rows exist
+    # without a savepoint per row; the UPDATEs then add to them in place.
+    DailySales.objects.bulk_create(
+        [DailySales(date=order.date)], ignore_conflicts=True
+    )
+    DailySales.objects.filter(date=order.date).update(
+        order_count=F("order_count") + 1, revenue=F("revenue") + order.total
+    )
+    DailyItemSales.objects.bulk_create(
+        (
+            DailyItemSales(date=order.date, menuitem_id=menuitem_id)
+            for menuitem_id, _, _ in lines
+        ),
+        ignore_conflicts=True,
+    )
+    DailyItemSales.objects.filter(
+        date=order.date, menuitem_id__in=[line[0] for line in lines]
+    ).update(
+        quantity=Case(
+            *(
+                When(menuitem_id=menuitem_id, then=F("quantity") + quantity)
+                for menuitem_id, quantity, _ in lines
+            ),
+            output_field=IntegerField(),
+        ),
+        revenue=Case(
+            *(
+                When(menuitem_id=menuitem_id, then=F("revenue") + price)
+                for menuitem_id, _, price in lines
+            ),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+    )
+
+
+def rebuild_rollups(
+    order_model,
+    order_item_model,
+    sales_model,
+    item_sales_model,
+    start=None,
+    end=None,
+    chunk_size=2000,
+):
+    """
+    Recompute the rollups for ``start``..``end`` (inclusive, open-ended when
+    None) by streaming orders and order items. Memory stays bounded by the
+    number of (date, menu item) pairs, not the number of orders. Takes the
+    models as arguments so migrations can pass historical ones.
+    Returns the number of days rebuilt.
+    """
+    dates = {}
+    if start is not None:
+        dates["date__gte"] = start
+    if end is not None:
+        dates["date__lte"] = end
+    order_dates = {f"order__{key}": value for key, value in dates.items()}
+
+    with transaction.atomic():
+        days = defaultdict(lambda: [0, Decimal(0)])
+        orders = order_model.objects.filter(**dates).values_list("date", "total")
+        for date, total in orders.iterator(chunk_size=chunk_size):
+            days[date][0] += 1
+            days[date][1] += total
+
+        items = defaultdict(lambda: [0, Decimal(0)])
+        lines = order_item_model.objects.filter(**order_dates).values_list(
+            "order__date", "menuitem_id", "quantity", "price"
+        )
+        for date, menuitem_id, quantity, price in lines.iterator(chunk_size=chunk_size):
+            items[date, menuitem_id][0] += quantity
+            items[date, menuitem_id][1] += price
+
+        sales_model.objects.filter(**dates).delete()
+        item_sales_model.objects.filter(**dates).delete()
+        sales_model.objects.bulk_create(
+            (
+                sales_model(date=date, order_count=count, revenue=revenue)
+                for date, (count, revenue) in days.items()
+            ),
+            batch_size=chunk_size,
+        )
+        item_sales_model.objects.bulk_create(
+            (
+                item_sales_model(
+                    date=date, menuitem_id=menuitem_id, quantity=quantity, revenue=revenue
+                )
+                for (date, menuitem_id), (quantity, revenue) in items.items()
+            ),
+            batch_size=chunk_size,
+        )
+    return len(days)
+
+
+def sales_report(start, end, top=10):
+    """
+    Totals, per-day sales and the ``top`` menu items by quantity for
+    ``start``..``end``, read from the rollups only.
+    """
+    days = DailySales.objects.filter(date__range=(start, end)).order_by("date")
+    days = list(days)
+    items = (
+        DailyItemSales.objects.filter(date__range=(start, end))
+        .values("menuitem_id", title=F("menuitem__title"))
+        .annotate(quantity=Sum("quantity"), revenue=Sum("revenue"))
+        .order_by("-quantity", "menuitem_id")[:top]
+    )
+    return {
+        "start": start,
+        "end": end,
+        "order_count": sum(day.order_count for day in days),
+        "revenue": sum((day.revenue for day in days), Decimal(0)),
+        "days": days,
+        "items": list(items),
+    }
@@ -0,0 +1,159 @@
+from operator import itemgetter
+
+from .metrics import serializing
+from .models import OrderItem
+
+
+def decimal_string(value):
+    # DecimalField.to_representation for a value the database converter has
+    # already quantized to the field's decimal places.
+    return f"{value:f}"
+
+
+def date_string(value):
+    return value.isoformat()
+
+
+def converted(get, convert):
+    return lambda row: convert(get(row))
+
+
+class RowMapper:
+    """
+    Read-only representation of ``.values()`` rows, matching a serializer's
+    output without its per-field, per-row dispatch. Fields are ``(key,
+    column)`` or ``(key, column, convert)``; a RowMapper in place of the
+    column nests an object, and ``null_if`` names the column that makes it
+    None. The row -> dict function is built once, when the mapper is.
+    """
+
+    def __init__(self, fields, null_if=None):
+        self.fields = [(field + (None,))[:3] for field in fields]
+        self.null_if = null_if
+        self.map = self.build()
+
+    @property
+    def columns(self):
+        columns = []
+        for key, column, convert in self.fields:
+            if isinstance(column, RowMapper):
+                columns.extend(column.columns)
+            else:
+                columns.append(column)
+        if self.null_if is not None:
+            columns.append(self.null_if)
+        return list(dict.fromkeys(columns))
+
+    def prefixed(self, prefix, null_if=None):
+        """This mapper reading the columns of a related object, ``prefix__*``."""
+        return RowMapper(
+            [
+                (
+                    key,
+                    column.prefixed(
+                        prefix, column.null_if and f"{prefix}__{column.null_if}"
+                    )
+                    if isinstance(column, RowMapper)
+                    else f"{prefix}__{column}",
+                    convert,
+                )
+                for key, column, convert in self.fields
+            ],
+            null_if=null_if,
+        )
+
+    def build(self):
+        getters = []
+        for key, column, convert in self.fields:
+            if isinstance(column, RowMapper):
+                getters.append((key, column.map))
+            elif convert is None:
+                getters.append((key, itemgetter(column)))
+            else:
+                getters.append((key, converted(itemgetter(column), convert)))
+        getters = tuple(getters)
+
+        def map(row):
+            return {key: get(row) for key, get in getters}
+
+        if self.null_if is None:
+            return map
+        null = itemgetter(self.null_if)
+        return lambda row: None if null(row) is None else map(row)
+
+    def values(self, queryset, *extra):
+        """``queryset`` as rows with this mapper's columns and ``extra``."""
+        extra = [name.lstrip("-") for name in extra]
+        return queryset.values(*dict.fromkeys([*self.columns, *extra]))
+
+    def many(self, rows):
+        with serializing():
+            return [self.map(row) for row in rows]
+
+
+# MenuItemSerializer
+MENU_ITEM = RowMapper(
+    [
+        ("id", "id"),
+        ("sku", "sku"),
+        ("title", "title"),
+        ("price", "price", decimal_string),
+        ("stock", "inventory"),
+        ("price_after_tax", "price_after_tax", decimal_string),
+        ("avg_rating", "rating_stats__average"),
+    ]
+)
+
+# CartSerializer
+CART = RowMapper(
+    [
+        ("user", "user_id"),
+        ("menuitem", "menuitem_id"),
+        ("quantity", "quantity"),
+        ("unit_price", "unit_price", decimal_string),
+        ("price", "price", decimal_string),
+    ]
+)
+
+# UserSerializer
+USER = RowMapper([("id", "id"), ("username", "username"), ("email", "email")])
+
+# OrderSerializer, without "items"; see order_rows().
+ORDER = RowMapper(
+    [
+        ("id", "id"),
+        ("user", USER.prefixed("user")),
+        ("delivery_crew", USER.prefixed("delivery_crew", null_if="delivery_crew__id")),
+        ("status", "status"),
+        ("total", "total", decimal_string),
+        ("date", "date", date_string),
+    ]
+)
+
+# OrderItemSerializer
+ORDER_ITEM = RowMapper(
+    [
+        ("id", "id"),
+        ("menuitem", MENU_ITEM.prefixed("menuitem")),
+        ("quantity", "quantity"),
+        ("unit_price", "unit_price", decimal_string),
+        ("price", "price", decimal_string),
+    ]
+)
+
+
+def order_rows(rows):
+    """OrderSerializer(many=True) data for ORDER rows, with their items."""
+    orders = ORDER.many(rows)
+    items = {order["id"]: [] for order in orders}
+    if items:
+        item_rows = list(
+            ORDER_ITEM.values(
+                OrderItem.objects.filter(order_id__in=items).order_by("id"), "order_id"
+            )
+        )
+        for row, item in zip(item_rows, ORDER_ITEM.many(item_rows)):
+            items[row["order_id"]].append(item)
+    for order in orders:
+        order["items"] = items[order["id"]]
+    return orders
@@ -0,0 +1,103 @@
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import FloatField, Value
+from django.db.models.expressions import RawSQL
+
+MENUITEM_TABLE = "LittleLemonAPI_menuitem"
+FTS_TABLE = "LittleLemonAPI_menuitem_fts"
+POSTGRES_INDEX = "LittleLemonAPI_menuitem_title_fts"
+
+# Django remakes SQLite tables (dropping their triggers) on some ALTERs, so
+# every statement here is idempotent and re-run after each migrate.
+SQLITE_SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS "{FTS_TABLE}" USING fts5(
+        title,
+        content='{MENUITEM_TABLE}',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS "{FTS_TABLE}_insert"
+    AFTER INSERT ON "{MENUITEM_TABLE}" BEGIN
+        INSERT INTO "{FTS_TABLE}" (rowid, title) VALUES (new.id, new.title);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS "{FTS_TABLE}_delete"
+    AFTER DELETE ON "{MENUITEM_TABLE}" BEGIN
+        INSERT INTO "{FTS_TABLE}" ("{FTS_TABLE}", rowid, title)
+        VALUES ('delete', old.id, old.title);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS "{FTS_TABLE}_update"
+    AFTER UPDATE OF title ON "{MENUITEM_TABLE}" BEGIN
+        INSERT INTO "{FTS_TABLE}" ("{FTS_TABLE}", rowid, title)
+        VALUES ('delete', old.id, old.title);
+        INSERT INTO "{FTS_TABLE}" (rowid, title) VALUES (new.id, new.title);
+    END""",
+]
+
+POSTGRES_SCHEMA = [
+    f"""CREATE INDEX IF NOT EXISTS "{POSTGRES_INDEX}" ON "{MENUITEM_TABLE}"
+    USING GIN (to_tsvector('simple', title))""",
+]
+
+WORD = re.compile(r"\w+")
+
+
+def install_search_index(using=DEFAULT_DB_ALIAS):
+    """Create the full-text index (and its sync triggers) if missing."""
+    connection = connections[using]
+    statements = {"sqlite": SQLITE_SCHEMA, "postgresql": POSTGRES_SCHEMA}
+    with connection.cursor() as cursor:
+        for statement in statements.get(connection.vendor, []):
+            cursor.execute(statement)
+
+
+def rebuild_search_index(using=DEFAULT_DB_ALIAS):
+    install_search_index(using)
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(
+                f'INSERT INTO "{FTS_TABLE}" ("{FTS_TABLE}") VALUES (\'rebuild\')'
+            )
+        elif connection.vendor == "postgresql":
+            cursor.execute(f'REINDEX INDEX "{POSTGRES_INDEX}"')
+
+
+def search_menu_items(queryset, text):
+    """
+    Filter menu items to titles containing every word of ``text``, each
+    matched as a prefix, and annotate ``rank`` (lower is a better match).
+    """
+    words = WORD.findall(text.lower())
+    if not words:
+        return queryset.none().annotate(rank=Value(0.0))
+    vendor = connections[queryset.db].vendor
+    if vendor == "sqlite":
+        match = " ".join(f'"{word}"*' for word in words)
+        # Join the FTS table so MATCH drives the query and bm25 (FTS5's
+        # hidden "rank" column) is computed once per hit; a correlated
+        # subquery would re-run the MATCH for every row.
+        queryset = queryset.extra(
+            tables=[FTS_TABLE],
+            where=[
+                f'"{FTS_TABLE}".rowid = "{MENUITEM_TABLE}"."id"',
+                f'"{FTS_TABLE}" MATCH %s',
+            ],
+            params=[match],
+        )
+        rank = RawSQL(f'"{FTS_TABLE}".rank', [], output_field=FloatField())
+        return queryset.annotate(rank=rank)
+    if vendor == "postgresql":
+        query = " & ".join(f"{word}:*" for word in words)
+        vector = f"""to_tsvector('simple', "{MENUITEM_TABLE}"."title")"""
+        tsquery = "to_tsquery('simple', %s)"
+        ids = RawSQL(
+            f'SELECT id FROM "{MENUITEM_TABLE}" WHERE {vector} @@ {tsquery}', [query]
+        )
+        rank = RawSQL(
+            f"-ts_rank({vector}, {tsquery})", [query], output_field=FloatField()
+        )
+        return queryset.filter(id__in=ids).annotate(rank=rank)
+    for word in words:
+        queryset = queryset.filter(title__icontains=word)
+    return queryset.annotate(rank=Value(0.0))
@@ -1,48 +1,70 @@
 from rest_framework import serializers
-from .models import MenuItem, Category, Rating, Cart, Order, OrderItem
+from .models import (
+    MenuItem,
+    MenuItemRatingStats,
+    Category,
+    Rating,
+    Cart,
+    DailySales,
+    Order,
+    OrderItem,
+)
 from rest_framework.validators import UniqueTogetherValidator
 from django.contrib.auth.models import User
-from decimal import Decimal
 
-class CategorySerializer(serializers.ModelSerializer):
+from .metrics import SerializerTimingMixin
+
+class CategorySerializer(SerializerTimingMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ['id', 'slug', 'title']
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SerializerTimingMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ["id", "username", "email"]
 
-class MenuItemSerializer(serializers.ModelSerializer):
+class MenuItemSerializer(SerializerTimingMixin, serializers.ModelSerializer):
     stock = serializers.IntegerField(source="inventory")
-    price_after_tax = serializers.SerializerMethodField(method_name="calculate_tax")
+    avg_rating = serializers.FloatField(
+        source="rating_stats.average", read_only=True, default=None
+    )
     category_id = serializers.PrimaryKeyRelatedField(
         source="category", queryset=Category.objects.all(), write_only=True
     )
 
     class Meta:
         model = MenuItem
-        fields = ["id", "title", "price", "stock", "price_after_tax", "category_id"]
-
-    def calculate_tax(self, product: MenuItem):
-        return product.price * Decimal(1.1)
+        fields = [
+            "id",
+            "sku",
+            "title",
+            "price",
+            "stock",
+            "price_after_tax",
+            "avg_rating",
+            "category_id",
+        ]
+        read_only_fields = ["price_after_tax"]
 
-class ManagerSerializer(serializers.ModelSerializer):
+class ManagerSerializer(SerializerTimingMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'groups']
 
-class DeliveryCrewSerializer(serializers.ModelSerializer):
+class DeliveryCrewSerializer(SerializerTimingMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'groups']
 
-class RatingSerializer(serializers.ModelSerializer):
+class RatingSerializer(SerializerTimingMixin, serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(),
         default=serializers.CurrentUserDefault()  
     )
+    menuitem_id = serializers.PrimaryKeyRelatedField(
+        source="menuitem", queryset=MenuItem.objects.all()
+    )
 
     class Meta:    
         model = Rating
@@ -57,13 +79,21 @@ class RatingSerializer(serializers.ModelSerializer):
             'rating': {'max_value': 5, 'min_value': 1},
         }
 
-class CartSerializer(serializers.ModelSerializer):
+class MenuItemRatingStatsSerializer(SerializerTimingMixin, serializers.ModelSerializer):
+    menuitem_id = serializers.IntegerField(source="menuitem.pk", read_only=True)
+    histogram = serializers.DictField(child=serializers.IntegerField(), read_only=True)
+
+    class Meta:
+        model = MenuItemRatingStats
+        fields = ["menuitem_id", "count", "total", "average", "histogram"]
+
+class CartSerializer(SerializerTimingMixin, serializers.ModelSerializer):
     class Meta:
         model = Cart
         fields = ['user', 'menuitem', 'quantity', 'unit_price', 'price']
 
 
-class CartItemSerializer(serializers.ModelSerializer):
+class CartItemSerializer(SerializerTimingMixin, serializers.ModelSerializer):
     menuitem = MenuItemSerializer(read_only=True)
     menuitem_id = serializers.PrimaryKeyRelatedField(
         source="menuitem", queryset=MenuItem.objects.all(), write_only=True
@@ -78,25 +108,39 @@ class CartItemSerializer(serializers.ModelSerializer):
         validated_data["user"] = self.context["request"].user
         return super().create(validated_data)
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(SerializerTimingMixin, serializers.ModelSerializer):
     menuitem = MenuItemSerializer(read_only=True)
 
     class Meta:
         model = OrderItem
         fields = ["id", "menuitem", "quantity", "unit_price", "price"]
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SerializerTimingMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     delivery_crew = UserSerializer(read_only=True)
-    delivery_crew_id = serializers.PrimaryKeyRelatedField(
-        source="delivery_crew", queryset=User.objects.all(),
-        write_only=True, required=False
-    )
-    items = OrderItemSerializer(many=True, read_only=True)
+    items = OrderItemSerializer(source="orderitem_set", many=True, read_only=True)
 
     class Meta:
         model = Order
-        fields = ["id", "user", "delivery_crew", "delivery_crew_id",
-                  "status", "total", "date", "items"]
-        read_only_fields = ["total", "date"]
+        fields = ["id", "user", "delivery_crew", "status", "total", "date", "items"]
+        # Status and crew change through dispatch.update_dispatch.
+        read_only_fields = ["status", "total", "date"]
 
+class DailySalesSerializer(SerializerTimingMixin, serializers.ModelSerializer):
+    class Meta:
+        model = DailySales
+        fields = ["date", "order_count", "revenue"]
+
+class ItemSalesSerializer(SerializerTimingMixin, serializers.Serializer):
+    menuitem_id = serializers.IntegerField()
+    title = serializers.CharField()
+    quantity = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+class SalesReportSerializer(SerializerTimingMixin, serializers.Serializer):
+    start = serializers.DateField()
+    end = serializers.DateField()
+    order_count = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+    days = DailySalesSerializer(many=True)
+    items = ItemSalesSerializer(many=True)
@@ -0,0 +1,130 @@
+from django.contrib.auth.models import Group, User
+from django.db import connections
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_migrate,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .authentication import forget_tokens, forget_users
+from .cache import bump_catalogue_version, get_cache
+from .models import Category, MenuItem, Rating, category_slug_key
+from .permissions import forget_group_ids, forget_roles
+from .ratings import adjust_rating_stats
+from .search import MENUITEM_TABLE, install_search_index
+from .tax import recompute_prices
+
+
+@receiver(pre_save, sender=Category)
+def remember_previous_slug(sender, instance, **kwargs):
+    instance._previous_slug = None
+    if instance.pk is not None:
+        instance._previous_slug = (
+            Category.objects.filter(pk=instance.pk)
+            .values_list("slug", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Category)
+def recompute_category_prices(sender, instance, created, **kwargs):
+    # Tax rates are keyed by slug, so a new slug can mean a new rate.
+    get_cache().delete(category_slug_key(instance.pk))
+    previous = getattr(instance, "_previous_slug", None)
+    if not created and previous is not None and previous != instance.slug:
+        recompute_prices(MenuItem, Category, category_id=instance.pk)
+
+
+@receiver(post_delete, sender=Category)
+def forget_category_slug(sender, instance, **kwargs):
+    get_cache().delete(category_slug_key(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=MenuItem)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_catalogue(sender, **kwargs):
+    bump_catalogue_version()
+
+
+@receiver(pre_save, sender=Rating)
+def remember_previous_rating(sender, instance, **kwargs):
+    instance._previous_rating = None
+    if instance.pk is not None:
+        instance._previous_rating = (
+            Rating.objects.filter(pk=instance.pk)
+            .values_list("menuitem_id", "rating")
+            .first()
+        )
+
+
+@receiver(post_save, sender=Rating)
+def add_rating_to_stats(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous_rating", None)
+    if previous is not None:
+        adjust_rating_stats(*previous, step=-1)
+    adjust_rating_stats(instance.menuitem_id, instance.rating, step=1)
+
+
+@receiver(post_delete, sender=Rating)
+def remove_rating_from_stats(sender, instance, **kwargs):
+    adjust_rating_stats(instance.menuitem_id, instance.rating, step=-1)
+
+
+@receiver(post_migrate)
+def reinstall_search_index(sender, using, **kwargs):
+    # Table remakes during migrate drop the FTS sync triggers; put them back.
+    if sender.name != "LittleLemonAPI":
+        return
+    if MENUITEM_TABLE in connections[using].introspection.table_names():
+        install_search_index(using)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_roles(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith("post_"):
+            forget_roles([(instance.pk, instance.date_joined)])
+        return
+    if action == "pre_clear":
+        instance._cleared_members = list(
+            instance.user_set.values_list("pk", "date_joined")
+        )
+    elif action == "post_clear":
+        forget_roles(getattr(instance, "_cleared_members", []))
+    elif action in ("post_add", "post_remove") and pk_set:
+        forget_roles(
+            User.objects.filter(pk__in=pk_set).values_list("pk", "date_joined")
+        )
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_group_roles(sender, instance, created=False, **kwargs):
+    # Renames and deletes change the names cached for every member.
+    forget_group_ids(instance.name)
+    if not created:
+        forget_roles(instance.user_set.values_list("pk", "date_joined"))
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # Deactivation, password changes and deletes take effect on the next request.
+    forget_users([instance.pk])
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    forget_tokens([instance.key])
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def invalidate_blacklisted_user(sender, instance, **kwargs):
+    user_id = instance.token.user_id
+    if user_id is not None:
+        forget_users([user_id])
@@ -0,0 +1,52 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.utils import timezone
+
+CENT = Decimal("0.01")
+
+
+def tax_rate(category_slug=None):
+    rates = settings.TAX_CATEGORY_RATES
+    return Decimal(str(rates.get(category_slug, settings.TAX_DEFAULT_RATE)))
+
+
+def price_after_tax(price, category_slug=None):
+    """Gross price for ``price``, rounded half-up to the cent."""
+    gross = Decimal(price) * (1 + tax_rate(category_slug))
+    return gross.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def recompute_prices(menuitem_model, category_model, batch_size=1000, category_id=None):
+    """
+    Bring every stored price_after_tax, or only those in category
+    ``category_id``, in line with the current rates. Takes the models as
+    arguments so migrations can pass historical ones. Returns the number of
+    menu items that changed.
+    """
+    categories = category_model.objects.all()
+    items = menuitem_model.objects.all()
+    if category_id is not None:
+        categories = categories.filter(id=category_id)
+        items = items.filter(category_id=category_id)
+    slugs = dict(categories.values_list("id", "slug"))
+    items = items.order_by("id").only(
+        "id", "price", "category_id", "price_after_tax"
+    )
+    now = timezone.now()
+    changed = 0
+    last_id = 0
+    while True:
+        batch = list(items.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return changed
+        last_id = batch[-1].id
+        stale = []
+        for item in batch:
+            gross = price_after_tax(item.price, slugs.get(item.category_id))
+            if gross != item.price_after_tax:
+                item.price_after_tax = gross
+                item.updated_at = now
+                stale.append(item)
+        menuitem_model.objects.bulk_update(stale, ["price_after_tax", "updated_at"])
+        changed += len(stale)
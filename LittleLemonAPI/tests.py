@@ -1,3 +1,2179 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import importlib
+import itertools
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import warnings
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.cache.backends.base import CacheKeyWarning
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.asgi import ASGIHandler
+from django.contrib.auth.models import User, Group
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.http import HttpResponse, QueryDict
+from django.test import (
+    AsyncRequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, force_authenticate
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from . import async_views
+from .authentication import get_auth_cache, get_cached_user, user_cache_key
+from .cache import (
+    bump_catalogue_version,
+    cache_stats,
+    catalogue_version,
+    get_cache,
+    reset_cache_stats,
+)
+from .checkout import place_order
+from .dispatch import Conflict, assign_orders, crew_loads, update_dispatch
+from .events import (
+    HEARTBEAT,
+    MANAGERS,
+    RESET,
+    EventBus,
+    bus,
+    crew_channel,
+    user_channel,
+)
+from .exports import export_chunks, export_orders
+from .filters import MENU_ITEM_ORDERINGS, TO_PRICE_ORDERINGS, filter_menu_items
+from .imports import import_menu
+from .inventory import clear_cart, reserve_inventory
+from .metrics import MetricsMiddleware, registry
+from .models import (
+    Cart,
+    Category,
+    DailyItemSales,
+    DailySales,
+    MenuItem,
+    MenuItemRatingStats,
+    Order,
+    OrderItem,
+    Rating,
+)
+from .pagination import KeysetPaginator
+from .permissions import DELIVERY_CREW, MANAGER, get_role_cache
+from .ratings import rebuild_rating_stats
+from .rows import CART, MENU_ITEM, ORDER, order_rows
+from .rollups import rebuild_rollups
+from .search import FTS_TABLE, search_menu_items
+from .serializers import (
+    CartSerializer,
+    CategorySerializer,
+    MenuItemSerializer,
+    OrderSerializer,
+)
+from .tax import price_after_tax
+from .throttles import TenCallsPerMinute, UserRateThrottle
+
+try:
+    from .renderers import ORJSONRenderer
+except ImportError:
+    # orjson is optional; prod falls back to JSONRenderer without it.
+    ORJSONRenderer = None
+
+
+class OrderQueryCountTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(slug="pasta", title="Massas")
+        self.items = [
+            MenuItem.objects.create(
+                title=f"Item {n}", price=Decimal("10.00"), category=self.category
+            )
+            for n in range(3)
+        ]
+        self.manager = User.objects.create(username="manager")
+        Group.objects.create(name="Manager").user_set.add(self.manager)
+        self.customer = User.objects.create(username="customer")
+        self.crew = User.objects.create(username="crew")
+        self.client = APIClient()
+
+    def create_orders(self, count):
+        for _ in range(count):
+            order = Order.objects.create(
+                user=self.customer, delivery_crew=self.crew, total=Decimal("30.00")
+            )
+            for item in self.items:
+                OrderItem.objects.create(
+                    order=order,
+                    menuitem=item,
+                    quantity=1,
+                    unit_price=item.price,
+                    price=item.price,
+                )
+
+    def test_order_list_includes_items(self):
+        self.create_orders(1)
+        self.client.force_authenticate(self.customer)
+        response = self.client.get("/api/orders/")
+        self.assertEqual(response.status_code, 200)
+        order = response.data["results"][0]
+        self.assertEqual(len(order["items"]), 3)
+        self.assertEqual(order["delivery_crew"]["username"], "crew")
+
+    def test_manager_order_list_query_count_is_constant(self):
+        self.client.force_authenticate(self.manager)
+        self.client.get("/api/orders/")
+        for count in (1, 20):
+            Order.objects.all().delete()
+            self.create_orders(count)
+            # orders with users, prefetched items with menu items; the
+            # manager's roles are already cached
+            with self.assertNumQueries(2):
+                response = self.client.get("/api/orders/")
+            self.assertEqual(len(response.data["results"]), count)
+
+    def test_single_order_query_count(self):
+        self.create_orders(1)
+        order = Order.objects.get()
+        self.client.force_authenticate(self.customer)
+        with self.assertNumQueries(2):
+            response = self.client.get(f"/api/orders/{order.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["items"]), 3)
+
+
+class RolePermissionTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        get_role_cache().clear()
+        category = Category.objects.create(slug="pasta", title="Massas")
+        self.item = MenuItem.objects.create(
+            title="Lasagna", price=Decimal("12.00"), category=category
+        )
+        self.managers = Group.objects.create(name=MANAGER)
+        self.crews = Group.objects.create(name=DELIVERY_CREW)
+        self.manager = User.objects.create(username="manager")
+        self.managers.user_set.add(self.manager)
+        self.crew = User.objects.create(username="crew")
+        self.crews.user_set.add(self.crew)
+        self.customer = User.objects.create(username="customer")
+        self.order = Order.objects.create(
+            user=self.customer,
+            delivery_crew=self.crew,
+            status=Order.Status.ASSIGNED,
+            total=Decimal("12.00"),
+        )
+        self.client = APIClient()
+
+    def group_queries(self, method, url, user, expected_status, data=None):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, format="json")
+        self.assertEqual(response.status_code, expected_status, url)
+        return [q["sql"] for q in queries if "auth_group" in q["sql"]]
+
+    def test_roles_are_loaded_once_then_cached(self):
+        endpoints = [
+            ("get", "/api/orders/", self.manager, 200, None),
+            ("get", f"/api/orders/{self.order.id}/", self.manager, 200, None),
+            (
+                "patch",
+                f"/api/orders/{self.order.id}/",
+                self.crew,
+                200,
+                {"status": "out-for-delivery"},
+            ),
+            ("get", "/api/cache-stats/", self.manager, 200, None),
+            ("post", "/api/menu-items/", self.customer, 403, {"title": "Soup"}),
+            ("delete", f"/api/menu-items/{self.item.id}/", self.customer, 403, None),
+        ]
+        for endpoint in endpoints:
+            get_role_cache().clear()
+            self.assertEqual(len(self.group_queries(*endpoint)), 1, endpoint[1])
+            self.assertEqual(self.group_queries(*endpoint), [], endpoint[1])
+
+    def test_owner_needs_no_role_lookup(self):
+        queries = self.group_queries(
+            "get", f"/api/orders/{self.order.id}/", self.customer, 200
+        )
+        self.assertEqual(queries, [])
+
+    def test_membership_changes_invalidate(self):
+        url = "/api/cache-stats/"
+        self.group_queries("get", url, self.customer, 403)
+        self.managers.user_set.add(self.customer)
+        self.group_queries("get", url, self.customer, 200)
+        self.customer.groups.remove(self.managers)
+        self.group_queries("get", url, self.customer, 403)
+        self.customer.groups.add(self.managers)
+        self.group_queries("get", url, self.customer, 200)
+        self.managers.user_set.clear()
+        self.group_queries("get", url, self.customer, 403)
+
+    def test_group_rename_invalidates(self):
+        url = "/api/cache-stats/"
+        self.group_queries("get", url, self.manager, 200)
+        self.managers.name = "Former managers"
+        with warnings.catch_warnings():
+            # Group names with spaces must still make valid cache keys.
+            warnings.simplefilter("error", CacheKeyWarning)
+            self.managers.save()
+        self.group_queries("get", url, self.manager, 403)
+
+
+class MembershipBatchTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.manager = User.objects.create(username="manager")
+        Group.objects.create(name=MANAGER).user_set.add(self.manager)
+        self.crews = Group.objects.create(name=DELIVERY_CREW)
+        self.couriers = [User.objects.create(username=f"courier{n}") for n in range(5)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+        self.url = "/api/groups/delivery-crew/users/batch/"
+
+    def test_adds_in_one_insert_with_per_item_results(self):
+        self.crews.user_set.add(self.couriers[0])
+        # warms the manager's roles and the group id
+        self.client.post(self.url, {"usernames": ["nobody"]}, format="json")
+        data = {
+            "usernames": ["courier0", "courier1", "nobody"],
+            "ids": [self.couriers[2].id, self.couriers[1].id, 999],
+        }
+        # users, existing memberships, insert (plus the savepoint pair)
+        with self.assertNumQueries(5):
+            response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item["result"] for item in response.data["results"]],
+            ["already_member", "added", "not_found", "added", "already_member", "not_found"],
+        )
+        self.assertEqual(
+            set(self.crews.user_set.values_list("username", flat=True)),
+            {"courier0", "courier1", "courier2"},
+        )
+
+    def test_removes_in_one_delete(self):
+        self.crews.user_set.add(*self.couriers[:3])
+        response = self.client.delete(
+            self.url, {"usernames": ["courier0", "courier1", "courier4"]}, format="json"
+        )
+        self.assertEqual(
+            [item["result"] for item in response.data["results"]],
+            ["removed", "removed", "not_member"],
+        )
+        self.assertEqual(list(self.crews.user_set.all()), [self.couriers[2]])
+
+    def test_membership_change_reaches_cached_roles(self):
+        courier = self.couriers[0]
+        self.client.force_authenticate(courier)
+        self.assertEqual(self.client.get("/api/cache-stats/").status_code, 403)
+        self.client.force_authenticate(self.manager)
+        self.client.post(
+            "/api/groups/manager/users/batch/", {"ids": [courier.id]}, format="json"
+        )
+        self.client.force_authenticate(courier)
+        self.assertEqual(self.client.get("/api/cache-stats/").status_code, 200)
+
+    def test_requires_manager_and_identifiers(self):
+        response = self.client.post(self.url, {}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.client.force_authenticate(self.couriers[0])
+        response = self.client.post(self.url, {"ids": [1]}, format="json")
+        self.assertEqual(response.status_code, 403)
+
+    def test_single_endpoints_require_manager(self):
+        customer = self.couriers[4]
+        self.client.force_authenticate(customer)
+        for group in ("manager", "delivery-crew"):
+            url = f"/api/groups/{group}/users/"
+            self.assertEqual(self.client.get(url).status_code, 403)
+            response = self.client.post(url, {"username": customer.username})
+            self.assertEqual(response.status_code, 403)
+            response = self.client.delete(f"{url}{self.couriers[0].id}/")
+            self.assertEqual(response.status_code, 403)
+        self.assertFalse(customer.groups.exists())
+
+    def test_single_endpoints_reuse_cached_group(self):
+        self.client.post(
+            "/api/groups/delivery-crew/users/", {"username": "courier0"}
+        )
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(
+                "/api/groups/delivery-crew/users/", {"username": "courier1"}
+            )
+        self.assertFalse(
+            any('FROM "auth_group"' in query["sql"] for query in queries)
+        )
+        self.assertEqual(self.crews.user_set.count(), 2)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(slug="pasta", title="Massas")
+        for n in range(7):
+            MenuItem.objects.create(
+                title=f"Item {n}", price=Decimal(n % 3), category=category
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username="customer"))
+
+    def walk(self, **params):
+        seen = []
+        params["perpage"] = 3
+        while True:
+            response = self.client.get("/api/menu-items/", params)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(item["id"] for item in response.data["results"])
+            params["cursor"] = response.data["next"]
+            if params["cursor"] is None:
+                return seen
+
+    def test_walks_every_item_once_in_price_order(self):
+        expected = list(
+            MenuItem.objects.order_by("price", "id").values_list("id", flat=True)
+        )
+        self.assertEqual(self.walk(), expected)
+
+    def test_descending_ordering(self):
+        expected = list(
+            MenuItem.objects.order_by("-price", "-id").values_list("id", flat=True)
+        )
+        self.assertEqual(self.walk(ordering="-price"), expected)
+
+    def test_page_query_count_without_count(self):
+        response = self.client.get("/api/menu-items/", {"perpage": 3})
+        with self.assertNumQueries(1):
+            self.client.get(
+                "/api/menu-items/", {"perpage": 3, "cursor": response.data["next"]}
+            )
+        self.assertNotIn("count", response.data)
+
+    def test_optional_count(self):
+        response = self.client.get("/api/menu-items/", {"count": "true"})
+        self.assertEqual(response.data["count"], 7)
+
+    def test_perpage_ceiling(self):
+        response = self.client.get("/api/menu-items/", {"perpage": 10000})
+        self.assertEqual(len(response.data["results"]), 7)
+        self.assertIsNone(response.data["next"])
+
+    def test_invalid_cursor(self):
+        nested = base64.urlsafe_b64encode(b'["1",[2]]').decode()
+        for cursor in ("not-a-cursor", "WyJ4IiwiMSJd", nested):
+            response = self.client.get("/api/menu-items/", {"cursor": cursor})
+            self.assertEqual(response.status_code, 400)
+        response = self.client.get("/api/orders/", {"cursor": nested})
+        self.assertEqual(response.status_code, 400)
+
+
+class CatalogueCacheTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        reset_cache_stats()
+        self.category = Category.objects.create(slug="pasta", title="Massas")
+        self.item = MenuItem.objects.create(
+            title="Lasagna", price=Decimal("12.00"), category=self.category
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username="customer"))
+
+    def test_menu_items_served_from_cache(self):
+        self.client.get("/api/menu-items/", {"perpage": 5})
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/menu-items/", {"perpage": 5})
+        self.assertEqual(response.data["results"][0]["title"], "Lasagna")
+        self.assertEqual(
+            cache_stats(), {"hits": 1, "misses": 1, "worker": os.getpid()}
+        )
+
+    def test_query_string_is_normalized(self):
+        self.client.get("/api/menu-items/?perpage=5&search=Las&utm=x")
+        with self.assertNumQueries(0):
+            self.client.get("/api/menu-items/?search=Las&perpage=5")
+
+    def test_distinct_filters_are_cached_separately(self):
+        self.client.get("/api/menu-items/", {"to_price": "5"})
+        response = self.client.get("/api/menu-items/", {"to_price": "20"})
+        self.assertEqual(len(response.data["results"]), 1)
+
+    def test_menu_item_save_invalidates(self):
+        self.client.get("/api/menu-items/")
+        self.client.get(f"/api/menu-items/{self.item.id}/")
+        self.item.title = "Lasagna bolognese"
+        self.item.save()
+        response = self.client.get("/api/menu-items/")
+        self.assertEqual(response.data["results"][0]["title"], "Lasagna bolognese")
+        response = self.client.get(f"/api/menu-items/{self.item.id}/")
+        self.assertEqual(response.data["title"], "Lasagna bolognese")
+
+    def test_category_delete_invalidates(self):
+        other = Category.objects.create(slug="salad", title="Saladas")
+        response = self.client.get("/api/categories/")
+        self.assertEqual(len(response.data), 2)
+        other.delete()
+        response = self.client.get("/api/categories/")
+        self.assertEqual(len(response.data), 1)
+
+    def test_version_bumped_by_another_process_reaches_reads(self):
+        location = self.enterContext(tempfile.TemporaryDirectory())
+        backend = "django.core.cache.backends.filebased.FileBasedCache"
+        shared = {"BACKEND": backend, "LOCATION": location}
+        with override_settings(CACHES={**settings.CACHES, "catalogue": shared}):
+            self.client.get("/api/categories/")
+            # No signals, so this process doesn't bump the version itself.
+            Category.objects.bulk_create([Category(slug="salad", title="Saladas")])
+            self.assertEqual(len(self.client.get("/api/categories/").data), 1)
+            subprocess.run(
+                [
+                    sys.executable,
+                    "manage.py",
+                    "shell",
+                    "-c",
+                    "from LittleLemonAPI.cache import bump_catalogue_version; "
+                    "bump_catalogue_version()",
+                ],
+                cwd=settings.BASE_DIR,
+                env={
+                    **os.environ,
+                    "CATALOGUE_CACHE_BACKEND": backend,
+                    "CATALOGUE_CACHE_LOCATION": location,
+                },
+                check=True,
+                capture_output=True,
+            )
+            self.assertEqual(len(self.client.get("/api/categories/").data), 2)
+
+    def test_bump_does_not_read_the_old_version(self):
+        cache = get_cache()
+        before = catalogue_version()
+        # incr is get-then-set on file-based caches; racing bumps could
+        # both land on the same next version.
+        with mock.patch.object(type(cache), "incr", side_effect=AssertionError):
+            bump_catalogue_version()
+        self.assertNotEqual(catalogue_version(), before)
+
+    def test_missing_item_is_not_cached(self):
+        response = self.client.get("/api/menu-items/999/")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(cache_stats()["misses"], 1)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        category = Category.objects.create(slug="pasta", title="Massas")
+        self.item = MenuItem.objects.create(
+            title="Lasagna", price=Decimal("12.00"), category=category
+        )
+        self.customer = User.objects.create(username="customer")
+        self.order = Order.objects.create(user=self.customer, total=Decimal("12.00"))
+        OrderItem.objects.create(
+            order=self.order,
+            menuitem=self.item,
+            quantity=1,
+            unit_price=self.item.price,
+            price=self.item.price,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def assert_not_modified(self, url, serializer):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        with mock.patch.object(
+            serializer, "to_representation", autospec=True
+        ) as to_representation:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        to_representation.assert_not_called()
+        return etag
+
+    def test_menu_items_not_modified(self):
+        url = "/api/menu-items/?perpage=5"
+        etag = self.assert_not_modified(url, MenuItemSerializer)
+        with self.assertNumQueries(0):
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_single_item_not_modified(self):
+        self.assert_not_modified(f"/api/menu-items/{self.item.id}/", MenuItemSerializer)
+
+    def test_categories_not_modified(self):
+        self.assert_not_modified("/api/categories/", CategorySerializer)
+
+    def test_order_not_modified(self):
+        url = f"/api/orders/{self.order.id}/"
+        etag = self.assert_not_modified(url, OrderSerializer)
+        with self.assertNumQueries(1):
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_catalogue_change_changes_etag(self):
+        etag = self.client.get("/api/menu-items/")["ETag"]
+        self.item.price = Decimal("13.00")
+        self.item.save()
+        response = self.client.get("/api/menu-items/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_order_change_changes_etag(self):
+        url = f"/api/orders/{self.order.id}/"
+        etag = self.client.get(url)["ETag"]
+        self.order.status = Order.Status.DELIVERED
+        self.order.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_modified_since(self):
+        response = self.client.get(f"/api/orders/{self.order.id}/")
+        response = self.client.get(
+            f"/api/orders/{self.order.id}/",
+            HTTP_IF_MODIFIED_SINCE=response["Last-Modified"],
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_other_users_get_forbidden_not_304(self):
+        etag = self.client.get(f"/api/orders/{self.order.id}/")["ETag"]
+        self.client.force_authenticate(User.objects.create(username="other"))
+        response = self.client.get(
+            f"/api/orders/{self.order.id}/", HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class AsyncReadViewTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        category = Category.objects.create(slug="pasta", title="Massas")
+        self.item = MenuItem.objects.create(
+            title="Lasagna", price=Decimal("12.00"), category=category
+        )
+        self.customer = User.objects.create(username="customer")
+        self.token = Token.objects.create(user=self.customer)
+        self.order = Order.objects.create(user=self.customer, total=Decimal("12.00"))
+        OrderItem.objects.create(
+            order=self.order,
+            menuitem=self.item,
+            quantity=1,
+            unit_price=self.item.price,
+            price=self.item.price,
+        )
+        self.factory = AsyncRequestFactory()
+
+    async def get(self, view, path, token=None, **kwargs):
+        token = token or self.token.key
+        request = self.factory.get(path, headers={"Authorization": f"Token {token}"})
+        return await view(request, **kwargs)
+
+    async def test_responses_match_the_sync_views(self):
+        client = APIClient()
+        await sync_to_async(client.force_authenticate)(self.customer)
+        for view, path, kwargs in [
+            (async_views.menu_items, "/api/menu-items/?count=1", {}),
+            (async_views.categories, "/api/categories/", {}),
+            (async_views.single_order, f"/api/orders/{self.order.id}/", {"id": self.order.id}),
+        ]:
+            response = await self.get(view, path, **kwargs)
+            expected = await sync_to_async(client.get)(path)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content, expected.content)
+            self.assertEqual(response["ETag"], expected["ETag"])
+            self.assertEqual(response["Content-Type"], "application/json")
+
+    def test_cached_menu_page_runs_no_queries(self):
+        get = async_to_sync(self.get)
+        get(async_views.menu_items, "/api/menu-items/")
+        with self.assertNumQueries(0):
+            response = get(async_views.menu_items, "/api/menu-items/")
+        self.assertEqual(response.status_code, 200)
+
+    async def test_authentication_errors(self):
+        request = self.factory.get("/api/menu-items/")
+        response = await async_views.menu_items(request)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response["WWW-Authenticate"], "Token")
+        response = await self.get(async_views.categories, "/api/categories/", token="bad")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(json.loads(response.content), {"detail": "Invalid token."})
+
+    async def test_jwt(self):
+        access = await sync_to_async(AccessToken.for_user)(self.customer)
+        request = self.factory.get(
+            "/api/categories/", headers={"Authorization": f"Bearer {access}"}
+        )
+        response = await async_views.categories(request)
+        self.assertEqual(response.status_code, 200)
+
+    async def test_order_permissions(self):
+        other = await User.objects.acreate(username="other")
+        token = await Token.objects.acreate(user=other)
+        path = f"/api/orders/{self.order.id}/"
+        response = await self.get(async_views.single_order, path, token.key, id=self.order.id)
+        self.assertEqual(response.status_code, 403)
+        group = await Group.objects.acreate(name=MANAGER)
+        await other.groups.aadd(group)
+        response = await self.get(async_views.single_order, path, token.key, id=self.order.id)
+        self.assertEqual(response.status_code, 200)
+        response = await self.get(async_views.single_order, "/api/orders/0/", id=0)
+        self.assertEqual(response.status_code, 404)
+
+    async def test_conditional_get(self):
+        path = f"/api/orders/{self.order.id}/"
+        etag = (await self.get(async_views.single_order, path, id=self.order.id))["ETag"]
+        request = self.factory.get(
+            path,
+            headers={"Authorization": f"Token {self.token.key}", "If-None-Match": etag},
+        )
+        response = await async_views.single_order(request, id=self.order.id)
+        self.assertEqual(response.status_code, 304)
+
+    async def test_invalid_query_is_a_400(self):
+        response = await self.get(async_views.menu_items, "/api/menu-items/?cursor=x")
+        self.assertEqual(response.status_code, 400)
+
+    async def test_throttled(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        rates = {"anon": None, "user": "1/minute", "tencallsperminute": None}
+        with override_settings(
+            REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates},
+            THROTTLE_STORE={
+                "BACKEND": "LittleLemonAPI.throttles.SQLiteCounterStore",
+                "LOCATION": os.path.join(directory.name, "throttle.sqlite3"),
+            },
+        ):
+            await self.get(async_views.categories, "/api/categories/")
+            response = await self.get(async_views.categories, "/api/categories/")
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+
+    async def test_writes_and_other_renderers_use_the_sync_view(self):
+        request = self.factory.post(
+            "/api/categories/",
+            {"slug": "soup", "title": "Sopas"},
+            content_type="application/json",
+        )
+        force_authenticate(request, self.customer)
+        response = await async_views.categories(request)
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(await Category.objects.filter(slug="soup").aexists())
+        request = self.factory.get(
+            "/api/categories/", headers={"Accept": "application/xml"}
+        )
+        force_authenticate(request, self.customer)
+        response = (await async_views.categories(request)).render()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"<root>", response.content)
+
+
+class OrderEventTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.customer = User.objects.create(username="customer")
+        self.courier = User.objects.create(username="courier")
+        Group.objects.create(name=DELIVERY_CREW).user_set.add(self.courier)
+        self.token = Token.objects.create(user=self.customer)
+        self.factory = AsyncRequestFactory()
+        self.addCleanup(self.close_streams)
+
+    async def connect(self, token=None, **headers):
+        token = token or self.token
+        request = self.factory.get(
+            "/api/orders/events/",
+            headers={"Authorization": f"Token {token.key}", **headers},
+        )
+        response = await async_views.order_events(request)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        return response.streaming_content
+
+    def close_streams(self):
+        for subscriptions in list(bus.subscriptions.values()):
+            for subscription in list(subscriptions):
+                subscription.close()
+
+    async def next(self, stream):
+        return (await asyncio.wait_for(anext(stream), 1)).decode()
+
+    def test_checkout_and_dispatch_publish_to_the_right_channels(self):
+        category = Category.objects.create(slug="pasta", title="Massas")
+        item = MenuItem.objects.create(
+            title="Lasagna", price=Decimal("12.00"), category=category, inventory=5
+        )
+        Cart.objects.create(
+            user=self.customer, menuitem=item, quantity=1, unit_price=12, price=12
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            order = place_order(self.customer)
+        event = bus.history[-1]
+        self.assertEqual(event.type, "order.placed")
+        self.assertEqual(event.channels, {MANAGERS, user_channel(self.customer.pk)})
+
+        other = User.objects.create(username="other")
+        Group.objects.get(name=DELIVERY_CREW).user_set.add(other)
+        with self.captureOnCommitCallbacks(execute=True):
+            update_dispatch(order, delivery_crew=self.courier)
+            update_dispatch(order, delivery_crew=other)
+        event = bus.history[-1]
+        self.assertEqual(event.type, "order.updated")
+        self.assertIn(crew_channel(self.courier.pk), event.channels)
+        self.assertIn(crew_channel(other.pk), event.channels)
+        self.assertIn(f'"delivery_crew_id":{other.pk}', event.message)
+
+    async def test_stream_only_carries_the_users_events(self):
+        stream = await self.connect(await Token.objects.acreate(user=self.courier))
+        bus.publish("order.updated", {"id": 1}, {user_channel(self.customer.pk)})
+        event = bus.publish("order.updated", {"id": 2}, {crew_channel(self.courier.pk)})
+        self.assertEqual(await self.next(stream), event.message)
+
+    async def test_resume_from_last_event_id(self):
+        first, *rest = [
+            bus.publish("order.updated", {"id": n}, {user_channel(self.customer.pk)})
+            for n in range(3)
+        ]
+        stream = await self.connect(**{"Last-Event-ID": str(first.id)})
+        self.assertEqual([await self.next(stream) for _ in rest], [e.message for e in rest])
+
+        stream = await self.connect(**{"Last-Event-ID": "0"})
+        self.assertEqual(await self.next(stream), RESET)
+
+    @override_settings(ORDER_EVENT_HEARTBEAT=0.01)
+    async def test_heartbeat(self):
+        stream = await self.connect()
+        self.assertEqual(await self.next(stream), HEARTBEAT)
+
+    def test_authentication_and_asgi_required(self):
+        client = APIClient()
+        self.assertEqual(client.get("/api/orders/events/").status_code, 501)
+        response = async_to_sync(async_views.order_events)(
+            self.factory.get("/api/orders/events/")
+        )
+        self.assertEqual(response.status_code, 401)
+
+    async def test_slow_subscriber_is_told_to_reload(self):
+        subscription = EventBus(queue_size=2).subscribe(["c"])
+        for n in range(3):
+            subscription.bus.publish("order.updated", {"id": n}, {"c"})
+        await asyncio.sleep(0)
+        self.assertTrue(subscription.missed)
+
+    async def test_fan_out_to_5000_subscribers(self):
+        events = EventBus()
+        subscriptions = [events.subscribe([MANAGERS]) for _ in range(5000)]
+        start = time.perf_counter()
+        # Published from another thread, as a sync view would.
+        publisher = threading.Thread(
+            target=events.publish, args=("order.placed", {"id": 1}, {MANAGERS})
+        )
+        publisher.start()
+        received = await asyncio.gather(*(s.get(timeout=5) for s in subscriptions))
+        elapsed = time.perf_counter() - start
+        publisher.join()
+        self.assertEqual(len({event.id for event in received}), 1)
+        self.assertEqual(len(received), 5000)
+        self.assertLess(elapsed, 2)
+        for subscription in subscriptions:
+            subscription.close()
+        self.assertFalse(events.subscriptions)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        registry.reset()
+        category = Category.objects.create(slug="pasta", title="Massas")
+        MenuItem.objects.create(title="Lasagna", price=Decimal("12.00"), category=category)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username="customer"))
+
+    def test_records_queries_serializer_time_and_bytes(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/menu-items/")
+        labels = ("api/menu-items/", "GET", "200")
+        self.assertEqual(registry.duration.series[labels][-2], 1)
+        self.assertEqual(registry.queries.series[labels][-1], len(queries))
+        self.assertGreater(registry.db_time.series[labels][-1], 0)
+        self.assertGreater(registry.serializer_time.series[labels][-1], 0)
+        self.assertEqual(registry.response_bytes.series[labels][-1], len(response.content))
+
+    def test_serializer_time_of_model_serializers(self):
+        self.client.get("/api/categories/")
+        labels = ("api/categories/", "GET", "200")
+        self.assertGreater(registry.serializer_time.series[labels][-1], 0)
+
+    def test_metrics_endpoint(self):
+        self.client.get("/api/menu-items/")
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'littlelemon_request_db_queries_count{route="api/menu-items/",'
+            'method="GET",status="200"} 1',
+            response.content.decode(),
+        )
+        response = self.client.get("/metrics", REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_TOKEN="scrape-me", METRICS_ALLOWED_IPS=[])
+    def test_metrics_endpoint_bearer_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        for token, status_code in (("wrong", 403), ("scrape-me", 200)):
+            response = self.client.get(
+                "/metrics", headers={"Authorization": f"Bearer {token}"}
+            )
+            self.assertEqual(response.status_code, status_code)
+
+    @override_settings(METRICS_N_PLUS_ONE_THRESHOLD=3)
+    def test_repeated_statements_are_logged(self):
+        group = Group.objects.create(name=MANAGER)
+        group.user_set.add(User.objects.get(username="customer"))
+        for n in range(3):
+            group.user_set.add(User.objects.create(username=f"manager{n}"))
+        with self.assertLogs("LittleLemonAPI.metrics", "WARNING") as logs:
+            self.client.get("/api/groups/manager/users/")
+        self.assertIn("api/groups/manager/users/", logs.output[0])
+        self.assertEqual(registry.n_plus_one.series[("api/groups/manager/users/",)], 1)
+
+    async def test_async_requests_count_queries_run_in_threads(self):
+        async def get_response(request):
+            await Category.objects.acount()
+            return HttpResponse("ok")
+
+        await MetricsMiddleware(get_response)(AsyncRequestFactory().get("/"))
+        self.assertEqual(registry.queries.series[("<unmatched>", "GET", "200")][-1], 1)
+
+
+class CachedAuthenticationTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        get_auth_cache().clear()
+        self.user = User.objects.create(username="customer")
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_warm_requests_run_no_auth_queries(self):
+        jwt = APIClient()
+        jwt.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        for client in (self.client, jwt):
+            self.assertEqual(client.get("/api/categories/").status_code, 200)
+            with self.assertNumQueries(0):
+                self.assertEqual(client.get("/api/categories/").status_code, 200)
+
+    def test_password_hash_is_not_cached(self):
+        self.user.set_password("secret-pass")
+        self.user.save()
+        self.client.get("/api/categories/")
+        cached = get_auth_cache().get(user_cache_key(self.user.pk))
+        self.assertNotIn(self.user.password, repr(cached))
+        user = get_cached_user(self.user.pk)
+        self.assertEqual((user.pk, user.username), (self.user.pk, "customer"))
+        self.assertIn("password", user.get_deferred_fields())
+        self.assertTrue(user.check_password("secret-pass"))
+
+    def test_roles_come_from_the_cached_user(self):
+        self.client.get("/api/categories/")
+        with self.assertNumQueries(0):
+            response = self.client.post("/api/menu-items/", {})
+        self.assertEqual(response.status_code, 403)
+        self.user.groups.add(Group.objects.create(name=MANAGER))
+        # Past the manager check, on to validation.
+        response = self.client.post("/api/menu-items/", {})
+        self.assertEqual(response.status_code, 400)
+
+    def test_deactivation_and_token_deletion(self):
+        self.client.get("/api/categories/")
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get("/api/categories/")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json(), {"detail": "User inactive or deleted."})
+        self.user.is_active = True
+        self.user.save()
+        self.client.get("/api/categories/")
+        self.token.delete()
+        response = self.client.get("/api/categories/")
+        self.assertEqual(response.json(), {"detail": "Invalid token."})
+
+    def test_blacklisting_a_refresh_token_drops_the_user(self):
+        refresh = RefreshToken.for_user(self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+        client.get("/api/categories/")
+        refresh.blacklist()
+        with CaptureQueriesContext(connection) as queries:
+            client.get("/api/categories/")
+        self.assertIn('"auth_user"', queries[0]["sql"])
+
+
+class RowMapperTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(slug="pasta", title="Massas")
+        self.items = [
+            MenuItem.objects.create(
+                title="Lasanha à bolonhesa",
+                sku="LAS-1",
+                price=Decimal("12.50"),
+                category=category,
+                inventory=7,
+            ),
+            MenuItem.objects.create(title="Nhoque", price=Decimal("0.5"), category=category),
+            MenuItem.objects.create(title="Ravioli", price=Decimal("100"), category=category),
+        ]
+        customer = User.objects.create(username="customer", email="c@example.com")
+        courier = User.objects.create(username="courier")
+        for stars, username in ((5, "a"), (4, "b"), (4, "c")):
+            Rating.objects.create(
+                menuitem=self.items[0],
+                rating=stars,
+                user=User.objects.create(username=username),
+            )
+        for crew in (None, courier):
+            order = Order.objects.create(
+                user=customer, delivery_crew=crew, total=Decimal("25.50")
+            )
+            for item in reversed(self.items):
+                OrderItem.objects.create(
+                    order=order,
+                    menuitem=item,
+                    quantity=2,
+                    unit_price=item.price,
+                    price=item.price * 2,
+                )
+        for item in self.items[:2]:
+            Cart.objects.create(
+                user=customer, menuitem=item, quantity=1, unit_price=item.price, price=item.price
+            )
+
+    def assertSameJSON(self, fast, serializer):
+        expected = JSONRenderer().render(serializer.data)
+        self.assertEqual(JSONRenderer().render(fast), expected)
+        if ORJSONRenderer is not None:
+            self.assertEqual(ORJSONRenderer().render(fast), expected)
+
+    def test_golden_output(self):
+        self.assertSameJSON(
+            MENU_ITEM.many(MENU_ITEM.values(MenuItem.objects.order_by("id"))),
+            MenuItemSerializer(
+                MenuItem.objects.select_related("rating_stats").order_by("id"), many=True
+            ),
+        )
+        self.assertSameJSON(
+            order_rows(ORDER.values(Order.objects.order_by("id"))),
+            OrderSerializer(Order.objects.with_items().order_by("id"), many=True),
+        )
+        self.assertSameJSON(
+            CART.many(CART.values(Cart.objects.order_by("id"))),
+            CartSerializer(Cart.objects.order_by("id"), many=True),
+        )
+
+    def test_order_list_queries(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(username="customer"))
+        # Roles, the page of orders and their items.
+        with self.assertNumQueries(3):
+            response = client.get("/api/orders/")
+        self.assertEqual(
+            [item["menuitem"]["title"] for item in response.json()["results"][0]["items"]],
+            ["Ravioli", "Nhoque", "Lasanha à bolonhesa"],
+        )
+
+
+class SettingsProfileTests(TestCase):
+    def load_prod(self, **env):
+        sys.modules.pop("LittleLemon.settings.prod", None)
+        self.addCleanup(sys.modules.pop, "LittleLemon.settings.prod", None)
+        with mock.patch.dict(os.environ, env):
+            return importlib.import_module("LittleLemon.settings.prod")
+
+    def test_prod_profile(self):
+        prod = self.load_prod(
+            DJANGO_SECRET_KEY="secret", DJANGO_ALLOWED_HOSTS="api.example.com"
+        )
+        self.assertEqual(prod.ALLOWED_HOSTS, ["api.example.com"])
+        self.assertEqual(prod.METRICS_ALLOWED_IPS, [])
+        self.assertNotIn("debug_toolbar", prod.INSTALLED_APPS)
+        self.assertFalse(any("debug_toolbar" in name for name in prod.MIDDLEWARE))
+        self.assertEqual(
+            prod.REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"],
+            [
+                "LittleLemonAPI.renderers.ORJSONRenderer"
+                if ORJSONRenderer
+                else "rest_framework.renderers.JSONRenderer"
+            ],
+        )
+        self.assertEqual(len(prod.REST_FRAMEWORK["DEFAULT_AUTHENTICATION_CLASSES"]), 2)
+        self.assertEqual(prod.DATABASES["default"]["CONN_MAX_AGE"], 60)
+        # The shared base settings are copied, not changed.
+        self.assertEqual(settings.DATABASES["default"]["CONN_MAX_AGE"], 0)
+        self.assertTrue(settings.TEMPLATES[0]["APP_DIRS"])
+
+    def test_prod_requires_shared_caches(self):
+        prod = self.load_prod(DJANGO_SECRET_KEY="secret")
+        for alias in ("catalogue", "roles", "auth"):
+            self.assertEqual(
+                prod.CACHES[alias]["BACKEND"],
+                "django.core.cache.backends.filebased.FileBasedCache",
+            )
+        for setting in (
+            "CATALOGUE_CACHE_BACKEND",
+            "ROLE_CACHE_BACKEND",
+            "AUTH_CACHE_BACKEND",
+        ):
+            with self.assertRaises(ImproperlyConfigured):
+                self.load_prod(
+                    DJANGO_SECRET_KEY="secret",
+                    **{setting: "django.core.cache.backends.locmem.LocMemCache"},
+                )
+
+    def test_prod_requires_secret_key(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop("DJANGO_SECRET_KEY", None)
+            with self.assertRaises(ImproperlyConfigured):
+                self.load_prod()
+
+    @skipUnless(ORJSONRenderer, "orjson is not installed")
+    def test_orjson_renderer_matches_json_renderer(self):
+        category = Category.objects.create(slug="pasta", title="Massas")
+        item = MenuItem.objects.create(
+            title="Lasanha à bolonhesa\u2028", price=Decimal("12.50"), category=category
+        )
+        data = {
+            "results": MenuItemSerializer([item], many=True).data,
+            "at": timezone.now(),
+            "price": Decimal("1.10"),
+            1: ["tuple", ("a", None, True, 1.5)],
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            ORJSONRenderer().render(data, "application/json; indent=4"),
+            JSONRenderer().render(data, "application/json; indent=4"),
+        )
+
+
+class CartReservationTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(slug="pasta", title="Massas")
+        self.item = MenuItem.objects.create(
+            title="Lasagna", price=Decimal("12.00"), category=category, inventory=5
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username="customer"))
+
+    def test_reserves_stock(self):
+        response = self.client.post(
+            "/api/cart/", {"menuitem": self.item.id, "quantity": 3}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["price"], "36.00")
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.inventory, 2)
+
+    def test_insufficient_stock(self):
+        response = self.client.post(
+            "/api/cart/", {"menuitem": self.item.id, "quantity": 6}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Cart.objects.exists())
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.inventory, 5)
+
+    def test_invalid_quantity(self):
+        for quantity in ("0", "-1", "many"):
+            response = self.client.post(
+                "/api/cart/", {"menuitem": self.item.id, "quantity": quantity}
+            )
+            self.assertEqual(response.status_code, 400)
+
+    def test_duplicate_line_does_not_reserve(self):
+        self.client.post("/api/cart/", {"menuitem": self.item.id, "quantity": 1})
+        response = self.client.post(
+            "/api/cart/", {"menuitem": self.item.id, "quantity": 1}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.inventory, 4)
+
+    def test_only_selling_out_and_restocking_invalidate_the_catalogue(self):
+        customer = User.objects.get(username="customer")
+
+        def version_after(action):
+            with self.captureOnCommitCallbacks(execute=True):
+                action()
+            return catalogue_version()
+
+        def add(quantity):
+            return lambda: self.client.post(
+                "/api/cart/", {"menuitem": self.item.id, "quantity": quantity}
+            )
+
+        start = catalogue_version()
+        self.assertEqual(version_after(add(2)), start)
+        self.assertEqual(version_after(lambda: clear_cart(customer)), start)
+        sold_out = version_after(add(5))
+        self.assertNotEqual(sold_out, start)
+        self.assertNotEqual(version_after(lambda: clear_cart(customer)), sold_out)
+
+    def test_reservation_is_a_single_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            reserve_inventory(self.item.id, 2)
+        updates = [q["sql"] for q in queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"inventory" >= 2', updates[0])
+
+
+class SQLiteTuningTests(TestCase):
+    def test_connection_settings(self):
+        with connection.cursor() as cursor:
+            pragmas = {}
+            for pragma in ("journal_mode", "synchronous", "busy_timeout", "mmap_size"):
+                cursor.execute(f"PRAGMA {pragma}")
+                pragmas[pragma] = cursor.fetchone()[0]
+        self.assertEqual(
+            pragmas,
+            {
+                "journal_mode": "wal",
+                "synchronous": 1,
+                "busy_timeout": 20000,
+                "mmap_size": 268435456,
+            },
+        )
+        self.assertEqual(connection.transaction_mode, "IMMEDIATE")
+
+
+class ConcurrentReservationTests(TransactionTestCase):
+    def setUp(self):
+        category = Category.objects.create(slug="pasta", title="Massas")
+        self.item = MenuItem.objects.create(
+            title="Lasagna", price=Decimal("12.00"), category=category, inventory=40
+        )
+
+    def hammer(self, worker, threads=8):
+        results = []
+        lock = threading.Lock()
+
+        def run(index):
+            try:
+                outcome = worker(index)
+                with lock:
+                    results.append(outcome)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=run, args=(n,)) for n in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return results
+
+    def test_no_oversell(self):
+        def worker(index):
+            return [reserve_inventory(self.item.id, 1) for _ in range(10)]
+
+        results = self.hammer(worker)
+        successes = sum(sum(batch) for batch in results)
+        self.item.refresh_from_db()
+        self.assertEqual(successes, 40)
+        self.assertEqual(self.item.inventory, 0)
+
+    def test_no_lost_updates(self):
+        def release_inventory(menuitem_id, quantity):
+            MenuItem.objects.filter(id=menuitem_id).update(
+                inventory=F("inventory") + quantity
+            )
+
+        def worker(index):
+            for _ in range(10):
+                if index % 2:
+                    release_inventory(self.item.id, 1)
+                else:
+                    reserve_inventory(self.item.id, 1)
+
+        self.hammer(worker)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.inventory, 40)
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(slug="pasta", title="Massas")
+        self.items = [
+            MenuItem.objects.create(
+                title=f"Item {n}", price=Decimal("2.50"), category=category
+            )
+            for n in range(30)
+        ]
+        self.customer = User.objects.create(username="customer")
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def fill_cart(self, size):
+        Cart.objects.bulk_create(
+            Cart(
+                user=self.customer,
+                menuitem=item,
+                quantity=2,
+                unit_price=item.price,
+                price=item.price * 2,
+            )
+            for item in self.items[:size]
+        )
+
+    def test_places_order_and_clears_cart(self):
+        self.fill_cart(3)
+        response = self.client.post("/api/orders/")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["total"], "15.00")
+        self.assertEqual(len(response.data["items"]), 3)
+        self.assertFalse(Cart.objects.exists())
+
+    def test_empty_cart(self):
+        response = self.client.post("/api/orders/")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_query_count_is_independent_of_cart_size(self):
+        for size in (1, 30):
+            self.fill_cart(size)
+            # savepoint, cart lines, total, order, order items, two upserts
+            # each for the daily and item rollups, delete, release, then the
+            # order read path (order, items)
+            with self.assertNumQueries(13):
+                place_order(self.customer)
+                Order.objects.with_items().get(user=self.customer, total=size * 5)
+
+
+class MenuImportTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        Category.objects.create(slug="pasta", title="Massas")
+        Category.objects.create(slug="salad", title="Saladas")
+        self.manager = User.objects.create(username="manager")
+        Group.objects.create(name=MANAGER).user_set.add(self.manager)
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def rows(self, count, **fields):
+        return [
+            {
+                "sku": f"SKU-{n}",
+                "title": f"Lasagna {n}",
+                "price": "10.00",
+                "category": "pasta",
+                "stock": 5,
+                **fields,
+            }
+            for n in range(count)
+        ]
+
+    def post(self, rows):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post("/api/menu-items/import/", rows, format="json")
+
+    def test_creates_updates_and_counts_unchanged(self):
+        response = self.post(self.rows(3))
+        self.assertEqual(response.data, {"created": 3, "updated": 0, "unchanged": 0})
+        rows = self.rows(4)
+        rows[0]["price"] = "12.00"
+        rows[1]["category"] = "salad"
+        response = self.post(rows)
+        self.assertEqual(response.data, {"created": 1, "updated": 2, "unchanged": 1})
+        item = MenuItem.objects.get(sku="SKU-0")
+        self.assertEqual(item.price_after_tax, Decimal("13.20"))
+        self.assertEqual(MenuItem.objects.get(sku="SKU-1").category.slug, "salad")
+        self.assertEqual(MenuItem.objects.count(), 4)
+
+    def test_missing_optional_fields_keep_current_values(self):
+        self.post(self.rows(1, featured=True))
+        row = self.rows(1)[0]
+        del row["stock"]
+        response = self.post([{**row, "title": "Lasagna bolognese"}])
+        self.assertEqual(response.data["updated"], 1)
+        item = MenuItem.objects.get(sku="SKU-0")
+        self.assertEqual((item.inventory, item.featured), (5, True))
+
+    def test_imported_titles_are_searchable_and_cache_invalidated(self):
+        self.client.get("/api/menu-items/")
+        self.post(self.rows(2, title="Risotto"))
+        response = self.client.get("/api/menu-items/", {"search": "risotto"})
+        self.assertEqual(len(response.data["results"]), 2)
+        self.post(self.rows(2, title="Gnocchi"))
+        response = self.client.get("/api/menu-items/", {"search": "risotto"})
+        self.assertEqual(response.data["results"], [])
+
+    def test_queries_per_batch(self):
+        rows = self.rows(10)
+        # categories, savepoint, then per batch the existing rows and one
+        # upsert, release
+        with self.assertNumQueries(7):
+            import_menu(rows, batch_size=5)
+        with self.assertNumQueries(5):
+            import_menu(rows, batch_size=5)
+
+    def test_invalid_rows_reject_the_whole_import(self):
+        rows = self.rows(4)
+        rows[1]["category"] = "soup"
+        rows[2]["sku"] = "SKU-0"
+        rows[3]["price"] = "-1"
+        response = self.post(rows)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(sorted(response.data["errors"]), [3])
+        del rows[3]
+        response = self.post(rows)
+        self.assertEqual(sorted(response.data["errors"]), [1, 2])
+        self.assertFalse(MenuItem.objects.exists())
+
+    def test_csv_and_dry_run(self):
+        body = "sku,title,price,category,featured,stock\nA1,Salad,5.00,salad,true,\n"
+        response = self.client.post(
+            "/api/menu-items/import/?dry_run=1", body, content_type="text/csv"
+        )
+        self.assertEqual(response.data["created"], 1)
+        self.assertFalse(MenuItem.objects.exists())
+        self.client.post("/api/menu-items/import/", body, content_type="text/csv")
+        item = MenuItem.objects.get(sku="A1")
+        self.assertEqual((item.featured, item.inventory), (True, 0))
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "menu.json")
+            with open(path, "w") as menu:
+                json.dump({"items": self.rows(3)}, menu)
+            out = StringIO()
+            call_command("import_menu", path, stdout=out)
+            self.assertEqual(out.getvalue().strip(), "3 created, 0 updated, 0 unchanged.")
+
+    def test_requires_manager(self):
+        self.client.force_authenticate(User.objects.create(username="customer"))
+        self.assertEqual(self.post(self.rows(1)).status_code, 403)
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        category = Category.objects.create(slug="pasta", title="Massas")
+        self.items = [
+            MenuItem.objects.create(
+                title=f"Item {n}", price=Decimal(n + 1), category=category
+            )
+            for n in range(3)
+        ]
+        self.customer = User.objects.create(username="customer")
+        self.manager = User.objects.create(username="manager")
+        Group.objects.create(name=MANAGER).user_set.add(self.manager)
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def checkout(self, quantities):
+        for item, quantity in zip(self.items, quantities):
+            if quantity:
+                Cart.objects.create(
+                    user=self.customer,
+                    menuitem=item,
+                    quantity=quantity,
+                    unit_price=item.price,
+                    price=item.price * quantity,
+                )
+        return place_order(self.customer)
+
+    def rollups(self):
+        return (
+            list(DailySales.objects.values_list("date", "order_count", "revenue")),
+            sorted(
+                DailyItemSales.objects.values_list(
+                    "date", "menuitem_id", "quantity", "revenue"
+                )
+            ),
+        )
+
+    def test_checkout_updates_rollups(self):
+        order = self.checkout([1, 2, 0])
+        self.checkout([0, 1, 3])
+        days, items = self.rollups()
+        self.assertEqual(days, [(order.date, 2, Decimal("16.00"))])
+        self.assertEqual(
+            [row[2:] for row in items],
+            [(1, Decimal("1.00")), (3, Decimal("6.00")), (3, Decimal("9.00"))],
+        )
+
+    def test_rebuild_matches_incremental_rollups(self):
+        self.checkout([1, 2, 0])
+        old = self.checkout([0, 1, 3])
+        Order.objects.filter(pk=old.pk).update(date=old.date - timedelta(days=3))
+        rebuild_rollups(Order, OrderItem, DailySales, DailyItemSales)
+        expected = self.rollups()
+        self.assertEqual(len(expected[0]), 2)
+        DailySales.objects.update(order_count=0)
+        DailyItemSales.objects.all().delete()
+        out = StringIO()
+        call_command("rebuild_rollups", "--chunk-size", "1", stdout=out)
+        self.assertEqual(self.rollups(), expected)
+        self.assertEqual(out.getvalue().strip(), "Rebuilt 2 days of sales.")
+
+    def test_rebuild_limited_to_range(self):
+        order = self.checkout([1, 0, 0])
+        DailySales.objects.create(
+            date=order.date - timedelta(days=1), order_count=5, revenue=50
+        )
+        call_command("rebuild_rollups", "--start", str(order.date), stdout=StringIO())
+        self.assertEqual(DailySales.objects.count(), 2)
+
+    def test_analytics_reads_rollups_only(self):
+        order = self.checkout([1, 2, 0])
+        self.checkout([0, 1, 3])
+        self.client.get("/api/analytics/")
+        # sales days, top items
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/analytics/", {"top": 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["order_count"], 2)
+        self.assertEqual(response.data["revenue"], "16.00")
+        self.assertEqual(response.data["end"], str(timezone.localdate()))
+        self.assertEqual(
+            [(item["title"], item["quantity"]) for item in response.data["items"]],
+            [("Item 1", 3), ("Item 2", 3)],
+        )
+        response = self.client.get(
+            "/api/analytics/", {"end": str(order.date - timedelta(days=1))}
+        )
+        self.assertEqual(response.data["days"], [])
+
+    def test_analytics_validation_and_permissions(self):
+        response = self.client.get(
+            "/api/analytics/", {"start": "2024-02-01", "end": "2024-01-01"}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get("/api/analytics/").status_code, 403)
+
+
+class DispatchTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.manager = User.objects.create(username="manager")
+        Group.objects.create(name=MANAGER).user_set.add(self.manager)
+        self.crews = Group.objects.create(name=DELIVERY_CREW)
+        self.couriers = [User.objects.create(username=f"courier{n}") for n in range(3)]
+        self.crews.user_set.add(*self.couriers)
+        self.customer = User.objects.create(username="customer")
+        self.client = APIClient()
+
+    def create_orders(self, count, **fields):
+        return [
+            Order.objects.create(user=self.customer, total=Decimal("10.00"), **fields)
+            for _ in range(count)
+        ]
+
+    def patch(self, user, order, data):
+        self.client.force_authenticate(user)
+        return self.client.patch(f"/api/orders/{order.id}/", data, format="json")
+
+    def test_status_workflow(self):
+        (order,) = self.create_orders(1)
+        courier = self.couriers[0]
+        response = self.patch(self.manager, order, {"delivery_crew_id": courier.id})
+        self.assertEqual(response.data["status"], "assigned")
+        self.assertEqual(response.data["delivery_crew"]["username"], "courier0")
+        response = self.patch(courier, order, {"status": "delivered"})
+        self.assertEqual(response.status_code, 400)
+        for step in ("out-for-delivery", "delivered"):
+            response = self.patch(courier, order, {"status": step})
+            self.assertEqual(response.data["status"], step)
+        response = self.patch(self.manager, order, {"delivery_crew_id": None})
+        self.assertEqual(response.status_code, 400)
+
+    def test_only_the_assigned_crew_member_moves_an_order(self):
+        (order,) = self.create_orders(1, delivery_crew=self.couriers[0], status="assigned")
+        other = self.couriers[1]
+        for user, data in [
+            (other, {"status": "out-for-delivery"}),
+            (self.couriers[0], {"delivery_crew_id": other.id}),
+            (self.customer, {"status": "out-for-delivery"}),
+        ]:
+            self.assertEqual(self.patch(user, order, data).status_code, 403)
+        response = self.patch(self.manager, order, {"delivery_crew_id": self.customer.id})
+        self.assertEqual(response.status_code, 400)
+
+    def test_stale_update_conflicts(self):
+        (order,) = self.create_orders(1)
+        stale = Order.objects.get(pk=order.pk)
+        update_dispatch(order, delivery_crew=self.couriers[0])
+        with self.assertRaises(Conflict):
+            update_dispatch(stale, delivery_crew=self.couriers[1])
+
+    def test_queue_lists_own_open_orders(self):
+        mine = self.create_orders(3, delivery_crew=self.couriers[0], status="assigned")
+        self.create_orders(1, delivery_crew=self.couriers[0], status="delivered")
+        self.create_orders(2, delivery_crew=self.couriers[1], status="assigned")
+        self.client.force_authenticate(self.couriers[0])
+        response = self.client.get("/api/orders/queue/")
+        self.assertEqual([o["id"] for o in response.data["results"]], [o.id for o in mine])
+        response = self.client.get("/api/orders/queue/", {"status": "delivered"})
+        self.assertEqual(response.status_code, 400)
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get("/api/orders/queue/").status_code, 403)
+
+    def test_queue_uses_crew_status_index(self):
+        plan = (
+            Order.objects.filter(delivery_crew=self.couriers[0], status="assigned")
+            .order_by("date", "id")
+            .explain()
+        )
+        self.assertIn("LittleLemon_deliver_9c6e48_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_assignment_balances_load(self):
+        self.create_orders(2, delivery_crew=self.couriers[0], status="out-for-delivery")
+        self.create_orders(1, delivery_crew=self.couriers[1], status="delivered")
+        self.create_orders(7)
+        self.assertEqual(assign_orders(), 7)
+        self.assertEqual(sorted(crew_loads().values()), [3, 3, 3])
+        self.assertEqual(assign_orders(), 0)
+
+    def test_assignment_skips_orders_claimed_concurrently(self):
+        orders = self.create_orders(3)
+        real_now = timezone.now
+
+        def claim_first_order():
+            # Another dispatcher assigns it between our SELECT and UPDATE.
+            Order.objects.filter(pk=orders[0].pk).update(
+                delivery_crew=self.couriers[2], status="assigned"
+            )
+            return real_now()
+
+        with mock.patch("LittleLemonAPI.dispatch.timezone.now", claim_first_order):
+            self.assertEqual(assign_orders(), 2)
+        orders[0].refresh_from_db()
+        self.assertEqual(orders[0].delivery_crew, self.couriers[2])
+
+    def test_assignment_publishes_each_order_on_commit(self):
+        orders = self.create_orders(2)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.assertEqual(assign_orders(), 2)
+        self.assertEqual(len(callbacks), 2)
+        for order, event in zip(orders, list(bus.history)[-2:]):
+            order.refresh_from_db()
+            self.assertEqual(event.type, "order.updated")
+            self.assertIn(crew_channel(order.delivery_crew_id), event.channels)
+            self.assertIn(f'"id":{order.pk},', event.message)
+
+    def test_dispatch_command(self):
+        self.create_orders(2)
+        out = StringIO()
+        call_command("dispatch_orders", stdout=out)
+        self.assertEqual(out.getvalue().strip(), "Assigned 2 orders.")
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        category = Category.objects.create(slug="pasta", title="Massas")
+        self.items = [
+            MenuItem.objects.create(
+                title=f"Item, {n}", price=Decimal("2.50"), category=category
+            )
+            for n in range(5)
+        ]
+        self.customer = User.objects.create(username="customer")
+        self.manager = User.objects.create(username="manager")
+        Group.objects.create(name=MANAGER).user_set.add(self.manager)
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def create_orders(self, count, lines=2):
+        orders = Order.objects.bulk_create(
+            Order(user=self.customer, total=Decimal("2.50") * lines)
+            for _ in range(count)
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(
+                order=order,
+                menuitem=item,
+                quantity=1,
+                unit_price=item.price,
+                price=item.price,
+            )
+            for order in orders
+            for item in self.items[:lines]
+        )
+
+    def download(self, **params):
+        response = self.client.get("/api/orders/export/", params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_csv_has_a_row_per_order_item(self):
+        self.create_orders(3)
+        response, body = self.download()
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        rows = list(csv.reader(body.splitlines()))
+        self.assertEqual(rows[0][:3], ["order_id", "date", "status"])
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(
+            rows[1][3:],
+            ["customer", "", "5.00", str(self.items[0].id), "Item, 0", "1", "2.50", "2.50"],
+        )
+
+    def test_ndjson_has_a_line_per_order(self):
+        self.create_orders(3)
+        response, body = self.download(output="ndjson")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        orders = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(orders), 3)
+        self.assertEqual(orders[0]["total"], "5.00")
+        self.assertEqual(
+            [item["menuitem"] for item in orders[0]["items"]], ["Item, 0", "Item, 1"]
+        )
+
+    def test_range_and_permissions(self):
+        self.create_orders(2)
+        Order.objects.filter(pk=Order.objects.first().pk).update(
+            date=timezone.localdate() - timedelta(days=40)
+        )
+        _, body = self.download(output="ndjson")
+        self.assertEqual(len(body.splitlines()), 1)
+        response = self.client.get("/api/orders/export/", {"output": "xml"})
+        self.assertEqual(response.status_code, 400)
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get("/api/orders/export/").status_code, 403)
+
+    def test_items_are_read_per_chunk(self):
+        self.create_orders(25)
+        today = timezone.localdate()
+        # one chunked read of the orders, one items query per chunk of 10
+        with self.assertNumQueries(4):
+            rows = sum(1 for _ in export_chunks("csv", export_orders(today, today, 10), 1))
+        self.assertEqual(rows, 51)
+
+    def test_memory_does_not_grow_with_export_size(self):
+        today = timezone.localdate()
+
+        def peak():
+            tracemalloc.start()
+            try:
+                for _ in export_chunks("csv", export_orders(today, today, 100)):
+                    pass
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        self.create_orders(200, lines=5)
+        small = peak()
+        self.create_orders(800, lines=5)
+        large = peak()
+        self.assertEqual(OrderItem.objects.count(), 5000)
+        self.assertLess(large, small * 1.5)
+
+    def test_command_writes_file(self):
+        self.create_orders(2)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "orders.ndjson")
+            call_command("export_orders", "--format", "ndjson", "--output", path)
+            with open(path) as export:
+                self.assertEqual(len(export.readlines()), 2)
+
+
+class OrderExportASGITests(TransactionTestCase):
+    def setUp(self):
+        category = Category.objects.create(slug="pasta", title="Massas")
+        item = MenuItem.objects.create(
+            title="Lasagna", price=Decimal("2.50"), category=category
+        )
+        customer = User.objects.create(username="customer")
+        orders = Order.objects.bulk_create(
+            Order(user=customer, total=Decimal("2.50")) for _ in range(2000)
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, menuitem=item, quantity=1, unit_price=2.5, price=2.5)
+            for order in orders
+        )
+        manager = User.objects.create(username="manager")
+        Group.objects.create(name=MANAGER).user_set.add(manager)
+        self.token = Token.objects.create(user=manager)
+
+    async def get(self, path):
+        messages = []
+        disconnect = asyncio.Event()
+        requests = iter([{"type": "http.request", "body": b"", "more_body": False}])
+
+        async def receive():
+            message = next(requests, None)
+            if message is None:
+                await disconnect.wait()
+                message = {"type": "http.disconnect"}
+            return message
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [
+                (b"host", b"testserver"),
+                (b"authorization", f"Token {self.token.key}".encode()),
+            ],
+            "server": ("testserver", 80),
+            "client": ("127.0.0.1", 50000),
+        }
+        await ASGIHandler()(scope, receive, send)
+        return messages
+
+    def test_export_streams_through_the_asgi_handler(self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            messages = async_to_sync(self.get)("/api/orders/export/")
+        # Django warns when it has to read a sync iterator up front.
+        self.assertFalse([w for w in caught if "synchronous" in str(w.message)])
+        self.assertEqual(messages[0]["status"], 200)
+        bodies = [m["body"] for m in messages[1:] if m.get("body")]
+        self.assertGreater(len(bodies), 1)
+        rows = list(csv.reader(b"".join(bodies).decode().splitlines()))
+        self.assertEqual(len(rows), 2001)
+
+
+class ClearCartTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(slug="pasta", title="Massas")
+        self.items = [
+            MenuItem.objects.create(
+                title=f"Item {n}", price=Decimal("1.00"), category=category, inventory=10
+            )
+            for n in range(100)
+        ]
+        self.customer = User.objects.create(username="customer")
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def fill_cart(self, size):
+        Cart.objects.bulk_create(
+            Cart(
+                user=self.customer,
+                menuitem=item,
+                quantity=n % 3 + 1,
+                unit_price=item.price,
+                price=item.price,
+            )
+            for n, item in enumerate(self.items[:size])
+        )
+
+    def test_restores_inventory(self):
+        self.fill_cart(3)
+        Cart.objects.create(
+            user=User.objects.create(username="other"),
+            menuitem=self.items[0],
+            quantity=1,
+            unit_price=Decimal("1.00"),
+            price=Decimal("1.00"),
+        )
+        response = self.client.delete("/api/cart/")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(
+            list(
+                MenuItem.objects.order_by("id").values_list("inventory", flat=True)[:4]
+            ),
+            [11, 12, 13, 10],
+        )
+        self.assertEqual(Cart.objects.count(), 1)
+
+    def test_empty_cart(self):
+        response = self.client.delete("/api/cart/")
+        self.assertEqual(response.status_code, 400)
+
+    def test_query_count_is_independent_of_cart_size(self):
+        for size in (1, 10, 100):
+            self.fill_cart(size)
+            # savepoint, cart lines, sold-out check, inventory update, delete,
+            # release
+            with self.assertNumQueries(6):
+                self.assertTrue(clear_cart(self.customer))
+            self.assertFalse(Cart.objects.exists())
+
+
+class PriceAfterTaxTests(TestCase):
+    def setUp(self):
+        self.pasta = Category.objects.create(slug="pasta", title="Massas")
+        self.desert = Category.objects.create(slug="desert", title="Sobremesas")
+
+    def test_rounds_half_up_to_the_cent(self):
+        self.assertEqual(price_after_tax(Decimal("10.05")), Decimal("11.06"))
+        self.assertEqual(price_after_tax(Decimal("8.50")), Decimal("9.35"))
+
+    @override_settings(TAX_CATEGORY_RATES={"desert": "0.05"})
+    def test_stored_on_save_with_category_rate(self):
+        pasta = MenuItem.objects.create(
+            title="Lasagna", price=Decimal("10.00"), category=self.pasta
+        )
+        cake = MenuItem.objects.create(
+            title="Cake", price=Decimal("10.00"), category=self.desert
+        )
+        self.assertEqual(pasta.price_after_tax, Decimal("11.00"))
+        self.assertEqual(cake.price_after_tax, Decimal("10.50"))
+        cake.price = Decimal("20.00")
+        cake.save(update_fields=["price"])
+        cake.refresh_from_db()
+        self.assertEqual(cake.price_after_tax, Decimal("21.00"))
+
+    @override_settings(TAX_CATEGORY_RATES={"desert": "0.05"})
+    def test_category_change_and_slug_rename_reprice(self):
+        item = MenuItem.objects.create(
+            title="Cake", price=Decimal("10.00"), category=self.pasta
+        )
+        item = MenuItem.objects.get(pk=item.pk)
+        item.category_id = self.desert.pk
+        item.save(update_fields=["category"])
+        item.refresh_from_db()
+        self.assertEqual(item.price_after_tax, Decimal("10.50"))
+        self.desert.slug = "sweets"
+        self.desert.save()
+        item.refresh_from_db()
+        self.assertEqual(item.price_after_tax, Decimal("11.00"))
+        # The slug cache was dropped with the rename.
+        item = MenuItem.objects.get(pk=item.pk)
+        item.save(update_fields=["price"])
+        self.assertEqual(item.price_after_tax, Decimal("11.00"))
+
+    def test_save_reads_slug_from_cache(self):
+        item = MenuItem.objects.create(
+            title="Cake", price=Decimal("10.00"), category=self.desert
+        )
+        MenuItem.objects.get(pk=item.pk).save(update_fields=["price"])
+        item = MenuItem.objects.get(pk=item.pk)
+        with self.assertNumQueries(1):
+            item.save(update_fields=["price"])
+
+    def test_recompute_command(self):
+        item = MenuItem.objects.create(
+            title="Cake", price=Decimal("10.00"), category=self.desert
+        )
+        out = StringIO()
+        with override_settings(TAX_CATEGORY_RATES={"desert": "0.05"}):
+            call_command("recompute_prices", stdout=out)
+        self.assertIn("Updated 1 menu items.", out.getvalue())
+        item.refresh_from_db()
+        self.assertEqual(item.price_after_tax, Decimal("10.50"))
+
+    def test_serialized_from_column_and_sortable(self):
+        MenuItem.objects.create(
+            title="Cake", price=Decimal("12.00"), category=self.desert
+        )
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username="customer"))
+        response = client.get("/api/menu-items/", {"ordering": "-price_after_tax"})
+        self.assertEqual(response.data["results"][0]["price_after_tax"], "13.20")
+
+
+class RatingStatsTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        category = Category.objects.create(slug="pasta", title="Massas")
+        self.item = MenuItem.objects.create(
+            title="Lasagna", price=Decimal("12.00"), category=category
+        )
+        self.users = [User.objects.create(username=f"user{n}") for n in range(3)]
+        self.client = APIClient()
+
+    def stats(self):
+        return MenuItemRatingStats.objects.get(menuitem=self.item)
+
+    def test_maintained_on_create_update_delete(self):
+        ratings = [
+            Rating.objects.create(menuitem=self.item, user=user, rating=value)
+            for user, value in zip(self.users, (5, 4, 4))
+        ]
+        stats = self.stats()
+        self.assertEqual((stats.count, stats.total, stats.average), (3, 13, 4.33))
+        self.assertEqual(stats.histogram, {"1": 0, "2": 0, "3": 0, "4": 2, "5": 1})
+
+        ratings[0].rating = 1
+        ratings[0].save()
+        stats = self.stats()
+        self.assertEqual((stats.count, stats.total), (3, 9))
+        self.assertEqual((stats.stars_1, stats.stars_5), (1, 0))
+
+        ratings[1].delete()
+        ratings[2].delete()
+        ratings[0].delete()
+        stats = self.stats()
+        self.assertEqual((stats.count, stats.total, stats.average), (0, 0, None))
+
+    def test_rebuild_matches_incremental(self):
+        for user, value in zip(self.users, (2, 3, 5)):
+            Rating.objects.create(menuitem=self.item, user=user, rating=value)
+        expected = self.stats()
+        rebuild_rating_stats(Rating, MenuItemRatingStats)
+        rebuilt = self.stats()
+        self.assertEqual(rebuilt.histogram, expected.histogram)
+        self.assertEqual(rebuilt.average, expected.average)
+
+    def test_rating_endpoint_updates_stats_endpoint(self):
+        self.client.force_authenticate(self.users[0])
+        response = self.client.post(
+            "/api/ratings/", {"menuitem_id": self.item.id, "rating": 3}
+        )
+        self.assertEqual(response.status_code, 201)
+        response = self.client.get(f"/api/menu-items/{self.item.id}/ratings/")
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(response.data["histogram"]["3"], 1)
+
+    def test_stats_endpoint_without_ratings(self):
+        response = self.client.get(f"/api/menu-items/{self.item.id}/ratings/")
+        self.assertEqual(response.data["count"], 0)
+        self.assertIsNone(response.data["average"])
+        response = self.client.get("/api/menu-items/999/ratings/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_avg_rating_in_menu_items_without_extra_queries(self):
+        for n in range(3):
+            item = MenuItem.objects.create(
+                title=f"Item {n}", price=Decimal("1.00"), category=self.item.category
+            )
+            Rating.objects.create(menuitem=item, user=self.users[0], rating=n + 1)
+        self.client.force_authenticate(self.users[0])
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/menu-items/", {"perpage": 10})
+        ratings = [item["avg_rating"] for item in response.data["results"]]
+        self.assertEqual(ratings, [1.0, 2.0, 3.0, None])
+
+
+class MenuSearchTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.category = Category.objects.create(slug="pasta", title="Massas")
+        for title in ("Lasanha à bolonhesa", "Lasanha de frango", "Pão de alho"):
+            self.create(title)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username="customer"))
+
+    def create(self, title):
+        return MenuItem.objects.create(
+            title=title, price=Decimal("10.00"), category=self.category
+        )
+
+    def titles(self, search, **params):
+        response = self.client.get("/api/menu-items/", {"search": search, **params})
+        self.assertEqual(response.status_code, 200)
+        return [item["title"] for item in response.data["results"]]
+
+    def test_prefix_and_all_words(self):
+        self.assertEqual(len(self.titles("lasa", perpage=10)), 2)
+        self.assertEqual(self.titles("las fran"), ["Lasanha de frango"])
+        self.assertEqual(self.titles("pao"), ["Pão de alho"])
+        self.assertEqual(self.titles("***"), [])
+
+    def test_ranks_better_matches_first(self):
+        self.create("Frango frango frango")
+        self.assertEqual(self.titles("frango")[0], "Frango frango frango")
+
+    def test_cursor_over_rank(self):
+        for n in range(5):
+            self.create(f"Salada {n}")
+        seen = []
+        params = {"search": "salada", "perpage": 2}
+        while True:
+            response = self.client.get("/api/menu-items/", params)
+            seen.extend(item["title"] for item in response.data["results"])
+            params["cursor"] = response.data["next"]
+            if params["cursor"] is None:
+                break
+        self.assertEqual(sorted(seen), [f"Salada {n}" for n in range(5)])
+
+    def test_index_follows_updates_and_deletes(self):
+        item = self.create("Sopa")
+        item.title = "Caldo verde"
+        item.save()
+        self.assertEqual(self.titles("sopa"), [])
+        self.assertEqual(self.titles("caldo"), ["Caldo verde"])
+        item.delete()
+        self.assertEqual(self.titles("caldo"), [])
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{FTS_TABLE}_data" WHERE id > 10')
+        out = StringIO()
+        call_command("rebuild_search_index", stdout=out)
+        self.assertIn("rebuilt", out.getvalue())
+        self.assertEqual(len(self.titles("lasanha")), 2)
+
+    def test_uses_fts_index(self):
+        queryset = search_menu_items(MenuItem.objects.all(), "lasanha")
+        plan = queryset.explain()
+        self.assertIn("VIRTUAL TABLE INDEX", plan)
+        self.assertNotIn("SCAN LittleLemonAPI_menuitem\n", plan + "\n")
+
+
+class CatalogueFilterTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.pasta = Category.objects.create(slug="pasta", title="Massas")
+        self.salad = Category.objects.create(slug="salad", title="Saladas")
+        MenuItem.objects.create(
+            title="Lasanha", price=Decimal("20.00"), category=self.pasta, featured=True
+        )
+        MenuItem.objects.create(
+            title="Caesar", price=Decimal("15.00"), category=self.salad
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username="customer"))
+
+    def titles(self, **params):
+        response = self.client.get("/api/menu-items/", params)
+        self.assertEqual(response.status_code, 200)
+        return [item["title"] for item in response.data["results"]]
+
+    def test_filters(self):
+        self.assertEqual(self.titles(category="pasta"), ["Lasanha"])
+        self.assertEqual(self.titles(category="Saladas"), ["Caesar"])
+        self.assertEqual(self.titles(category="unknown"), [])
+        self.assertEqual(self.titles(category_id=self.salad.id), ["Caesar"])
+        self.assertEqual(self.titles(featured="true"), ["Lasanha"])
+        self.assertEqual(self.titles(featured="false"), ["Caesar"])
+        self.assertEqual(self.titles(to_price="16"), ["Caesar"])
+
+    def test_category_filter_does_not_join(self):
+        self.client.get("/api/menu-items/", {"category": "pasta"})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/api/menu-items/", {"category": "pasta", "perpage": 3})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("LittleLemonAPI_category", queries[0]["sql"])
+
+    def test_rejects_unknown_ordering_and_bad_values(self):
+        for params in (
+            {"ordering": "inventory"},
+            {"ordering": "category__title"},
+            {"ordering": "rank"},
+            {"ordering": "title", "to_price": "10"},
+            {"category_id": "x"},
+            {"to_price": "cheap"},
+        ):
+            response = self.client.get("/api/menu-items/", params)
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_no_full_scans_or_sorts_for_allowed_combinations(self):
+        filters = [
+            {},
+            {"category_id": str(self.pasta.id)},
+            {"featured": "true"},
+            {"to_price": "5"},
+            {"category_id": str(self.pasta.id), "featured": "false"},
+            {"category_id": str(self.pasta.id), "to_price": "5"},
+            {"featured": "true", "to_price": "5"},
+        ]
+        orderings = [name for name in MENU_ITEM_ORDERINGS if name != "rank"]
+        for params, ordering, after in itertools.product(
+            filters, orderings, (False, True)
+        ):
+            if "to_price" in params and ordering not in TO_PRICE_ORDERINGS:
+                continue
+            query = QueryDict(mutable=True)
+            query.update({**params, "ordering": ordering})
+            items, keys = filter_menu_items(
+                MenuItem.objects.select_related("rating_stats"), query
+            )
+            items = items.order_by(*keys)
+            if after:
+                cursor = ["M" if "title" in keys[0] else "10", "1"]
+                items = items.filter(KeysetPaginator(keys).after(cursor))
+            plan = items[:3].explain()
+            with self.subTest(params=params, ordering=ordering, after=after):
+                self.assertNotIn("TEMP B-TREE", plan)
+                full_scans = [
+                    line
+                    for line in plan.splitlines()
+                    if line.endswith("SCAN LittleLemonAPI_menuitem")
+                ]
+                self.assertEqual(full_scans, [], plan)
+
+
+def hammer_throttle(attempts, results):
+    throttle = TenCallsPerMinute()
+    request = SimpleNamespace(user=SimpleNamespace(is_authenticated=True, pk=1))
+    results.put(sum(throttle.allow_request(request, None) for _ in range(attempts)))
+
+
+class ThrottleTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        store = override_settings(
+            THROTTLE_STORE={
+                "BACKEND": "LittleLemonAPI.throttles.SQLiteCounterStore",
+                "LOCATION": os.path.join(directory.name, "throttle.sqlite3"),
+            }
+        )
+        store.enable()
+        self.addCleanup(store.disable)
+
+    def request(self, pk=1):
+        return SimpleNamespace(user=SimpleNamespace(is_authenticated=True, pk=pk))
+
+    def test_limit_and_sliding_window(self):
+        throttle = TenCallsPerMinute()
+        now = 1_000_002.0  # the start of a 6 second bucket
+        throttle.timer = lambda: now
+        allowed = [throttle.allow_request(self.request(), None) for _ in range(12)]
+        self.assertEqual(allowed.count(True), 10)
+        self.assertFalse(allowed[-1])
+        self.assertAlmostEqual(throttle.wait(), 60.0)
+        self.assertTrue(throttle.allow_request(self.request(pk=2), None))
+
+        now += 59
+        self.assertFalse(throttle.allow_request(self.request(), None))
+        now += 1
+        self.assertTrue(throttle.allow_request(self.request(), None))
+
+    def test_rates_are_read_from_settings(self):
+        rates = {"anon": None, "user": "2/minute", "tencallsperminute": "10/minute"}
+        with override_settings(REST_FRAMEWORK={"DEFAULT_THROTTLE_RATES": rates}):
+            throttle = UserRateThrottle()
+            allowed = [throttle.allow_request(self.request(), None) for _ in range(3)]
+        self.assertEqual(allowed, [True, True, False])
+
+    def test_enforced_globally_across_processes(self):
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+        workers = [
+            context.Process(target=hammer_throttle, args=(5, results))
+            for _ in range(6)
+        ]
+        for worker in workers:
+            worker.start()
+        allowed = sum(results.get(timeout=30) for _ in workers)
+        for worker in workers:
+            worker.join()
+        self.assertEqual(allowed, 10)
+
+    def test_api_returns_429(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username="customer"))
+        for _ in range(10):
+            client.get("/api/throttle-check-auth/")
+        response = client.get("/api/throttle-check-auth/")
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
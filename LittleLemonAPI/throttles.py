@@ -1,4 +1,164 @@
-from rest_framework.throttling import UserRateThrottle
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from rest_framework import throttling
+from rest_framework.settings import api_settings
+
+
+class SQLiteCounterStore:
+    """
+    Throttle counters in a SQLite file shared by every worker on the host.
+    Each hit is one IMMEDIATE transaction, so limits hold across processes.
+    """
+
+    def __init__(self, location):
+        self.location = str(location)
+        self.local = threading.local()
+
+    def connect(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.location, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS throttle_counter ("
+                " key TEXT NOT NULL,"
+                " bucket INTEGER NOT NULL,"
+                " count INTEGER NOT NULL,"
+                " expires REAL NOT NULL,"
+                " PRIMARY KEY (key, bucket)"
+                ") WITHOUT ROWID"
+            )
+            self.local.connection = connection
+        return connection
+
+    def hit(self, key, bucket, oldest, limit, ttl):
+        connection = self.connect()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "DELETE FROM throttle_counter WHERE key = ? AND bucket < ?",
+                (key, oldest),
+            )
+            if random.random() < 0.01:
+                # Keys of clients that went quiet are never revisited above.
+                connection.execute(
+                    "DELETE FROM throttle_counter WHERE expires < ?", (now,)
+                )
+            counts = dict(
+                connection.execute(
+                    "SELECT bucket, count FROM throttle_counter WHERE key = ?", (key,)
+                )
+            )
+            allowed = sum(counts.values()) < limit
+            if allowed:
+                connection.execute(
+                    "INSERT INTO throttle_counter VALUES (?, ?, 1, ?)"
+                    " ON CONFLICT (key, bucket) DO UPDATE SET count = count + 1",
+                    (key, bucket, now + ttl),
+                )
+                counts[bucket] = counts.get(bucket, 0) + 1
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return allowed, counts
+
+
+class CacheCounterStore:
+    """
+    Throttle counters in a Django cache alias, one key per bucket. Shared
+    across processes with RedisCache or Memcached, whose increments are
+    atomic; concurrent requests racing the window read may overshoot the
+    limit by a few.
+    """
+
+    def __init__(self, location):
+        self.cache = caches[location]
+
+    def hit(self, key, bucket, oldest, limit, ttl):
+        names = {f"{key}:{number}": number for number in range(oldest, bucket + 1)}
+        counts = {
+            names[name]: count for name, count in self.cache.get_many(names).items()
+        }
+        allowed = sum(counts.values()) < limit
+        if allowed:
+            name = f"{key}:{bucket}"
+            self.cache.add(name, 0, ttl)
+            counts[bucket] = self.cache.incr(name)
+        return allowed, counts
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+# Connections must not cross a fork (e.g. gunicorn --preload).
+os.register_at_fork(after_in_child=_stores.clear)
+
+
+def get_counter_store():
+    config = settings.THROTTLE_STORE
+    key = (config["BACKEND"], str(config["LOCATION"]))
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = import_string(config["BACKEND"])(config["LOCATION"])
+        return _stores[key]
+
+
+class BucketedRateThrottleMixin:
+    """
+    Sliding-window throttling kept as ``buckets`` fixed-size counters in the
+    shared counter store, instead of DRF's per-process timestamp lists.
+    """
+
+    buckets = 10
+
+    @property
+    def THROTTLE_RATES(self):
+        # Read at request time so rate changes in settings take effect.
+        return api_settings.DEFAULT_THROTTLE_RATES
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        self.width = self.duration / self.buckets
+        bucket = int(self.now // self.width)
+        allowed, self.counts = get_counter_store().hit(
+            self.key,
+            bucket,
+            bucket - self.buckets + 1,
+            self.num_requests,
+            self.duration + self.width,
+        )
+        return allowed
+
+    def wait(self):
+        occupied = [bucket for bucket, count in self.counts.items() if count]
+        if not occupied:
+            return None
+        # A slot opens when the oldest occupied bucket slides out the window.
+        return max(0.0, (min(occupied) + self.buckets) * self.width - self.now)
+
+
+class AnonRateThrottle(BucketedRateThrottleMixin, throttling.AnonRateThrottle):
+    pass
+
+
+class UserRateThrottle(BucketedRateThrottleMixin, throttling.UserRateThrottle):
+    pass
+
 
 class TenCallsPerMinute(UserRateThrottle):
     scope = 'tencallsperminute'
@@ -1,30 +1,47 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
 from rest_framework.authtoken.views import obtain_auth_token
 
+# Views with an async-native GET, see settings.ASYNC_READ_VIEWS.
+reads = async_views if settings.ASYNC_READ_VIEWS else views
+
 urlpatterns = [
    # Menu items
-    path('menu-items/', views.menu_items),
+    path('menu-items/', reads.menu_items),
     path('menu-items/<int:id>/', views.single_item),
+    path('menu-items/import/', views.menu_items_import),
+    path('menu-items/<int:id>/ratings/', views.menu_item_rating_stats),
 
     # Categories
-    path('categories/', views.categories),
+    path('categories/', reads.categories),
     #path('categories/<int:id>/', views.single_category),
 
+    # Catalogue cache
+    path('cache-stats/', views.catalogue_cache_stats),
+
     # Cart
     path('cart/', views.cart),
 
     # Orders
     path('orders/', views.orders),
-    path('orders/<int:id>/', views.single_order),
+    path('orders/<int:id>/', reads.single_order),
+    path('orders/queue/', views.delivery_queue),
+    path('orders/export/', views.orders_export),
+    path('orders/events/', async_views.order_events),
+
+    # Sales analytics
+    path('analytics/', views.analytics),
 
     # Groups - Manager
     path('groups/manager/users/', views.managers),
     path('groups/manager/users/<int:id>/', views.single_manager),
+    path('groups/manager/users/batch/', views.managers_batch),
 
     # Groups - Delivery crew
     path('groups/delivery-crew/users/', views.delivery_crew),
     path('groups/delivery-crew/users/<int:id>/', views.single_delivery_crew),
+    path('groups/delivery-crew/users/batch/', views.delivery_crew_batch),
 
     # Auth
     path('api-token-auth/', obtain_auth_token, name='api_token_auth'),
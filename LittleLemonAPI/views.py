@@ -1,14 +1,34 @@
+import hmac
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.http import HttpResponse, HttpResponseForbidden, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.core.paginator import Paginator, EmptyPage
-from django.contrib.auth.models import User, Group
+from django.contrib.auth.models import User
 from rest_framework import status, generics
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from rest_framework.decorators import (
+    api_view,
+    parser_classes,
+    permission_classes,
+    throttle_classes,
+)
+from rest_framework.parsers import JSONParser
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.throttling import AnonRateThrottle
-from .models import Category, MenuItem, Rating, Cart, Order, OrderItem
+from .models import (
+    Category,
+    MenuItem,
+    MenuItemRatingStats,
+    Rating,
+    Cart,
+    Order,
+    order_items_prefetch,
+)
 from .serializers import (
     MenuItemSerializer,
+    MenuItemRatingStatsSerializer,
     RatingSerializer,
     ManagerSerializer,
     DeliveryCrewSerializer,
@@ -16,103 +36,139 @@ from .serializers import (
     OrderSerializer,
     OrderItemSerializer,
     CategorySerializer,
+    SalesReportSerializer,
+)
+from .cache import cache_stats, cached_catalogue
+from .checkout import place_order
+from .conditional import (
+    catalogue_validators,
+    not_modified,
+    order_validators,
+    set_validators,
+)
+from .dispatch import OPEN, OrderDispatchSerializer, update_dispatch
+from .exports import (
+    CONTENT_TYPES,
+    OrderExportSerializer,
+    aiterate,
+    export_chunks,
+    export_orders,
+)
+from .filters import filter_menu_items
+from .imports import MenuCSVParser, import_menu
+from .inventory import clear_cart, reserve_inventory
+from .memberships import MembershipBatchSerializer, change_members
+from .metrics import registry
+from .pagination import KeysetPaginator
+from .permissions import (
+    DELIVERY_CREW,
+    MANAGER,
+    IsDeliveryCrew,
+    IsManager,
+    IsManagerOrReadOnly,
+    IsOrderOwner,
+    get_group_id,
+    is_manager,
 )
-from .throttles import TenCallsPerMinute
+from .rollups import SalesRangeSerializer, sales_report
+from .rows import CART, MENU_ITEM, ORDER, order_rows
+from .throttles import AnonRateThrottle, TenCallsPerMinute
 
 
 # Create your views here.
-@api_view(["GET", "POST", "PUT", "DELETE", "PATCH"])
-@permission_classes([IsAuthenticated])
+def menu_items_page(request):
+    items, keys = filter_menu_items(MenuItem.objects.all(), request.query_params)
+
+    paginator = KeysetPaginator(keys)
+    rows, next_cursor, count = paginator.paginate(MENU_ITEM.values(items, *keys), request)
+    return paginator.get_response_data(MENU_ITEM.many(rows), next_cursor, count)
+
+
+@api_view(["GET", "POST"])
+@permission_classes([IsAuthenticated, IsManagerOrReadOnly])
 def menu_items(request):
     if request.method == "GET":
-        items = MenuItem.objects.select_related("category").all()
-        category_name = request.query_params.get("category")
-        to_price = request.query_params.get("to_price")
-        search = request.query_params.get("search")
-        ordering = request.query_params.get("ordering")
-        perpage = request.query_params.get("perpage", default=2)
-        page = request.query_params.get("page", default=1)
-
-        if category_name:
-            items = items.filter(category__title=category_name)
-        if to_price:
-            items = items.filter(price__lte=to_price)
-        if search:
-            items = items.filter(title__contains=search)
-        if ordering:
-            ordering_fields = ordering.split(",")
-            items = items.order_by(*ordering_fields)
-
-        paginator = Paginator(items, per_page=perpage)
-        try:
-            items = paginator.page(number=page)
-        except EmptyPage:
-            items = []
-        serialized_item = MenuItemSerializer(items, many=True)
-        return Response(serialized_item.data, status=status.HTTP_200_OK)
+        etag, last_modified = catalogue_validators("menu-items", request)
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            data = cached_catalogue(
+                "menu-items", lambda: menu_items_page(request), request
+            )
+            response = Response(data, status=status.HTTP_200_OK)
+        return set_validators(response, etag, last_modified)
 
     if request.method == "POST":
-        if not request.user.groups.filter(name="Manager").exists():
-            return Response(
-                {"message": "You are not authorized to perform this action."},
-                status=status.HTTP_403_FORBIDDEN,
-            )
         serialized_item = MenuItemSerializer(data=request.data)
         serialized_item.is_valid(raise_exception=True)
         serialized_item.save()
         return Response(serialized_item.data, status=status.HTTP_201_CREATED)
 
-    if request.method in ["PUT", "PATCH", "POST", "DELETE"]:
-        if not request.user.groups.filter(name="Manager").exists():
-            return Response(
-                {"message": "You are not authorized to perform this action."},
-                status=status.HTTP_403_FORBIDDEN,
-            )
 
-
-@api_view(["GET", "POST", "PUT", "DELETE", "PATCH"])
+@api_view(["GET", "PUT", "DELETE", "PATCH"])
+@permission_classes([IsManagerOrReadOnly])
 def single_item(request, id):
-    if request.methor == "GET":
+    if request.method == "GET":
+        etag, last_modified = catalogue_validators(f"menu-items/{id}")
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            data = cached_catalogue(
+                f"menu-items/{id}",
+                lambda: MenuItemSerializer(
+                    get_object_or_404(MenuItem.objects.select_related("rating_stats"), id=id)
+                ).data,
+            )
+            response = Response(data, status=status.HTTP_200_OK)
+        return set_validators(response, etag, last_modified)
+    if request.method in ["PUT", "PATCH"]:
         item = get_object_or_404(MenuItem, id=id)
-        serialized_item = MenuItemSerializer(item)
+        serialized_item = MenuItemSerializer(item, data=request.data)
+        serialized_item.is_valid(raise_exception=True)
+        serialized_item.save()
         return Response(serialized_item.data, status=status.HTTP_200_OK)
-    if request.method in ["PUT", "PATCH"]:
-        if request.user.groups.filter(name="Manager").exists() is False:
-            return Response(
-                {"message": "You are not authorized to perform this action."},
-                status=status.HTTP_403_FORBIDDEN,
-            )
-        else:
-            item = get_object_or_404(MenuItem, id=id)
-            serialized_item = MenuItemSerializer(item, data=request.data)
-            serialized_item.is_valid(raise_exception=True)
-            serialized_item.save()
-            return Response(serialized_item.data, status=status.HTTP_200_OK)
     if request.method == "DELETE":
-        if request.user.groups.filter(name="Manager").exists() is False:
-            return Response(
-                {"message": "You are not authorized to perform this action."},
-                status=status.HTTP_403_FORBIDDEN,
-            )
-        else:
-            item = get_object_or_404(MenuItem, id=id)
-            item.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
+        item = get_object_or_404(MenuItem, id=id)
+        item.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated, IsManager])
+@parser_classes([JSONParser, MenuCSVParser])
+def menu_items_import(request):
+    rows = request.data
+    if isinstance(rows, dict):
+        rows = rows.get("items")
+    dry_run = request.query_params.get("dry_run") in ("1", "true")
+    counts = import_menu(rows, dry_run=dry_run)
+    return Response(counts, status=status.HTTP_200_OK)
+
+
+@api_view()
+def menu_item_rating_stats(request, id):
+    item = get_object_or_404(
+        MenuItem.objects.select_related("rating_stats").only("id", "rating_stats"),
+        id=id,
+    )
+    try:
+        stats = item.rating_stats
+    except MenuItemRatingStats.DoesNotExist:
+        stats = MenuItemRatingStats(menuitem=item)
+    serializer = MenuItemRatingStatsSerializer(stats)
+    return Response(serializer.data, status=status.HTTP_200_OK)
 
 
 @api_view(["GET", "POST"])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsManager])
 def managers(request):
     if request.method == "GET":
-        managers = User.objects.filter(groups__name="Manager")
+        managers = User.objects.filter(groups__name=MANAGER)
         serialized_managers = ManagerSerializer(managers, many=True)
         return Response(serialized_managers.data, status=status.HTTP_200_OK)
     if request.method == "POST":
         username = request.data.get("username")
         if username:
             user = get_object_or_404(User, username=username)
-            managers = Group.objects.get(name="Manager")
-            managers.user_set.add(user)
+            user.groups.add(get_group_id(MANAGER))
             return Response({"message": "Created."}, status=status.HTTP_201_CREATED)
         else:
             return Response(
@@ -121,13 +177,12 @@ def managers(request):
 
 
 @api_view(["DELETE"])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsManager])
 def single_manager(request, id):
     manager = get_object_or_404(User, id=id)
     if request.method == "DELETE":
-        if manager.groups.filter(name="Manager").exists():
-            managers = Group.objects.get(name="Manager")
-            managers.user_set.remove(manager)
+        if manager.groups.filter(name=MANAGER).exists():
+            manager.groups.remove(get_group_id(MANAGER))
             return Response({"message": "Deleted."}, status=status.HTTP_200_OK)
         else:
             return Response(
@@ -135,19 +190,33 @@ def single_manager(request, id):
             )
 
 
+def change_members_response(request, group_name):
+    batch = MembershipBatchSerializer(data=request.data)
+    batch.is_valid(raise_exception=True)
+    results = change_members(
+        group_name, request.method == "POST", **batch.validated_data
+    )
+    return Response({"results": results}, status=status.HTTP_200_OK)
+
+
+@api_view(["POST", "DELETE"])
+@permission_classes([IsAuthenticated, IsManager])
+def managers_batch(request):
+    return change_members_response(request, MANAGER)
+
+
 @api_view(["GET", "POST"])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsManager])
 def delivery_crew(request):
     if request.method == "GET":
-        delivery_crew = User.objects.filter(groups__name="Delivery")
+        delivery_crew = User.objects.filter(groups__name=DELIVERY_CREW)
         serialized_delivery_crew = DeliveryCrewSerializer(delivery_crew, many=True)
         return Response(serialized_delivery_crew.data, status=status.HTTP_200_OK)
     if request.method == "POST":
         username = request.data.get("username")
         if username:
             user = get_object_or_404(User, username=username)
-            delivery_crew = Group.objects.get(name="Delivery")
-            delivery_crew.user_set.add(user)
+            user.groups.add(get_group_id(DELIVERY_CREW))
             return Response({"message": "Created."}, status=status.HTTP_201_CREATED)
         else:
             return Response(
@@ -156,13 +225,12 @@ def delivery_crew(request):
 
 
 @api_view(["DELETE"])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsManager])
 def single_delivery_crew(request, id):
     delivery_crew = get_object_or_404(User, id=id)
     if request.method == "DELETE":
-        if delivery_crew.groups.filter(name="Delivery").exists():
-            delivery_crew_group = Group.objects.get(name="Delivery")
-            delivery_crew_group.user_set.remove(delivery_crew)
+        if delivery_crew.groups.filter(name=DELIVERY_CREW).exists():
+            delivery_crew.groups.remove(get_group_id(DELIVERY_CREW))
             return Response({"message": "Deleted."}, status=status.HTTP_200_OK)
         else:
             return Response(
@@ -170,6 +238,45 @@ def single_delivery_crew(request, id):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+@api_view(["POST", "DELETE"])
+@permission_classes([IsAuthenticated, IsManager])
+def delivery_crew_batch(request):
+    return change_members_response(request, DELIVERY_CREW)
+
+
+@api_view()
+@permission_classes([IsAuthenticated, IsManager])
+def catalogue_cache_stats(request):
+    return Response(cache_stats(), status=status.HTTP_200_OK)
+
+
+@api_view()
+@permission_classes([IsAuthenticated, IsManager])
+def analytics(request):
+    params = SalesRangeSerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    report = sales_report(**params.validated_data)
+    return Response(SalesReportSerializer(report).data, status=status.HTTP_200_OK)
+
+
+def metrics_allowed(request):
+    token = settings.METRICS_TOKEN
+    if token and hmac.compare_digest(
+        request.headers.get("Authorization", "").encode(), f"Bearer {token}".encode()
+    ):
+        return True
+    return request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS
+
+
+def metrics(request):
+    # Plain Django view: scrapes skip DRF authentication and throttling.
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @api_view()
 @throttle_classes([AnonRateThrottle])
 def throttle_check(request):
@@ -190,51 +297,52 @@ def throttle_check_auth(request):
 @permission_classes([IsAuthenticated])
 def cart(request):
     if request.method == "GET":
-        carts = Cart.objects.filter(user=request.user)
-        serialized_carts = CartSerializer(carts, many=True)
-        return Response(serialized_carts.data, status=status.HTTP_200_OK)
+        carts = CART.values(Cart.objects.filter(user=request.user))
+        return Response(CART.many(carts), status=status.HTTP_200_OK)
     if request.method == "POST":
         data = request.data.copy()
         data["user"] = request.user.id
         menuitem_id = data.get("menuitem")
-        quantity = data.get("quantity", 1)
         if not menuitem_id:
             return Response(
                 {"error": "Menu item ID is required."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
         try:
-            menuitem = MenuItem.objects.get(id=menuitem_id)
-        except MenuItem.DoesNotExist:
+            quantity = int(data.get("quantity", 1))
+        except (TypeError, ValueError):
+            quantity = 0
+        if quantity < 1:
             return Response(
-                {"error": "Menu item not found."}, status=status.HTTP_404_NOT_FOUND
+                {"error": "Quantity must be a positive integer."},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-        if menuitem.inventory < int(quantity):
+        try:
+            menuitem = MenuItem.objects.only("id", "price").get(id=menuitem_id)
+        except (MenuItem.DoesNotExist, ValueError):
             return Response(
-                {"error": "Insufficient inventory."}, status=status.HTTP_400_BAD_REQUEST
+                {"error": "Menu item not found."}, status=status.HTTP_404_NOT_FOUND
             )
         unit_price = menuitem.price
-        price = unit_price * int(quantity)
+        data["quantity"] = quantity
         data["unit_price"] = unit_price
-        data["price"] = price
+        data["price"] = unit_price * quantity
         serialized_cart = CartSerializer(data=data)
         serialized_cart.is_valid(raise_exception=True)
-        serialized_cart.save()
-        menuitem.inventory -= int(quantity)
-        menuitem.save()
+        with transaction.atomic():
+            if not reserve_inventory(menuitem.id, quantity):
+                return Response(
+                    {"error": "Insufficient inventory."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            serialized_cart.save()
         return Response(serialized_cart.data, status=status.HTTP_201_CREATED)
     if request.method == "DELETE":
-        carts = Cart.objects.filter(user=request.user, order_placed=False)
-        if not carts.exists():
+        if not clear_cart(request.user):
             return Response(
                 {"error": "No items in cart to delete."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        for cart in carts:
-            menuitem = cart.menuitem
-            menuitem.inventory += cart.quantity
-            menuitem.save()
-            cart.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -242,72 +350,104 @@ def cart(request):
 @permission_classes([IsAuthenticated])
 def orders(request):
     if request.method == "GET":
-        if request.user.groups.filter(name="Manager").exists():
+        if is_manager(request):
             orders = Order.objects.all()
         else:
             orders = Order.objects.filter(user=request.user)
-        serialized_orders = OrderSerializer(orders, many=True)
-        return Response(serialized_orders.data, status=status.HTTP_200_OK)
+        paginator = KeysetPaginator(["-date", "-id"], default_page_size=50)
+        rows, next_cursor, count = paginator.paginate(
+            ORDER.values(orders, *paginator.keys), request
+        )
+        return Response(
+            paginator.get_response_data(order_rows(rows), next_cursor, count),
+            status=status.HTTP_200_OK,
+        )
     if request.method == "POST":
-        carts = Cart.objects.filter(user=request.user)
-        if not carts.exists():
+        order = place_order(request.user)
+        if order is None:
             return Response(
                 {"error": "No items in cart to place an order."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        total = sum(cart.price for cart in carts)
-        order = Order.objects.create(user=request.user, total=total)
-        for cart in carts:
-            OrderItem.objects.create(
-                order=order,
-                menuitem=cart.menuitem,
-                quantity=cart.quantity,
-                unit_price=cart.unit_price,
-                price=cart.price,
-            )
-            cart.order_placed = True
-            cart.save()
-        carts.delete()
+        order = Order.objects.with_items().get(id=order.id)
         serialized_order = OrderSerializer(order)
         return Response(serialized_order.data, status=status.HTTP_201_CREATED)
 
 
-@api_view(["GET", "POST", "PUT", "PATCH", "DELETE"])
+@api_view(["GET", "PUT", "PATCH"])
 @permission_classes([IsAuthenticated])
 def single_order(request, id):
-    order = get_object_or_404(Order, id=id)
+    order = get_object_or_404(Order.objects.with_users(), id=id)
     if request.method == "GET":
-        if (
-            request.user != order.user
-            and not request.user.groups.filter(name="Manager").exists()
-        ):
+        can_view = (IsOrderOwner | IsManager)()
+        if not can_view.has_object_permission(request, None, order):
             return Response(
                 {"error": "You are not authorized to view this order."},
                 status=status.HTTP_403_FORBIDDEN,
             )
-        serialized_order = OrderSerializer(order)
-        return Response(serialized_order.data, status=status.HTTP_200_OK)
+        etag, last_modified = order_validators(order)
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            prefetch_related_objects([order], order_items_prefetch())
+            serialized_order = OrderSerializer(order)
+            response = Response(serialized_order.data, status=status.HTTP_200_OK)
+        return set_validators(response, etag, last_modified)
     if request.method in ["PUT", "PATCH"]:
-        if request.user.groups.filter(name="Delivery_crew").exists():
-            serialized_order = OrderSerializer(order, data=request.data, partial=True)
-            serialized_order.status = 1
-            serialized_order.is_valid(raise_exception=True)
-            serialized_order.save()
-            return Response(serialized_order.data, status=status.HTTP_200_OK)
-        if (
-            request.user != order.user
-            and not request.user.groups.filter(name="Manager").exists()
+        dispatch = OrderDispatchSerializer(data=request.data)
+        dispatch.is_valid(raise_exception=True)
+        changes = dispatch.validated_data
+        # Crew members may only move their own orders along the workflow.
+        if not is_manager(request) and (
+            order.delivery_crew_id != request.user.id or "delivery_crew" in changes
         ):
             return Response(
                 {"error": "You are not authorized to update this order."},
                 status=status.HTTP_403_FORBIDDEN,
             )
-        serialized_order = OrderSerializer(order, data=request.data)
-        serialized_order.is_valid(raise_exception=True)
-        serialized_order.save()
+        update_dispatch(order, **changes)
+        prefetch_related_objects([order], order_items_prefetch())
+        serialized_order = OrderSerializer(order)
         return Response(serialized_order.data, status=status.HTTP_200_OK)
 
 
+@api_view()
+@permission_classes([IsAuthenticated, IsManager])
+def orders_export(request):
+    params = OrderExportSerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    start, end, output = (
+        params.validated_data[key] for key in ("start", "end", "output")
+    )
+    chunks = export_chunks(output, export_orders(start, end))
+    if isinstance(request._request, ASGIRequest):
+        chunks = aiterate(chunks)
+    response = StreamingHttpResponse(chunks, content_type=CONTENT_TYPES[output])
+    response["Content-Disposition"] = (
+        f'attachment; filename="orders-{start}-{end}.{output}"'
+    )
+    return response
+
+
+@api_view()
+@permission_classes([IsAuthenticated, IsDeliveryCrew])
+def delivery_queue(request):
+    statuses = request.query_params.getlist("status") or OPEN
+    if not set(statuses) <= set(OPEN):
+        return Response(
+            {"error": f"status must be one of {', '.join(OPEN)}."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    orders = Order.objects.filter(delivery_crew=request.user, status__in=statuses)
+    paginator = KeysetPaginator(["date", "id"], default_page_size=50)
+    rows, next_cursor, count = paginator.paginate(
+        ORDER.values(orders, *paginator.keys), request
+    )
+    return Response(
+        paginator.get_response_data(order_rows(rows), next_cursor, count),
+        status=status.HTTP_200_OK,
+    )
+
+
 class RatingsView(generics.ListCreateAPIView):
     queryset = Rating.objects.all()
     serializer_class = RatingSerializer
@@ -321,9 +461,15 @@ class RatingsView(generics.ListCreateAPIView):
 @permission_classes([IsAuthenticated])  # se quiser permitir só logados
 def categories(request):
     if request.method == 'GET':
-        qs = Category.objects.all()
-        serializer = CategorySerializer(qs, many=True)
-        return Response(serializer.data, status=200)
+        etag, last_modified = catalogue_validators("categories")
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            data = cached_catalogue(
+                "categories",
+                lambda: CategorySerializer(Category.objects.all(), many=True).data,
+            )
+            response = Response(data, status=200)
+        return set_validators(response, etag, last_modified)
 
     if request.method == 'POST':
         serializer = CategorySerializer(data=request.data)